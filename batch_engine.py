@@ -0,0 +1,200 @@
+import click
+import time
+import numpy as np
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from game_state import STANDARD_SHIP_DIMENSIONS
+from placement_index import load_fleet_placement_indexes
+from ship_placement import sample_ships_placements, ship_placements_to_labels
+
+
+class BatchStepResult(NamedTuple):
+    # (K,) Booleans: whether each game's shot hit a ship
+    hit: np.ndarray
+    # (K,) ship value sunk by each game's shot (0 if the shot didn't sink a ship)
+    sunk_ship: np.ndarray
+    # (K,) Booleans: whether each game is over after the shot
+    is_game_over: np.ndarray
+
+
+class BatchGames:
+    """
+    K games of one player shooting at a fleet, held as stacked arrays and stepped in
+    lockstep: one shot per game per step. The rules are those of
+    BattleshipGameState.attempt_strike: a shot on a ship is a hit, the first hit on each
+    square takes one square off the ship's health, a ship sinks when its health reaches
+    0, and the game is over when every ship has sunk. Shots in games that are already
+    over are ignored.
+
+    Both players of a two-player game shoot at independent fleets, so a two-player game
+    is two batches, one per side.
+    """
+
+    def __init__(self, ship_ids: np.ndarray, num_ships: int):
+        """
+        ship_ids - (K, num_rows, num_cols) array holding the value of the ship on each
+            square (1 to num_ships), or 0 for an empty square
+        """
+        self.ship_ids = np.asarray(ship_ids, dtype=np.uint8)
+        self.num_games, self.num_rows, self.num_cols = self.ship_ids.shape
+        self.num_ships = num_ships
+        self.guessed = np.zeros(self.ship_ids.shape, dtype=bool)
+
+        # remaining health of each ship (column 0 counts the empty squares, and is unused)
+        flat_ship_ids = self.ship_ids.reshape(self.num_games, -1).astype(np.int64)
+        game_offsets = np.arange(self.num_games)[:, np.newaxis] * (num_ships + 1)
+        self.remaining_hits = (
+            np.bincount(
+                (flat_ship_ids + game_offsets).ravel(),
+                minlength=self.num_games * (num_ships + 1),
+            )
+            .reshape(self.num_games, num_ships + 1)
+            .astype(np.int16)
+        )
+        self.num_ships_alive = (self.remaining_hits[:, 1:] > 0).sum(axis=1)
+        self.is_game_over = self.num_ships_alive == 0
+        self.num_shots = np.zeros(self.num_games, dtype=np.int32)
+
+    @classmethod
+    def random(
+        cls,
+        num_games: int,
+        ship_dims: List[Tuple[int, int]],
+        num_rows: int = 10,
+        num_cols: int = 10,
+        rng: Optional[np.random.Generator] = None,
+    ) -> "BatchGames":
+        """
+        Games with random fleets, placed the same way as random_ships_placement (ship
+        values follow the order of ship_dims, as in randomize_ship_placements)
+        """
+        placements = sample_ships_placements(
+            ship_dims, num_games, num_rows, num_cols, rng=rng
+        )
+        return cls(
+            ship_placements_to_labels(placements, num_rows, num_cols), len(ship_dims)
+        )
+
+    @property
+    def hits(self) -> np.ndarray:
+        """ (K, num_rows, num_cols) Booleans: the squares that were shot and hit """
+        return self.guessed & (self.ship_ids > 0)
+
+    @property
+    def misses(self) -> np.ndarray:
+        """ (K, num_rows, num_cols) Booleans: the squares that were shot and missed """
+        return self.guessed & (self.ship_ids == 0)
+
+    def step(self, row_idxs: np.ndarray, col_idxs: np.ndarray) -> BatchStepResult:
+        """ Takes one shot in every game: game k calls (row_idxs[k], col_idxs[k]) """
+        game_idxs = np.arange(self.num_games)
+        is_active = ~self.is_game_over
+        ship_values = self.ship_ids[game_idxs, row_idxs, col_idxs]
+        hit = is_active & (ship_values > 0)
+        first_hit = hit & ~self.guessed[game_idxs, row_idxs, col_idxs]
+
+        self.guessed[game_idxs, row_idxs, col_idxs] |= is_active
+        self.num_shots += is_active
+        self.remaining_hits[game_idxs, ship_values] -= first_hit
+        sunk = first_hit & (self.remaining_hits[game_idxs, ship_values] == 0)
+        self.num_ships_alive -= sunk
+        self.is_game_over |= sunk & (self.num_ships_alive == 0)
+        return BatchStepResult(
+            hit=hit,
+            sunk_ship=np.where(sunk, ship_values, 0).astype(np.uint8),
+            is_game_over=self.is_game_over.copy(),
+        )
+
+
+# a vectorized bot: given the games and a random generator, returns the
+# (row_idxs, col_idxs) of the next shot of every game
+BatchPolicy = Callable[[BatchGames, np.random.Generator], Tuple[np.ndarray, np.ndarray]]
+
+
+class RandomPolicy:
+    """
+    Shoots the squares of each game in a uniformly random order, so it never shoots
+    the same square twice (assuming it takes every shot of the games).
+    """
+
+    def __init__(self):
+        self._games: Optional[BatchGames] = None
+        self._shot_order: Optional[np.ndarray] = None
+
+    def __call__(
+        self, games: BatchGames, rng: np.random.Generator
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        num_squares = games.num_rows * games.num_cols
+        if games is not self._games:
+            self._games = games
+            self._shot_order = rng.random(
+                (games.num_games, num_squares), dtype=np.float32
+            ).argsort(axis=1)
+        square_idxs = self._shot_order[
+            np.arange(games.num_games), np.minimum(games.num_shots, num_squares - 1)
+        ]
+        return np.divmod(square_idxs, games.num_cols)
+
+
+# policies by name, for the command line
+BATCH_POLICIES = {
+    "random": RandomPolicy,
+}
+
+
+def evaluate_policy(
+    policy: BatchPolicy,
+    num_games: int,
+    ship_dims: List[Tuple[int, int]],
+    num_rows: int = 10,
+    num_cols: int = 10,
+    batch_size: int = 10000,
+    rng: Optional[np.random.Generator] = None,
+) -> np.ndarray:
+    """
+    Plays num_games games (in batches of batch_size) with the policy shooting until
+    every ship has sunk.
+
+    Returns: (num_games,) array of the number of shots each game took
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    num_shots = []
+    for batch_start in range(0, num_games, batch_size):
+        games = BatchGames.random(
+            min(batch_size, num_games - batch_start),
+            ship_dims,
+            num_rows=num_rows,
+            num_cols=num_cols,
+            rng=rng,
+        )
+        while not games.is_game_over.all():
+            games.step(*policy(games, rng))
+        num_shots.append(games.num_shots)
+    return np.concatenate(num_shots)
+
+
+@click.command()
+@click.option("--num-games", "-n", type=int, required=True)
+@click.option("--policy", type=click.Choice(sorted(BATCH_POLICIES)), default="random")
+@click.option("--batch-size", "-b", type=int, default=10000)
+@click.option("--random-seed", "-r", type=int)
+def cli(num_games: int, policy: str, batch_size: int, random_seed: Optional[int]):
+    load_fleet_placement_indexes(10, 10, STANDARD_SHIP_DIMENSIONS)
+    start_time = time.perf_counter()
+    num_shots = evaluate_policy(
+        BATCH_POLICIES[policy](),
+        num_games,
+        STANDARD_SHIP_DIMENSIONS,
+        batch_size=batch_size,
+        rng=np.random.default_rng(random_seed),
+    )
+    elapsed_time = time.perf_counter() - start_time
+    print(
+        f"{num_games} games in {elapsed_time:.1f}s: {policy} policy took "
+        f"{num_shots.mean():.2f} shots on average (min {num_shots.min()}, max {num_shots.max()})"
+    )
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,106 @@
+import click
+import random
+import time
+from tabulate import tabulate
+from typing import List
+
+from game_grid import GRID_BACKENDS
+from game_state import BattleshipGameState, STANDARD_SHIP_DIMENSIONS
+
+
+def benchmark_board_size(
+    board_size: int, grid_backend: str, num_shots: int, random_seed: int
+) -> List:
+    """
+    Times one game on a (board_size x board_size) board, with one standard fleet per 10
+    rows (e.g. 50 ships on a 100x100 board).
+
+    Returns: table row of the board size, number of ships, time to place our fleet,
+    average time per shot, time to render the whole home grid, and average time to
+    poll the home grid changes after a shot (what the GUI does every frame)
+    """
+    rng = random.Random(random_seed)
+    ship_dims = STANDARD_SHIP_DIMENSIONS * max(1, board_size // 10)
+    game_state = BattleshipGameState(
+        num_rows=board_size,
+        num_cols=board_size,
+        ships_dimensions=ship_dims,
+        grid_backend=grid_backend,
+        verbose=False,
+    )
+
+    start_time = time.perf_counter()
+    game_state.randomize_ship_placements(ship_dims, our_ships=True, rng=rng)
+    placement_time = time.perf_counter() - start_time
+    game_state.randomize_ship_placements(ship_dims, our_ships=False, rng=rng)
+
+    start_time = time.perf_counter()
+    game_state.get_player_home_grid()
+    render_time = time.perf_counter() - start_time
+    # the first polls return every square
+    game_state.poll_home_grid_changes()
+    game_state.poll_tracking_grid_changes()
+
+    strike_time, poll_time = 0.0, 0.0
+    num_shots_taken = 0
+    # squares can only be called once, so small boards may end the game early
+    while num_shots_taken < num_shots and not game_state.is_game_over:
+        num_shots_taken += 1
+        row_idx, col_idx = (
+            game_state.our_unguessed
+            if game_state.is_my_turn
+            else game_state.opponent_unguessed
+        ).sample(rng)
+        start_time = time.perf_counter()
+        game_state.call_square(row_idx, col_idx)
+        strike_time += time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        game_state.poll_home_grid_changes()
+        game_state.poll_tracking_grid_changes()
+        poll_time += time.perf_counter() - start_time
+
+    return [
+        f"{board_size}x{board_size}",
+        len(ship_dims),
+        f"{placement_time * 1e3:.1f}",
+        f"{strike_time / num_shots_taken * 1e6:.1f}",
+        f"{render_time * 1e3:.1f}",
+        f"{poll_time / num_shots_taken * 1e6:.1f}",
+    ]
+
+
+@click.command()
+@click.option(
+    "--board-sizes",
+    type=str,
+    default="10,30,100,300,1000",
+    help="comma-separated board sizes (number of rows and columns)",
+)
+@click.option(
+    "--grid-backend", type=click.Choice(sorted(GRID_BACKENDS)), default="numpy"
+)
+@click.option("--num-shots", type=int, default=1000)
+@click.option("--random-seed", "-r", type=int, default=0)
+def cli(board_sizes: str, grid_backend: str, num_shots: int, random_seed: int):
+    rows = [
+        benchmark_board_size(int(board_size), grid_backend, num_shots, random_seed)
+        for board_size in board_sizes.split(",")
+    ]
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "board",
+                "ships",
+                "placement (ms)",
+                "shot (us)",
+                "full render (ms)",
+                "poll changes (us)",
+            ],
+        )
+    )
+
+
+if __name__ == "__main__":
+    cli()
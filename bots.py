@@ -0,0 +1,551 @@
+import random
+import time
+import numpy as np
+from collections import Counter
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from exact_inference import ExactInference
+from game_grid import GameGrid
+from game_state import (
+    BattleshipGameState,
+    LOCATION_GUESS_HIT,
+    LOCATION_GUESS_MISS,
+    UnguessedSquares,
+    get_value_array,
+)
+from placement_index import has_placement_index
+from ship_placement import (
+    get_possible_ship_placement_mask,
+    sample_ships_placements,
+    window_sums,
+)
+
+
+def get_guesses_grid(game_state: BattleshipGameState, our_side: bool) -> GameGrid:
+    """ The grid of guesses made by our side (or by the opponent's side) """
+    return game_state.our_guesses if our_side else game_state.opponent_guesses
+
+
+def get_unguessed_squares(
+    game_state: BattleshipGameState, our_side: bool
+) -> UnguessedSquares:
+    """ The squares our side (or the opponent's side) hasn't guessed yet """
+    return game_state.our_unguessed if our_side else game_state.opponent_unguessed
+
+
+class RandomBot:
+    """ Guesses uniformly at random among the squares it hasn't guessed yet """
+
+    def choose_square(
+        self, game_state: BattleshipGameState, our_side: bool, rng: random.Random
+    ) -> Tuple[int, int]:
+        """
+        game_state - the game, with the bot playing our side (or the opponent's side)
+        rng - random number generator, so games can be replayed from a seed
+
+        Returns: (row_idx, col_idx) of the square to call
+        """
+        return get_unguessed_squares(game_state, our_side).sample(rng)
+
+
+class ParityBot:
+    """
+    Hunts at random on one color of the checkerboard (every ship longer than one square
+    covers both colors, so half the board is enough to find it), and after a hit targets
+    the unguessed neighbors of the hits until the ship is sunk. Once every square of the
+    hunting color is guessed (only possible with 1x1 ships left), it hunts anywhere.
+    """
+
+    HUNTING_PARITY = 0
+
+    def __init__(self):
+        self._guesses_grid: Optional[GameGrid] = None
+        self._last_square: Optional[Tuple[int, int]] = None
+        # unguessed neighbors of the hits on the ship being targeted
+        self._targets: List[Tuple[int, int]] = []
+
+    def choose_square(
+        self, game_state: BattleshipGameState, our_side: bool, rng: random.Random
+    ) -> Tuple[int, int]:
+        """ See RandomBot.choose_square """
+        guesses_grid = get_guesses_grid(game_state, our_side)
+        if guesses_grid is not self._guesses_grid:
+            # a new game
+            self._guesses_grid = guesses_grid
+            self._last_square = None
+            self._targets = []
+        if (
+            self._last_square is not None
+            and guesses_grid.read_grid(*self._last_square) == LOCATION_GUESS_HIT
+        ):
+            self._update_targets(game_state, our_side, *self._last_square)
+
+        unguessed_squares = get_unguessed_squares(game_state, our_side)
+        square = None
+        while self._targets:
+            target = self._targets.pop()
+            if target in unguessed_squares:
+                square = target
+                break
+        if square is None:
+            if unguessed_squares.count(self.HUNTING_PARITY) > 0:
+                square = unguessed_squares.sample(rng, parity=self.HUNTING_PARITY)
+            else:
+                square = unguessed_squares.sample(rng)
+        self._last_square = square
+        return square
+
+    def _update_targets(
+        self,
+        game_state: BattleshipGameState,
+        our_side: bool,
+        row_idx: int,
+        col_idx: int,
+    ):
+        struck_fleet = game_state.opponent_fleet if our_side else game_state.our_fleet
+        if not struck_fleet.is_ship_alive(struck_fleet.ship_at[(row_idx, col_idx)]):
+            # the ship was sunk (which both players are told): ships don't touch, so
+            # none of the remaining targets can be a ship
+            self._targets = []
+            return
+        for neighbor_row_idx, neighbor_col_idx in [
+            (row_idx - 1, col_idx),
+            (row_idx + 1, col_idx),
+            (row_idx, col_idx - 1),
+            (row_idx, col_idx + 1),
+        ]:
+            if (
+                0 <= neighbor_row_idx < game_state.num_rows
+                and 0 <= neighbor_col_idx < game_state.num_cols
+            ):
+                self._targets.append((neighbor_row_idx, neighbor_col_idx))
+
+
+class Observation(NamedTuple):
+    """
+    What one side knows about the opponent's board, as (num_rows, num_cols) Boolean
+    arrays: its hits and misses, and the squares of the ships it sunk (both players are
+    told when a ship is sunk)
+    """
+
+    # hits on ships that aren't sunk yet
+    hits: np.ndarray
+    misses: np.ndarray
+    sunk_squares: np.ndarray
+    # dimensions of the ships that aren't sunk yet
+    remaining_ship_dims: List[Tuple[int, int]]
+
+    @property
+    def guessed(self) -> np.ndarray:
+        return self.hits | self.misses | self.sunk_squares
+
+
+def get_observation(game_state: BattleshipGameState, our_side: bool) -> Observation:
+    """ What our side (or the opponent's side) knows about the other side's board """
+    guesses_grid = get_guesses_grid(game_state, our_side)
+    struck_fleet = game_state.opponent_fleet if our_side else game_state.our_fleet
+    ships = game_state.opponent_ships if our_side else game_state.our_ships
+
+    sunk_squares = np.zeros((game_state.num_rows, game_state.num_cols), dtype=bool)
+    remaining_ship_dims = []
+    for ship_value, ship_dims in ships:
+        if struck_fleet.is_ship_alive(ship_value):
+            remaining_ship_dims.append(ship_dims)
+            continue
+        for row_idx, col_idx in struck_fleet.ship_squares.get(ship_value, []):
+            sunk_squares[row_idx, col_idx] = True
+    return Observation(
+        hits=get_value_array(guesses_grid, LOCATION_GUESS_HIT) & ~sunk_squares,
+        misses=get_value_array(guesses_grid, LOCATION_GUESS_MISS),
+        sunk_squares=sunk_squares,
+        remaining_ship_dims=remaining_ship_dims,
+    )
+
+
+# weight of a placement covering k hits: HIT_WEIGHT ** k (see compute_placement_density)
+HIT_WEIGHT = 20
+
+
+def compute_placement_density(
+    observation: Observation, rotate_allowed: bool = True
+) -> np.ndarray:
+    """
+    Counts, for every square, the legal placements of each remaining ship that cover
+    it. A placement is legal if it covers no miss, no sunk ship and no square next to a
+    sunk ship, and has no hit next to it that it doesn't cover (ships don't touch). Each
+    ship is counted on its own, ignoring the other remaining ships. A placement covering
+    k hits counts HIT_WEIGHT ** k times, so the squares that extend the hits come first.
+
+    Every count is a window sum over the board, so the whole map takes a few
+    vectorized passes per ship shape.
+
+    Returns: (num_rows, num_cols) int64 array of weighted placement counts
+    """
+    num_rows, num_cols = observation.hits.shape
+    available_squares = _get_available_squares(observation)
+    hits = observation.hits.astype(np.int64)
+    padded_hits = np.pad(hits, 1)
+
+    shape_counts = Counter()
+    for ship_height, ship_width in observation.remaining_ship_dims:
+        shape_counts[(ship_height, ship_width)] += 1
+        if rotate_allowed and ship_height != ship_width:
+            shape_counts[(ship_width, ship_height)] += 1
+
+    density = np.zeros((num_rows, num_cols), dtype=np.int64)
+    for (ship_height, ship_width), num_ships in shape_counts.items():
+        if ship_height > num_rows or ship_width > num_cols:
+            continue
+        # indexed by the top-left corner of the placement
+        is_legal = get_possible_ship_placement_mask(
+            ship_height, ship_width, available_squares
+        )
+        num_covered_hits = window_sums(hits, ship_height, ship_width)
+        num_nearby_hits = window_sums(padded_hits, ship_height + 2, ship_width + 2)
+        is_legal &= num_nearby_hits == num_covered_hits
+        weights = np.where(is_legal, HIT_WEIGHT**num_covered_hits, 0)
+        # spread the weight of each placement over the squares it covers
+        density += num_ships * window_sums(
+            np.pad(weights, ((ship_height - 1,), (ship_width - 1,))),
+            ship_height,
+            ship_width,
+        )
+    return density
+
+
+def _get_available_squares(observation: Observation) -> np.ndarray:
+    """ The squares that can hold a remaining ship: not a miss, a sunk ship or next to one """
+    sunk_buffer = (
+        window_sums(np.pad(observation.sunk_squares.astype(np.int64), 1), 3, 3) > 0
+    )
+    return ~(observation.misses | sunk_buffer)
+
+
+def _best_squares(scores: np.ndarray, observation: Observation) -> np.ndarray:
+    """ Flat indexes of the unguessed squares with the highest (positive) score """
+    scores = np.where(observation.guessed, -1, scores)
+    max_score = scores.max()
+    if max_score <= 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.flatnonzero(scores == max_score)
+
+
+def choose_best_square(
+    best_square_idxs: np.ndarray, num_cols: int, rng: random.Random
+) -> Tuple[int, int]:
+    """ Breaks ties at random: returns (row_idx, col_idx) of one of the flat indexes """
+    square_idx = int(best_square_idxs[rng.randrange(len(best_square_idxs))])
+    return divmod(square_idx, num_cols)
+
+
+class ProbabilityDensityBot:
+    """
+    Calls the unguessed square covered by the most legal placements of the remaining
+    ships (see compute_placement_density), breaking ties at random.
+    """
+
+    def best_squares(self, observation: Observation, rng: random.Random) -> np.ndarray:
+        """
+        Returns: flat indexes of the squares the bot chooses between (empty if no legal
+        placement is left, i.e. the observation is inconsistent with the rules)
+        """
+        return _best_squares(compute_placement_density(observation), observation)
+
+    def choose_square(
+        self, game_state: BattleshipGameState, our_side: bool, rng: random.Random
+    ) -> Tuple[int, int]:
+        """ See RandomBot.choose_square """
+        best_square_idxs = self.best_squares(get_observation(game_state, our_side), rng)
+        if len(best_square_idxs) == 0:
+            return get_unguessed_squares(game_state, our_side).sample(rng)
+        return choose_best_square(best_square_idxs, game_state.num_cols, rng)
+
+
+class SamplingStats(NamedTuple):
+    num_samples: int
+    # number of sampled layouts consistent with the observation
+    num_consistent: int
+    elapsed_time: float
+    # (sum of weights) ** 2 / (sum of squared weights) of the consistent layouts
+    effective_sample_size: float
+
+    @property
+    def samples_per_second(self) -> float:
+        return self.num_samples / self.elapsed_time if self.elapsed_time > 0 else 0.0
+
+
+# smallest batch estimate_hit_probabilities samples to fill the end of its time budget
+MIN_BATCH_SIZE = 16
+
+
+def estimate_hit_probabilities(
+    observation: Observation,
+    time_budget: Optional[float] = 0.02,
+    max_samples: Optional[int] = None,
+    batch_size: int = 256,
+    rng: Optional[np.random.Generator] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> Tuple[np.ndarray, SamplingStats]:
+    """
+    Estimates the probability that each square holds one of the remaining ships, when
+    every layout of the remaining ships consistent with the observation is equally
+    likely. Layouts are sampled in batches with sample_ships_placements on the squares
+    that can still hold a ship, the layouts that don't cover every hit (or that have a
+    ship on hits only, which would have been sunk) are rejected, and the others are
+    weighted by the inverse of the probability that the sampler picked them (importance
+    sampling), since the sampler favors some layouts.
+
+    time_budget - stop sampling once this many seconds have passed (None for no limit)
+    max_samples - stop sampling after this many layouts (None for no limit)
+    should_stop - stop sampling as soon as this returns True (checked before each batch,
+        e.g. when the move is cancelled, see ComputerTurn)
+
+    Returns: (num_rows, num_cols) array of probabilities (all zeros if no consistent
+    layout was sampled, or if the remaining ships have no legal layout on the squares
+    left, see sample_ships_placements), and the sampling stats
+    Raises ValueError if the board is too large for placement indexes
+    """
+    assert (
+        time_budget is not None or max_samples is not None
+    ), "Sampling needs a time budget or a maximum number of samples"
+    start_time = time.perf_counter()
+    num_rows, num_cols = observation.hits.shape
+    if not has_placement_index(num_rows, num_cols):
+        raise ValueError("The board is too large for placement indexes")
+    available_squares = _get_available_squares(observation)
+    hits = observation.hits.ravel()
+
+    # the weights are exp(log_weight - log_weight_offset), so they don't overflow
+    log_weight_offset = None
+    weighted_occupancy = np.zeros(num_rows * num_cols)
+    sum_weights, sum_squared_weights = 0.0, 0.0
+    num_samples, num_consistent = 0, 0
+    while observation.remaining_ship_dims:
+        if max_samples is not None and num_samples >= max_samples:
+            break
+        if time_budget is not None and time.perf_counter() - start_time >= time_budget:
+            break
+        if should_stop is not None and should_stop():
+            break
+        num_batch_samples = batch_size
+        if max_samples is not None:
+            num_batch_samples = min(batch_size, max_samples - num_samples)
+        if time_budget is not None and num_samples > 0:
+            # shrink the last batch to fit in the time left, at the rate so far
+            elapsed_time = time.perf_counter() - start_time
+            time_left = time_budget - elapsed_time
+            num_batch_samples = min(
+                num_batch_samples,
+                max(MIN_BATCH_SIZE, int(time_left * num_samples / elapsed_time)),
+            )
+        try:
+            labels, log_proposal = sample_ships_placements(
+                observation.remaining_ship_dims,
+                num_samples=num_batch_samples,
+                num_rows=num_rows,
+                num_cols=num_cols,
+                available_squares=available_squares,
+                rng=rng,
+                as_labels=True,
+                with_log_proposal=True,
+            )
+        except ValueError:
+            # the remaining ships don't fit on the squares left
+            break
+        num_samples += num_batch_samples
+        labels = labels.reshape(num_batch_samples, -1)
+        occupied = labels > 0
+        is_consistent = ~(hits & ~occupied).any(axis=1)
+        # a ship on hits only would have been sunk
+        for ship_value in range(1, len(observation.remaining_ship_dims) + 1):
+            is_consistent &= ((labels == ship_value) & ~hits).any(axis=1)
+        if not is_consistent.any():
+            continue
+        num_consistent += int(is_consistent.sum())
+
+        log_weights = -log_proposal[is_consistent]
+        max_log_weight = float(log_weights.max())
+        if log_weight_offset is None or max_log_weight > log_weight_offset:
+            if log_weight_offset is not None:
+                rescale = np.exp(log_weight_offset - max_log_weight)
+                weighted_occupancy *= rescale
+                sum_weights *= rescale
+                sum_squared_weights *= rescale**2
+            log_weight_offset = max_log_weight
+        weights = np.exp(log_weights - log_weight_offset)
+        weighted_occupancy += weights @ occupied[is_consistent]
+        sum_weights += float(weights.sum())
+        sum_squared_weights += float((weights**2).sum())
+
+    stats = SamplingStats(
+        num_samples=num_samples,
+        num_consistent=num_consistent,
+        elapsed_time=time.perf_counter() - start_time,
+        effective_sample_size=(
+            sum_weights**2 / sum_squared_weights if sum_squared_weights > 0 else 0.0
+        ),
+    )
+    if sum_weights == 0:
+        return np.zeros((num_rows, num_cols)), stats
+    return (weighted_occupancy / sum_weights).reshape(num_rows, num_cols), stats
+
+
+class MonteCarloBot:
+    """
+    Calls the unguessed square most likely to hold a ship, estimated from fleet layouts
+    sampled within a time budget per move (see estimate_hit_probabilities), so strength
+    can be traded against latency. Falls back to ProbabilityDensityBot when no sampled
+    layout is consistent with the observation, and on boards too large for the
+    placement indexes the sampler needs.
+
+    The number of samples depends on the speed of the machine, so games are only
+    reproducible from a seed with time_budget=None and max_samples set.
+    """
+
+    def __init__(
+        self,
+        time_budget: Optional[float] = 0.02,
+        max_samples: Optional[int] = None,
+        batch_size: int = 256,
+    ):
+        self.time_budget = time_budget
+        self.max_samples = max_samples
+        self.batch_size = batch_size
+        # sampling stats of the last move
+        self.last_stats: Optional[SamplingStats] = None
+        self._fallback_bot = ProbabilityDensityBot()
+
+    def best_squares(
+        self,
+        observation: Observation,
+        rng: random.Random,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> np.ndarray:
+        """
+        should_stop - see estimate_hit_probabilities
+
+        Returns: flat indexes of the squares the bot chooses between (empty if no sampled
+        layout is consistent with the observation)
+        """
+        if not has_placement_index(*observation.guessed.shape):
+            # the sampler needs the placement indexes
+            return self._fallback_bot.best_squares(observation, rng)
+        probabilities, self.last_stats = estimate_hit_probabilities(
+            observation,
+            time_budget=self.time_budget,
+            max_samples=self.max_samples,
+            batch_size=self.batch_size,
+            rng=np.random.default_rng(rng.getrandbits(64)),
+            should_stop=should_stop,
+        )
+        return _best_squares(probabilities, observation)
+
+    def choose_square(
+        self,
+        game_state: BattleshipGameState,
+        our_side: bool,
+        rng: random.Random,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> Tuple[int, int]:
+        """
+        See RandomBot.choose_square
+
+        should_stop - see estimate_hit_probabilities
+        """
+        best_square_idxs = self.best_squares(
+            get_observation(game_state, our_side), rng, should_stop
+        )
+        if len(best_square_idxs) == 0:
+            return self._fallback_bot.choose_square(game_state, our_side, rng)
+        return choose_best_square(best_square_idxs, game_state.num_cols, rng)
+
+
+class ExactInferenceBot:
+    """
+    Calls the unguessed square most likely to hold a ship with every consistent layout
+    equally likely, computed exactly (see ExactInference) once there are few enough
+    layouts to enumerate, which is most of the late game. Plays as MonteCarloBot before
+    that, and on boards too large for the placement indexes.
+
+    The layout sets are cached across moves (and games), which only makes the moves
+    faster: the squares chosen don't depend on the cache.
+    """
+
+    def __init__(
+        self,
+        max_layouts: int = 100000,
+        memory_limit: int = 64 * 2**20,
+        time_budget: Optional[float] = 0.02,
+    ):
+        """
+        max_layouts, memory_limit - see ExactInference
+        time_budget - of the MonteCarloBot used when there are too many layouts
+        """
+        self.max_layouts = max_layouts
+        self.memory_limit = memory_limit
+        # keyed by (num_rows, num_cols)
+        self._engines: Dict[Tuple[int, int], ExactInference] = {}
+        self._fallback_bot = MonteCarloBot(time_budget=time_budget)
+
+    def get_engine(self, num_rows: int, num_cols: int) -> Optional[ExactInference]:
+        if not has_placement_index(num_rows, num_cols):
+            return None
+        if (num_rows, num_cols) not in self._engines:
+            self._engines[num_rows, num_cols] = ExactInference(
+                num_rows,
+                num_cols,
+                max_layouts=self.max_layouts,
+                memory_limit=self.memory_limit,
+            )
+        return self._engines[num_rows, num_cols]
+
+    def best_squares(
+        self,
+        observation: Observation,
+        rng: random.Random,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> np.ndarray:
+        """
+        should_stop - see estimate_hit_probabilities (only used by MonteCarloBot)
+
+        Returns: flat indexes of the squares the bot chooses between (empty if neither
+        the layouts nor MonteCarloBot's samples are consistent with the observation)
+        """
+        num_rows, num_cols = observation.guessed.shape
+        engine = self.get_engine(num_rows, num_cols)
+        layouts = engine.get_layouts(observation) if engine is not None else None
+        if layouts is None or layouts.num_layouts == 0:
+            return self._fallback_bot.best_squares(observation, rng, should_stop)
+        num_hits = layouts.occupancy.sum(axis=0).reshape(num_rows, num_cols)
+        return _best_squares(num_hits, observation)
+
+    def choose_square(
+        self,
+        game_state: BattleshipGameState,
+        our_side: bool,
+        rng: random.Random,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> Tuple[int, int]:
+        """
+        See RandomBot.choose_square
+
+        should_stop - see best_squares
+        """
+        best_square_idxs = self.best_squares(
+            get_observation(game_state, our_side), rng, should_stop
+        )
+        if len(best_square_idxs) == 0:
+            return self._fallback_bot.choose_square(
+                game_state, our_side, rng, should_stop
+            )
+        return choose_best_square(best_square_idxs, game_state.num_cols, rng)
+
+
+# bots by name, for the command line tools
+BOTS = {
+    "random": RandomBot,
+    "parity": ParityBot,
+    "density": ProbabilityDensityBot,
+    "montecarlo": MonteCarloBot,
+    "exact": ExactInferenceBot,
+}
@@ -0,0 +1,154 @@
+import inspect
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional, Tuple
+
+from bots import RandomBot
+from game_state import BattleshipGameState
+
+
+class ComputerTurn:
+    """
+    Chooses the computer's squares off the GUI thread: each move, the bot runs on a
+    clone of the game state in a new daemon thread, and the frame loop polls the move's
+    future every frame. If the bot runs past its deadline, the move is cancelled and the
+    fallback bot's square is used instead.
+
+    A running thread can't be stopped in Python, so cancelling a move asks the bot to
+    stop: bots whose choose_square takes a should_stop callable (e.g. MonteCarloBot and
+    ExactInferenceBot) check it and return early. Until the thread of a cancelled move
+    is done, the next move waits for it rather than running the bot alongside it. A
+    cancelled bot only ever touches its clone, and being a daemon thread it doesn't keep
+    the program from exiting.
+
+    The bot gets a new clone every move, so it mustn't keep state between moves (e.g.
+    RandomBot, ProbabilityDensityBot and MonteCarloBot, but not ParityBot). Caches are
+    fine, as long as they're thread-safe (e.g. ExactInferenceBot's).
+    """
+
+    def __init__(
+        self,
+        bot,
+        deadline: float = 2.0,
+        min_thinking_time: float = 0.5,
+        fallback_bot=None,
+    ):
+        """
+        bot - bot with a choose_square method (see bots.py)
+        deadline - seconds the bot has to choose a square
+        min_thinking_time - seconds before a square is returned, even if the bot is done
+            sooner (so the player can follow the computer's moves)
+        fallback_bot - bot used when the deadline passes (default: RandomBot)
+        """
+        self.bot = bot
+        self.deadline = deadline
+        self.min_thinking_time = min_thinking_time
+        self.fallback_bot = fallback_bot if fallback_bot is not None else RandomBot()
+        # number of moves that ran past their deadline
+        self.num_cancelled_moves = 0
+        self._bot_can_stop = (
+            "should_stop" in inspect.signature(bot.choose_square).parameters
+        )
+        self._future: Optional[Future] = None
+        self._start_time = 0.0
+        # set when the move in progress is cancelled
+        self._stop_event = threading.Event()
+        # the thread of the last move started, which may outlive its move if cancelled
+        self._thread: Optional[threading.Thread] = None
+        # the thread of the move in progress, while it waits for the last one to be done
+        self._waiting_thread: Optional[threading.Thread] = None
+
+    @property
+    def is_thinking(self) -> bool:
+        return self._future is not None
+
+    def start(
+        self, game_state: BattleshipGameState, our_side: bool, rng: random.Random
+    ):
+        """ Starts choosing a square for our side (or the opponent's side) """
+        assert not self.is_thinking, "The computer is already choosing a square"
+        # the worker gets its own generator, since rng isn't shared across threads
+        worker_rng = random.Random(rng.getrandbits(64))
+        future = Future()
+        self._stop_event = threading.Event()
+        thread = threading.Thread(
+            target=self._choose_square,
+            args=(future, game_state.clone(), our_side, worker_rng, self._stop_event),
+            name="computer-turn",
+            daemon=True,
+        )
+        self._future = future
+        self._start_time = time.perf_counter()
+        if self._thread is not None and self._thread.is_alive():
+            # the bot of a cancelled move is still stopping (see poll)
+            self._waiting_thread = thread
+        else:
+            self._thread = thread
+            thread.start()
+
+    def _choose_square(
+        self,
+        future: Future,
+        game_state: BattleshipGameState,
+        our_side: bool,
+        rng: random.Random,
+        stop_event: threading.Event,
+    ):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            if self._bot_can_stop:
+                square = self.bot.choose_square(
+                    game_state, our_side, rng, should_stop=stop_event.is_set
+                )
+            else:
+                square = self.bot.choose_square(game_state, our_side, rng)
+            future.set_result(square)
+        except Exception as e:
+            future.set_exception(e)
+
+    def poll(
+        self, game_state: BattleshipGameState, our_side: bool, rng: random.Random
+    ) -> Optional[Tuple[int, int]]:
+        """
+        Call every frame while is_thinking (with the arguments given to start).
+
+        Returns: (row_idx, col_idx) of the chosen square once the bot is done (or past
+        its deadline), otherwise None
+        """
+        if self._future is None:
+            return None
+        if self._waiting_thread is not None and not self._thread.is_alive():
+            self._thread, self._waiting_thread = self._waiting_thread, None
+            self._thread.start()
+        elapsed_time = time.perf_counter() - self._start_time
+        if self._future.done():
+            if elapsed_time < self.min_thinking_time:
+                return None
+            future, self._future = self._future, None
+            # re-raises the bot's exception, if any
+            return future.result()
+        elif elapsed_time >= self.deadline:
+            # a running future can't be cancelled: the bot is asked to stop, and its result
+            # is ignored
+            self._abandon()
+            self.num_cancelled_moves += 1
+            square = self.fallback_bot.choose_square(game_state, our_side, rng)
+        else:
+            return None
+        self._future = None
+        return square
+
+    def cancel(self):
+        """ Abandons the move in progress, if any (e.g. on a new game) """
+        if self._future is not None:
+            self._abandon()
+            self._future = None
+
+    def _abandon(self):
+        self._future.cancel()
+        self._stop_event.set()
+        # a move still waiting for the previous one never runs
+        self._waiting_thread = None
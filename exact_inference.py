@@ -0,0 +1,532 @@
+import hashlib
+import threading
+import numpy as np
+from collections import Counter, OrderedDict, deque
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
+
+from placement_index import get_placement_index, has_placement_index
+
+# bytes charged for each cache entry on top of its arrays (the entry, its key and digest)
+CACHE_ENTRY_OVERHEAD = 512
+# number of the last observations answered that a new observation is checked against,
+# to be filtered from (one per game being played with the engine, in practice)
+NUM_RECENT_OBSERVATIONS = 8
+
+
+class ShipCandidates(NamedTuple):
+    """
+    Every in-bounds placement of a ship shape (in both orientations, if rotation is
+    allowed), from the placement indexes that BattleshipGameState.place_ship checks
+    placements against: the cell masks and buffer masks are flattened over the board.
+    """
+
+    placements: np.ndarray
+    cell_masks: np.ndarray
+    buffer_masks: np.ndarray
+
+
+@lru_cache(maxsize=None)
+def get_ship_candidates(
+    num_rows: int, num_cols: int, ship_dims: Tuple[int, int], rotate_allowed: bool
+) -> ShipCandidates:
+    ship_height, ship_width = ship_dims
+    shapes = [(ship_height, ship_width)]
+    if rotate_allowed and ship_height != ship_width:
+        shapes.append((ship_width, ship_height))
+    indexes = [get_placement_index(num_rows, num_cols, *shape) for shape in shapes]
+    return ShipCandidates(
+        placements=np.concatenate([index.placements for index in indexes]),
+        cell_masks=np.concatenate([index.cell_masks for index in indexes]),
+        buffer_masks=np.concatenate([index.buffer_masks for index in indexes]),
+    )
+
+
+class LayoutSet(NamedTuple):
+    """
+    Layouts of the ships that aren't sunk yet: layout i puts ship j on candidate
+    placement placement_idxs[i, j] of its shape (see get_ship_candidates). Identical
+    ships are in increasing order of their placements, so each layout appears once.
+    """
+
+    ship_dims: Tuple[Tuple[int, int], ...]
+    # (num_layouts, num_ships) candidate placement indexes
+    placement_idxs: np.ndarray
+    # (num_layouts, num_rows * num_cols) Booleans, the squares covered by the ships
+    occupancy: np.ndarray
+
+    @property
+    def num_layouts(self) -> int:
+        return len(self.placement_idxs)
+
+    @property
+    def nbytes(self) -> int:
+        return self.placement_idxs.nbytes + self.occupancy.nbytes
+
+
+class _ObservationKey(NamedTuple):
+    """ An observation (see bots.Observation) as flat Boolean arrays """
+
+    # hits, including the squares of the sunk ships
+    hits: np.ndarray
+    misses: np.ndarray
+    sunk_squares: np.ndarray
+    ship_dims: Tuple[Tuple[int, int], ...]
+
+    def digest(self) -> bytes:
+        hasher = hashlib.blake2b(digest_size=16)
+        for squares in [self.hits, self.misses, self.sunk_squares]:
+            hasher.update(np.packbits(squares).tobytes())
+        hasher.update(repr(self.ship_dims).encode())
+        return hasher.digest()
+
+    def follows(self, other: "_ObservationKey") -> bool:
+        """ True if this observation can come after the other one in a game """
+        if Counter(self.ship_dims) - Counter(other.ship_dims):
+            return False
+        return not (
+            (other.hits & ~self.hits).any()
+            or (other.misses & ~self.misses).any()
+            or (other.sunk_squares & ~self.sunk_squares).any()
+        )
+
+
+class _CacheEntry(NamedTuple):
+    observation_key: _ObservationKey
+    # None if there are too many layouts to enumerate
+    layouts: Optional[LayoutSet]
+
+    @property
+    def nbytes(self) -> int:
+        observation_key = self.observation_key
+        nbytes = CACHE_ENTRY_OVERHEAD + sum(
+            squares.nbytes
+            for squares in [
+                observation_key.hits,
+                observation_key.misses,
+                observation_key.sunk_squares,
+            ]
+        )
+        if self.layouts is not None:
+            nbytes += self.layouts.nbytes
+        return nbytes
+
+
+class _PartialLayouts(NamedTuple):
+    """
+    Layouts being enumerated, with their placements so far (numbered as in
+    ExactInference._enumerate, -1 for the ships not placed yet)
+    """
+
+    placements: np.ndarray
+    num_placed: np.ndarray
+    occupancy: np.ndarray
+    # squares the next ships can't cover: the observation's, and those covered by or next
+    # to the ships placed
+    blocked: np.ndarray
+    # number of ships left to place, of each type
+    remaining: np.ndarray
+
+    @property
+    def num_layouts(self) -> int:
+        return len(self.placements)
+
+    def expand(
+        self,
+        is_expanded: np.ndarray,
+        layout_idxs: np.ndarray,
+        placement_idxs: np.ndarray,
+        placement_table: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    ) -> "_PartialLayouts":
+        """
+        Returns: the layouts that aren't expanded, followed by the expanded layouts
+        layout_idxs (indexing the expanded layouts) with one more placement each
+        """
+        type_ids, cell_masks, buffer_masks = placement_table
+        is_kept = ~is_expanded
+        source_idxs = np.flatnonzero(is_expanded)[layout_idxs]
+        new_idxs = np.arange(len(source_idxs))
+        placements = self.placements[source_idxs]
+        placements[new_idxs, self.num_placed[source_idxs]] = placement_idxs
+        remaining = self.remaining[source_idxs]
+        remaining[new_idxs, type_ids[placement_idxs]] -= 1
+        return _PartialLayouts(
+            placements=np.concatenate([self.placements[is_kept], placements]),
+            num_placed=np.concatenate(
+                [self.num_placed[is_kept], self.num_placed[source_idxs] + 1]
+            ),
+            occupancy=np.concatenate(
+                [
+                    self.occupancy[is_kept],
+                    self.occupancy[source_idxs] | cell_masks[placement_idxs],
+                ]
+            ),
+            blocked=np.concatenate(
+                [
+                    self.blocked[is_kept],
+                    self.blocked[source_idxs] | buffer_masks[placement_idxs],
+                ]
+            ),
+            remaining=np.concatenate([self.remaining[is_kept], remaining]),
+        )
+
+
+class ExactInference:
+    """
+    Enumerates every layout of the remaining ships consistent with an observation (the
+    hits, misses and sunk ships of one side), with the same rules as
+    BattleshipGameState.place_ship: ships in bounds, and not touching each other, even
+    diagonally.
+
+    Layout sets are cached in an LRU cache keyed by a hash of the observation. The layouts
+    of a new observation are filtered from the cached set of one of the last observations
+    answered that it follows (usually the previous move of the same game), instead of
+    being enumerated again, so a move costs less as the game goes on and the sets shrink.
+    """
+
+    def __init__(
+        self,
+        num_rows: int,
+        num_cols: int,
+        rotate_allowed: bool = True,
+        max_layouts: int = 100000,
+        memory_limit: int = 64 * 2**20,
+        max_entries: int = 10000,
+    ):
+        """
+        max_layouts - give up enumerating once there are more (partial) layouts than this
+        memory_limit - bytes kept in the cache (layouts, observations and a fixed overhead
+            per entry, see CACHE_ENTRY_OVERHEAD), evicting the least recently used entries
+            beyond it
+        max_entries - number of entries kept in the cache, evicting the least recently
+            used entries beyond it
+        """
+        assert has_placement_index(
+            num_rows, num_cols
+        ), "Exact inference needs the placement indexes"
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.rotate_allowed = rotate_allowed
+        self.max_layouts = max_layouts
+        self.memory_limit = memory_limit
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[bytes, _CacheEntry]" = OrderedDict()
+        self._cache_nbytes = 0
+        # digests of the last observations answered, the most recent last
+        self._recent_digests: "deque[bytes]" = deque(maxlen=NUM_RECENT_OBSERVATIONS)
+        # a bot abandoned past its deadline (see ComputerTurn) may still be using the cache
+        self._lock = threading.Lock()
+        # how each call to get_layouts was answered
+        self.num_cache_hits = 0
+        self.num_filtered = 0
+        self.num_enumerated = 0
+
+    def _normalize_dims(self, ship_dims: Tuple[int, int]) -> Tuple[int, int]:
+        ship_height, ship_width = ship_dims
+        if self.rotate_allowed:
+            return max(ship_height, ship_width), min(ship_height, ship_width)
+        return ship_height, ship_width
+
+    def _observation_key(self, observation) -> _ObservationKey:
+        # largest ships first, keeps the partial layouts fewer while enumerating, and
+        # identical ships next to each other
+        ship_dims = sorted(
+            (self._normalize_dims(dims) for dims in observation.remaining_ship_dims),
+            key=lambda dims: (-dims[0] * dims[1], dims),
+        )
+        # copies, the cached keys must not change with the caller's arrays
+        sunk_squares = np.array(observation.sunk_squares, dtype=bool).ravel()
+        return _ObservationKey(
+            hits=np.asarray(observation.hits, dtype=bool).ravel() | sunk_squares,
+            misses=np.array(observation.misses, dtype=bool).ravel(),
+            sunk_squares=sunk_squares,
+            ship_dims=tuple(ship_dims),
+        )
+
+    def _candidates(self, ship_dims: Tuple[int, int]) -> ShipCandidates:
+        return get_ship_candidates(
+            self.num_rows, self.num_cols, ship_dims, self.rotate_allowed
+        )
+
+    def get_layouts(self, observation) -> Optional[LayoutSet]:
+        """
+        observation - what one side knows of the other side's board (see bots.Observation)
+
+        Returns: the consistent layouts of the remaining ships, or None if there are too
+        many to enumerate
+        """
+        observation_key = self._observation_key(observation)
+        with self._lock:
+            return self._get_layouts(observation_key)
+
+    def _get_layouts(self, observation_key: _ObservationKey) -> Optional[LayoutSet]:
+        digest = observation_key.digest()
+        if digest in self._cache:
+            self._cache.move_to_end(digest)
+            self._add_recent(digest)
+            self.num_cache_hits += 1
+            return self._cache[digest].layouts
+
+        # only the last observations answered are candidate ancestors, so a lookup costs
+        # the same however large the cache is
+        ancestor_digest, ancestor = None, None
+        for recent_digest in self._recent_digests:
+            entry = self._cache.get(recent_digest)
+            if (
+                entry is not None
+                and entry.layouts is not None
+                and observation_key.follows(entry.observation_key)
+                and (
+                    ancestor is None
+                    or entry.layouts.num_layouts < ancestor.layouts.num_layouts
+                )
+            ):
+                ancestor_digest, ancestor = recent_digest, entry
+        if ancestor is not None:
+            self._cache.move_to_end(ancestor_digest)
+            layouts = self._filter(
+                ancestor.layouts, ancestor.observation_key, observation_key
+            )
+            self.num_filtered += 1
+        else:
+            layouts = self._enumerate(observation_key)
+            self.num_enumerated += 1
+        self._store(digest, _CacheEntry(observation_key, layouts))
+        self._add_recent(digest)
+        return layouts
+
+    def _add_recent(self, digest: bytes):
+        if digest in self._recent_digests:
+            self._recent_digests.remove(digest)
+        self._recent_digests.append(digest)
+
+    def hit_probabilities(self, observation) -> Optional[np.ndarray]:
+        """
+        Returns: (num_rows, num_cols) array of the probability that each square holds one
+        of the remaining ships, with every consistent layout equally likely (None if there
+        are too many layouts to enumerate)
+        """
+        layouts = self.get_layouts(observation)
+        if layouts is None:
+            return None
+        if layouts.num_layouts == 0:
+            raise ValueError(
+                "No layout of the ships is consistent with the observation"
+            )
+        return layouts.occupancy.mean(axis=0).reshape(self.num_rows, self.num_cols)
+
+    def _store(self, digest: bytes, entry: _CacheEntry):
+        nbytes = entry.nbytes
+        if nbytes > self.memory_limit or self.max_entries == 0:
+            return
+        self._cache[digest] = entry
+        self._cache_nbytes += nbytes
+        while (
+            self._cache_nbytes > self.memory_limit
+            or len(self._cache) > self.max_entries
+        ):
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_nbytes -= evicted.nbytes
+
+    def _enumerate(self, observation_key: _ObservationKey) -> Optional[LayoutSet]:
+        """
+        The hits are covered first: the lowest uncovered hit of each partial layout must
+        be covered by one of the ships left to place, which prunes far more than checking
+        the hits at the end. The other ships are then placed on the remaining squares,
+        identical ships in increasing order, so each layout is enumerated once.
+        """
+        sunk_buffer = _dilate(
+            observation_key.sunk_squares.reshape(self.num_rows, self.num_cols)
+        ).ravel()
+        blocked = observation_key.misses | sunk_buffer
+        hits = observation_key.hits & ~observation_key.sunk_squares
+
+        # the placements of every ship type that fit the observation, numbered by ship type
+        # then candidate index, so sorting a layout's placements puts them in slot order
+        ship_types = sorted(
+            set(observation_key.ship_dims), key=observation_key.ship_dims.index
+        )
+        type_ids, candidate_idxs, cell_masks, buffer_masks = [], [], [], []
+        for type_id, ship_dims in enumerate(ship_types):
+            candidates = self._candidates(ship_dims)
+            idxs = np.flatnonzero(_is_candidate_consistent(candidates, blocked, hits))
+            type_ids.append(np.full(len(idxs), type_id))
+            candidate_idxs.append(idxs)
+            cell_masks.append(candidates.cell_masks[idxs])
+            buffer_masks.append(candidates.buffer_masks[idxs])
+        type_offsets = np.cumsum([0] + [len(idxs) for idxs in candidate_idxs])
+        type_ids = np.concatenate(type_ids)
+        candidate_idxs = np.concatenate(candidate_idxs)
+        cell_masks = np.concatenate(cell_masks)
+        buffer_masks = np.concatenate(buffer_masks)
+        placement_table = (type_ids, cell_masks, buffer_masks)
+
+        num_ships = len(observation_key.ship_dims)
+        partial = _PartialLayouts(
+            placements=np.full((1, num_ships), -1, dtype=np.int32),
+            num_placed=np.zeros(1, dtype=np.int32),
+            occupancy=np.zeros((1, len(blocked)), dtype=bool),
+            blocked=blocked[np.newaxis, :].copy(),
+            remaining=np.array(
+                [[observation_key.ship_dims.count(dims) for dims in ship_types]]
+            ),
+        )
+
+        # cover the hits
+        covers_hit = (cell_masks & hits).any(axis=1)
+        hit_idxs = np.flatnonzero(covers_hit)
+        while True:
+            uncovered_hits = hits & ~partial.occupancy
+            is_expanded = uncovered_hits.any(axis=1)
+            if not is_expanded.any():
+                break
+            lowest_hits = np.argmax(uncovered_hits[is_expanded], axis=1)
+            is_valid = (
+                cell_masks[hit_idxs][:, lowest_hits].T
+                & (partial.remaining[is_expanded][:, type_ids[hit_idxs]] > 0)
+                & _fits(partial.blocked[is_expanded], cell_masks[hit_idxs])
+            )
+            layout_idxs, valid_idxs = np.nonzero(is_valid)
+            if (~is_expanded).sum() + len(layout_idxs) > self.max_layouts:
+                return None
+            partial = partial.expand(
+                is_expanded, layout_idxs, hit_idxs[valid_idxs], placement_table
+            )
+
+        # place the other ships, each type in increasing order
+        for type_id in range(len(ship_types)):
+            type_idxs = np.arange(type_offsets[type_id], type_offsets[type_id + 1])
+            previous_idxs = np.full(partial.num_layouts, -1)
+            while (partial.remaining[:, type_id] > 0).any():
+                is_expanded = partial.remaining[:, type_id] > 0
+                is_valid = _fits(
+                    partial.blocked[is_expanded], cell_masks[type_idxs]
+                ) & (
+                    type_idxs[np.newaxis, :] > previous_idxs[is_expanded][:, np.newaxis]
+                )
+                layout_idxs, valid_idxs = np.nonzero(is_valid)
+                if (~is_expanded).sum() + len(layout_idxs) > self.max_layouts:
+                    return None
+                previous_idxs = np.concatenate(
+                    [previous_idxs[~is_expanded], type_idxs[valid_idxs]]
+                )
+                partial = partial.expand(
+                    is_expanded, layout_idxs, type_idxs[valid_idxs], placement_table
+                )
+
+        placements = np.sort(partial.placements, axis=1)
+        return LayoutSet(
+            ship_dims=observation_key.ship_dims,
+            placement_idxs=candidate_idxs[placements].astype(np.int32),
+            occupancy=partial.occupancy,
+        )
+
+    def _filter(
+        self,
+        layouts: LayoutSet,
+        ancestor_key: _ObservationKey,
+        observation_key: _ObservationKey,
+    ) -> LayoutSet:
+        new_misses = np.flatnonzero(observation_key.misses & ~ancestor_key.misses)
+        new_hits = np.flatnonzero(observation_key.hits & ~ancestor_key.hits)
+        is_consistent = ~layouts.occupancy[:, new_misses].any(
+            axis=1
+        ) & layouts.occupancy[:, new_hits].all(axis=1)
+        ship_dims = list(layouts.ship_dims)
+        placement_idxs = layouts.placement_idxs[is_consistent]
+        occupancy = layouts.occupancy[is_consistent]
+
+        # the newly sunk ships: keep the layouts with a ship of the same shape on exactly
+        # the sunk squares, and take that ship out of them
+        new_sunk_squares = observation_key.sunk_squares & ~ancestor_key.sunk_squares
+        for sunk_ship_mask in _connected_components(
+            new_sunk_squares.reshape(self.num_rows, self.num_cols)
+        ):
+            sunk_ship_mask = sunk_ship_mask.ravel()
+            is_sunk_ship = np.zeros(placement_idxs.shape, dtype=bool)
+            for ship_idx, dims in enumerate(ship_dims):
+                candidates = self._candidates(dims)
+                is_sunk_ship[:, ship_idx] = (
+                    candidates.cell_masks[placement_idxs[:, ship_idx]] == sunk_ship_mask
+                ).all(axis=1)
+            # at most one ship of a layout can be on the sunk squares
+            has_sunk_ship = is_sunk_ship.any(axis=1)
+            if not has_sunk_ship.any():
+                placement_idxs = placement_idxs[:0, :-1]
+                occupancy = occupancy[:0]
+                ship_dims = ship_dims[:-1]
+                continue
+            sunk_ship_idx = int(np.argmax(is_sunk_ship.any(axis=0)))
+            placement_idxs = placement_idxs[has_sunk_ship]
+            occupancy = occupancy[has_sunk_ship] & ~sunk_ship_mask
+            is_sunk_ship = is_sunk_ship[has_sunk_ship]
+            # identical ships may be in any slot, so drop the matching slot of each layout
+            num_layouts, num_ships = placement_idxs.shape
+            placement_idxs = placement_idxs[~is_sunk_ship].reshape(
+                num_layouts, num_ships - 1
+            )
+            del ship_dims[sunk_ship_idx]
+
+        # a ship whose squares are all hit would have been sunk
+        hits = observation_key.hits & ~observation_key.sunk_squares
+        is_consistent = np.ones(len(placement_idxs), dtype=bool)
+        for ship_idx, dims in enumerate(ship_dims):
+            candidates = self._candidates(dims)
+            is_consistent &= (
+                candidates.cell_masks[placement_idxs[:, ship_idx]] & ~hits
+            ).any(axis=1)
+        return LayoutSet(
+            ship_dims=tuple(ship_dims),
+            placement_idxs=placement_idxs[is_consistent],
+            occupancy=occupancy[is_consistent],
+        )
+
+
+def _fits(blocked: np.ndarray, cell_masks: np.ndarray) -> np.ndarray:
+    """ Returns: (num_layouts, num_placements) True if the placement covers no blocked square """
+    return (blocked.astype(np.float32) @ cell_masks.T.astype(np.float32)) == 0
+
+
+def _is_candidate_consistent(
+    candidates: ShipCandidates, blocked: np.ndarray, hits: np.ndarray
+) -> np.ndarray:
+    """
+    Which placements fit the observation on their own: they cover no blocked square, no
+    hit is next to them without being covered (ships don't touch), and they don't cover
+    only hits (the ship would have been sunk)
+    """
+    return (
+        ~(candidates.cell_masks & blocked).any(axis=1)
+        & ~(candidates.buffer_masks & ~candidates.cell_masks & hits).any(axis=1)
+        & (candidates.cell_masks & ~hits).any(axis=1)
+    )
+
+
+def _dilate(squares: np.ndarray) -> np.ndarray:
+    """ The squares and their 8 neighbors """
+    padded = np.pad(squares, 1)
+    num_rows, num_cols = squares.shape
+    dilated = np.zeros_like(squares)
+    for row_offset in range(3):
+        for col_offset in range(3):
+            dilated |= padded[
+                row_offset : row_offset + num_rows, col_offset : col_offset + num_cols
+            ]
+    return dilated
+
+
+def _connected_components(squares: np.ndarray) -> List[np.ndarray]:
+    """ Masks of the groups of squares touching each other (including diagonally) """
+    components = []
+    remaining = squares.copy()
+    while remaining.any():
+        component = np.zeros_like(remaining)
+        component[np.unravel_index(np.argmax(remaining), remaining.shape)] = True
+        while True:
+            grown = _dilate(component) & remaining
+            if (grown == component).all():
+                break
+            component = grown
+        components.append(component)
+        remaining &= ~component
+    return components
@@ -0,0 +1,239 @@
+import numpy as np
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+
+def _group_ship_types(
+    ship_dims: List[Tuple[int, int]], rotate_allowed: bool
+) -> Tuple[List[List[Tuple[int, int]]], Tuple[int, ...]]:
+    """
+    Groups identical ships together (a (3, 1) ship and a (1, 3) ship are identical if
+    rotation is allowed), since swapping two identical ships doesn't change a layout.
+
+    Returns: the list of distinct ship shapes for each ship type, and the number of ships of each type
+    """
+    ship_types = []
+    type_counts = []
+    for ship_height, ship_width in ship_dims:
+        shapes = [(ship_height, ship_width)]
+        if rotate_allowed and ship_height != ship_width:
+            shapes.append((ship_width, ship_height))
+        shapes = sorted(shapes)
+        if shapes in ship_types:
+            type_counts[ship_types.index(shapes)] += 1
+        else:
+            ship_types.append(shapes)
+            type_counts.append(1)
+    return ship_types, tuple(type_counts)
+
+
+def _placements_by_square(
+    ship_types: List[List[Tuple[int, int]]], num_rows: int, num_cols: int
+) -> List[List[List[Tuple[int, int, Tuple[int, int, int, int]]]]]:
+    """
+    For every square (in row-major order) and every ship type, lists the placements
+    with their top-left corner on that square, as (cell mask, buffer mask, placement).
+    Both masks are shifted so that bit 0 is the top-left square: squares before the
+    top-left square in row-major order can't be used by ships placed later on.
+    """
+    placements_by_square = []
+    for square_idx in range(num_rows * num_cols):
+        top_row_idx, left_col_idx = divmod(square_idx, num_cols)
+        placements_by_type = []
+        for shapes in ship_types:
+            placements = []
+            for ship_height, ship_width in shapes:
+                if (
+                    top_row_idx + ship_height > num_rows
+                    or left_col_idx + ship_width > num_cols
+                ):
+                    continue
+                cell_mask, buffer_mask = 0, 0
+                for r in range(top_row_idx - 1, top_row_idx + ship_height + 1):
+                    for c in range(left_col_idx - 1, left_col_idx + ship_width + 1):
+                        if not (0 <= r < num_rows and 0 <= c < num_cols):
+                            continue
+                        bit = 1 << (r * num_cols + c)
+                        buffer_mask |= bit
+                        if (
+                            top_row_idx <= r < top_row_idx + ship_height
+                            and left_col_idx <= c < left_col_idx + ship_width
+                        ):
+                            cell_mask |= bit
+                placements.append(
+                    (
+                        cell_mask >> square_idx,
+                        buffer_mask >> square_idx,
+                        (top_row_idx, left_col_idx, ship_height, ship_width),
+                    )
+                )
+            placements_by_type.append(placements)
+        placements_by_square.append(placements_by_type)
+    return placements_by_square
+
+
+def _successors(
+    blocked: int,
+    remaining: Tuple[int, ...],
+    placements_by_type: List[List[Tuple[int, int, Tuple[int, int, int, int]]]],
+):
+    """
+    Yields the transitions out of a state at the current square: either no ship has its
+    top-left corner here (placement is None), or one of the remaining ships does.
+    """
+    yield (blocked >> 1, remaining), None
+    if blocked & 1:
+        return
+    for type_idx, placements in enumerate(placements_by_type):
+        if remaining[type_idx] == 0:
+            continue
+        next_remaining = (
+            remaining[:type_idx]
+            + (remaining[type_idx] - 1,)
+            + remaining[type_idx + 1 :]
+        )
+        for cell_mask, buffer_mask, placement in placements:
+            if blocked & cell_mask:
+                continue
+            yield ((blocked | buffer_mask) >> 1, next_remaining), placement
+
+
+def _get_initial_blocked(available_squares) -> int:
+    """ The unavailable squares as a bitmask, in row-major order """
+    initial_blocked = 0
+    if available_squares is not None:
+        for square_idx, is_available in enumerate(
+            np.asarray(available_squares, dtype=bool).ravel().tolist()
+        ):
+            if not is_available:
+                initial_blocked |= 1 << square_idx
+    return initial_blocked
+
+
+def has_legal_layout(
+    ship_dims: List[Tuple[int, int]],
+    num_rows: int,
+    num_cols: int,
+    rotate_allowed: bool = True,
+    available_squares=None,
+) -> bool:
+    """
+    Whether there is any legal fleet layout (see compute_exact_placement_distribution).
+
+    A depth-first search over the same states, placing a ship at each square before
+    leaving it empty and remembering the states that can't be completed: it stops at the
+    first layout found, which is quick unless the fleet barely fits, and otherwise never
+    expands a state twice.
+
+    available_squares - grid of Booleans, where True is a square that is available (default: all)
+    """
+    ship_types, type_counts = _group_ship_types(ship_dims, rotate_allowed)
+    placements_by_square = _placements_by_square(ship_types, num_rows, num_cols)
+    num_squares = num_rows * num_cols
+    all_placed = tuple(0 for _ in type_counts)
+    if type_counts == all_placed:
+        return True
+
+    def next_states(square_idx: int, state):
+        successors = _successors(state[0], state[1], placements_by_square[square_idx])
+        # placing a ship first, leaving the square empty last
+        return reversed([next_state for next_state, _ in successors])
+
+    initial_state = (_get_initial_blocked(available_squares), type_counts)
+    dead_states = set()
+    stack = [(0, initial_state, next_states(0, initial_state))]
+    while stack:
+        square_idx, state, successors = stack[-1]
+        next_state = next(successors, None)
+        if next_state is None:
+            dead_states.add((square_idx, state))
+            stack.pop()
+            continue
+        if next_state[1] == all_placed:
+            return True
+        if square_idx + 1 < num_squares and (
+            (square_idx + 1, next_state) not in dead_states
+        ):
+            stack.append(
+                (square_idx + 1, next_state, next_states(square_idx + 1, next_state))
+            )
+    return False
+
+
+def compute_exact_placement_distribution(
+    ship_dims: List[Tuple[int, int]],
+    num_rows: int,
+    num_cols: int,
+    rotate_allowed: bool = True,
+    available_squares=None,
+) -> Tuple[np.ndarray, int]:
+    """
+    Computes the exact probability that each square is occupied by a ship, when every legal
+    fleet layout (in bounds, on available squares, no two ships touching, even diagonally)
+    is equally likely. Note this is the uniform distribution over layouts, which is not
+    exactly the distribution that random_ships_placement samples from.
+
+    Ships are placed in row-major order of their top-left corners, so the state of the
+    search at a square is just the availability of the squares from there onwards plus the
+    ships still left to place. The number of layouts through each state is memoized in a
+    forward pass, and the number of ways to complete each state in a backward pass; the
+    number of layouts using a placement is the product of the two.
+
+    available_squares - grid of Booleans, where True is a square that is available (default: all)
+
+    Returns: (num_rows, num_cols) array of occupancy probabilities, and the number of legal layouts
+    (counting identical ships as interchangeable)
+    """
+    ship_types, type_counts = _group_ship_types(ship_dims, rotate_allowed)
+    placements_by_square = _placements_by_square(ship_types, num_rows, num_cols)
+    num_squares = num_rows * num_cols
+
+    initial_blocked = _get_initial_blocked(available_squares)
+
+    # forward pass: number of ways to reach each state
+    layers = [{(initial_blocked, type_counts): 1}]
+    for square_idx in range(num_squares):
+        next_layer = defaultdict(int)
+        for (blocked, remaining), num_ways in layers[square_idx].items():
+            for next_state, _ in _successors(
+                blocked, remaining, placements_by_square[square_idx]
+            ):
+                next_layer[next_state] += num_ways
+        layers.append(next_layer)
+
+    # backward pass: number of ways to complete each state, accumulating the number of
+    # layouts that use each placement along the way
+    all_placed = tuple(0 for _ in type_counts)
+    completions = {state: int(state[1] == all_placed) for state in layers[num_squares]}
+    placement_counts: Dict[Tuple[int, int, int, int], int] = defaultdict(int)
+    for square_idx in range(num_squares - 1, -1, -1):
+        square_completions = {}
+        for state, num_ways in layers[square_idx].items():
+            total = 0
+            for next_state, placement in _successors(
+                state[0], state[1], placements_by_square[square_idx]
+            ):
+                next_completions = completions[next_state]
+                total += next_completions
+                if placement is not None and next_completions:
+                    placement_counts[placement] += num_ways * next_completions
+            square_completions[state] = total
+        completions = square_completions
+        layers.pop()
+
+    num_layouts = completions[(initial_blocked, type_counts)]
+    if num_layouts == 0:
+        raise ValueError("There is no legal layout of the ships on the board")
+
+    occupancy_counts = [[0] * num_cols for _ in range(num_rows)]
+    for placement, count in placement_counts.items():
+        top_row_idx, left_col_idx, ship_height, ship_width = placement
+        for r in range(top_row_idx, top_row_idx + ship_height):
+            for c in range(left_col_idx, left_col_idx + ship_width):
+                occupancy_counts[r][c] += count
+
+    distribution = np.array(
+        [[count / num_layouts for count in row] for row in occupancy_counts],
+        dtype=np.float64,
+    )
+    return distribution, num_layouts
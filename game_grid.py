@@ -1,3 +1,4 @@
+import numpy as np
 from typing import Optional, List
 
 
@@ -21,6 +22,13 @@ class GameGrid:
     def __repr__(self):
         return self._grid.__repr__()
 
+    def copy(self) -> "GameGrid":
+        grid_copy = type(self).__new__(type(self))
+        grid_copy._grid = [list(row) for row in self._grid]
+        grid_copy._num_rows = self._num_rows
+        grid_copy._num_cols = self._num_cols
+        return grid_copy
+
     @property
     def num_rows(self) -> int:
         return self._num_rows
@@ -64,6 +72,269 @@ class GameGrid:
             ), f"Update entire grid error: incorrect number of columns in row index {row_idx}"
             new_row = []
             for new_value in row:
-                new_row.append(row)
+                new_row.append(new_value)
             new_grid.append(new_row)
-        self._grid = new_grid
\ No newline at end of file
+        self._grid = new_grid
+
+
+def popcount(mask: int) -> int:
+    return bin(mask).count("1")
+
+
+class BitboardGameGrid:
+    """
+    Same interface as GameGrid, but each value stored in the grid (other than the
+    initial value) is kept as a bitboard: a Python int with bit (row_idx * num_cols + col_idx)
+    set for every square holding that value. A ship locations grid then holds one mask
+    per ship, and a guesses grid holds one mask for hits and one for misses, so overlap,
+    hit and "any ship alive" checks become a few integer AND operations.
+    """
+
+    def __init__(
+        self,
+        num_rows: int,
+        num_cols: int,
+        initial_value: Optional,
+    ):
+        self._num_rows = num_rows
+        self._num_cols = num_cols
+        self._initial_value = initial_value
+        self._value_masks = {}
+
+    def __repr__(self):
+        return self.grid.__repr__()
+
+    def copy(self) -> "BitboardGameGrid":
+        grid_copy = type(self).__new__(type(self))
+        grid_copy._num_rows = self._num_rows
+        grid_copy._num_cols = self._num_cols
+        grid_copy._initial_value = self._initial_value
+        grid_copy._value_masks = dict(self._value_masks)
+        return grid_copy
+
+    @property
+    def num_rows(self) -> int:
+        return self._num_rows
+
+    @property
+    def num_cols(self) -> int:
+        return self._num_cols
+
+    @property
+    def initial_value(self):
+        return self._initial_value
+
+    @property
+    def grid(self) -> List[List]:
+        return [
+            [self.read_grid(row_idx, col_idx) for col_idx in range(self._num_cols)]
+            for row_idx in range(self._num_rows)
+        ]
+
+    def are_indexes_valid(self, row_idx: int, col_idx: int) -> bool:
+        return (0 <= row_idx < self._num_rows) and (0 <= col_idx < self._num_cols)
+
+    def _check_indexes(self, row_idx: int, col_idx: int):
+        assert self.are_indexes_valid(
+            row_idx, col_idx
+        ), f"Error! Index ({row_idx}, {col_idx}) is out of bounds!"
+
+    def cell_mask(self, row_idx: int, col_idx: int) -> int:
+        self._check_indexes(row_idx, col_idx)
+        return 1 << (row_idx * self._num_cols + col_idx)
+
+    def rect_mask(
+        self, top_row_idx: int, left_col_idx: int, height: int, width: int
+    ) -> int:
+        """ Mask of the rectangle, clipped to the grid bounds """
+        bottom_row_idx = min(self._num_rows, top_row_idx + height)
+        right_col_idx = min(self._num_cols, left_col_idx + width)
+        top_row_idx, left_col_idx = max(0, top_row_idx), max(0, left_col_idx)
+        if top_row_idx >= bottom_row_idx or left_col_idx >= right_col_idx:
+            return 0
+        row_mask = ((1 << (right_col_idx - left_col_idx)) - 1) << left_col_idx
+        mask = 0
+        for row_idx in range(top_row_idx, bottom_row_idx):
+            mask |= row_mask << (row_idx * self._num_cols)
+        return mask
+
+    def value_mask(self, value) -> int:
+        """ Mask of the squares holding the value (must not be the initial value) """
+        return self._value_masks.get(value, 0)
+
+    def occupied_mask(self) -> int:
+        """ Mask of the squares holding any value other than the initial value """
+        mask = 0
+        for value_mask in self._value_masks.values():
+            mask |= value_mask
+        return mask
+
+    def clear_value(self, value):
+        """ Reset every square holding the value back to the initial value """
+        self._value_masks.pop(value, None)
+
+    def set_value_mask(self, value, mask: int):
+        """ Set every square in the mask to the value (must not be the initial value) """
+        for other_value in list(self._value_masks):
+            self._value_masks[other_value] &= ~mask
+        self._value_masks[value] = self._value_masks.get(value, 0) | mask
+
+    def read_grid(self, row_idx: int, col_idx: int):
+        bit = self.cell_mask(row_idx, col_idx)
+        for value, mask in self._value_masks.items():
+            if mask & bit:
+                return value
+        return self._initial_value
+
+    def update_grid(self, row_idx: int, col_idx: int, new_value):
+        bit = self.cell_mask(row_idx, col_idx)
+        for value, mask in self._value_masks.items():
+            if mask & bit:
+                self._value_masks[value] = mask & ~bit
+                break
+        if new_value != self._initial_value:
+            self._value_masks[new_value] = self._value_masks.get(new_value, 0) | bit
+
+    def update_entire_grid(self, new_values: List[List]):
+        assert (
+            len(new_values) == self._num_rows
+        ), f"Update entire grid error: incorrect number of rows"
+        value_masks = {}
+        for row_idx in range(len(new_values)):
+            row = new_values[row_idx]
+            assert (
+                len(row) == self._num_cols
+            ), f"Update entire grid error: incorrect number of columns in row index {row_idx}"
+            for col_idx, new_value in enumerate(row):
+                if new_value != self._initial_value:
+                    value_masks[new_value] = value_masks.get(new_value, 0) | (
+                        1 << (row_idx * self._num_cols + col_idx)
+                    )
+        self._value_masks = value_masks
+
+
+class NumpyGameGrid:
+    """
+    Same interface as GameGrid, but the squares are stored in a 2d numpy array of value
+    codes (0 is the initial value), with a table from code to value. Rectangle and
+    whole-grid queries are numpy operations instead of Python scans, for large boards.
+    """
+
+    def __init__(
+        self,
+        num_rows: int,
+        num_cols: int,
+        initial_value: Optional,
+    ):
+        self._num_rows = num_rows
+        self._num_cols = num_cols
+        self._initial_value = initial_value
+        self._codes = np.zeros((num_rows, num_cols), dtype=np.int32)
+        self._values = [initial_value]
+        self._value_codes = {initial_value: 0}
+
+    def __repr__(self):
+        return self.grid.__repr__()
+
+    def copy(self) -> "NumpyGameGrid":
+        grid_copy = type(self).__new__(type(self))
+        grid_copy._num_rows = self._num_rows
+        grid_copy._num_cols = self._num_cols
+        grid_copy._initial_value = self._initial_value
+        grid_copy._codes = self._codes.copy()
+        grid_copy._values = list(self._values)
+        grid_copy._value_codes = dict(self._value_codes)
+        return grid_copy
+
+    @property
+    def num_rows(self) -> int:
+        return self._num_rows
+
+    @property
+    def num_cols(self) -> int:
+        return self._num_cols
+
+    @property
+    def initial_value(self):
+        return self._initial_value
+
+    @property
+    def grid(self) -> List[List]:
+        return [[self._values[code] for code in row] for row in self._codes.tolist()]
+
+    def are_indexes_valid(self, row_idx: int, col_idx: int) -> bool:
+        return (0 <= row_idx < self._num_rows) and (0 <= col_idx < self._num_cols)
+
+    def _check_indexes(self, row_idx: int, col_idx: int):
+        assert self.are_indexes_valid(
+            row_idx, col_idx
+        ), f"Error! Index ({row_idx}, {col_idx}) is out of bounds!"
+
+    def _get_code(self, value) -> int:
+        if value not in self._value_codes:
+            self._value_codes[value] = len(self._values)
+            self._values.append(value)
+        return self._value_codes[value]
+
+    def values_array(self) -> np.ndarray:
+        """ 2d numpy object array of the value of every square """
+        values = np.empty(len(self._values), dtype=object)
+        values[:] = self._values
+        return values[self._codes]
+
+    def value_array(self, value) -> np.ndarray:
+        """ 2d Boolean array of the squares holding the value """
+        if value not in self._value_codes:
+            return np.zeros((self._num_rows, self._num_cols), dtype=bool)
+        return self._codes == self._value_codes[value]
+
+    def set_value_array(self, value, squares: np.ndarray):
+        """ Set every square where the 2d Boolean array is True to the value """
+        self._codes[squares] = self._get_code(value)
+
+    def is_rect_empty(
+        self, top_row_idx: int, left_col_idx: int, height: int, width: int
+    ) -> bool:
+        """ True if the rectangle (clipped to the grid) only holds the initial value """
+        return not self._codes[
+            max(0, top_row_idx) : max(0, top_row_idx + height),
+            max(0, left_col_idx) : max(0, left_col_idx + width),
+        ].any()
+
+    def fill_rect(
+        self, top_row_idx: int, left_col_idx: int, height: int, width: int, value
+    ):
+        """ Set every square of the rectangle (which must be in bounds) to the value """
+        self._check_indexes(top_row_idx, left_col_idx)
+        self._check_indexes(top_row_idx + height - 1, left_col_idx + width - 1)
+        self._codes[
+            top_row_idx : top_row_idx + height, left_col_idx : left_col_idx + width
+        ] = self._get_code(value)
+
+    def read_grid(self, row_idx: int, col_idx: int):
+        self._check_indexes(row_idx, col_idx)
+        return self._values[self._codes[row_idx, col_idx]]
+
+    def update_grid(self, row_idx: int, col_idx: int, new_value):
+        self._check_indexes(row_idx, col_idx)
+        self._codes[row_idx, col_idx] = self._get_code(new_value)
+
+    def update_entire_grid(self, new_values: List[List]):
+        assert (
+            len(new_values) == self._num_rows
+        ), f"Update entire grid error: incorrect number of rows"
+        codes = np.zeros((self._num_rows, self._num_cols), dtype=np.int32)
+        for row_idx in range(len(new_values)):
+            row = new_values[row_idx]
+            assert (
+                len(row) == self._num_cols
+            ), f"Update entire grid error: incorrect number of columns in row index {row_idx}"
+            codes[row_idx] = [self._get_code(new_value) for new_value in row]
+        self._codes = codes
+
+
+GRID_BACKENDS = {
+    "list": GameGrid,
+    "bitboard": BitboardGameGrid,
+    "numpy": NumpyGameGrid,
+}
@@ -1,7 +1,27 @@
+import random
+import struct
+import numpy as np
 from tabulate import tabulate
-from game_grid import GameGrid
-from typing import Optional, List, Tuple
+from game_grid import (
+    GameGrid,
+    BitboardGameGrid,
+    NumpyGameGrid,
+    GRID_BACKENDS,
+    popcount,
+)
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, List, Set, Tuple
 
+from instrumentation import (
+    Instrumentation,
+    GAME_OVER,
+    HIT,
+    SHIP_CLEARED,
+    SHIP_PLACED,
+    SHIP_SUNK,
+    SHOT,
+    print_events,
+)
+from placement_index import get_placement_index, has_placement_index
 from ship_placement import random_ships_placement
 
 
@@ -11,6 +31,309 @@ LOCATION_GUESS_MISS = False
 LOCATION_GUESS_HIT = True
 STANDARD_SHIP_DIMENSIONS = [(5, 1), (4, 1), (3, 1), (3, 1), (2, 1)]
 
+# snapshot layout (see BattleshipGameState.to_bytes), little-endian:
+# header: magic, version, num_rows, num_cols, flags, grid backend index, number of ships
+SNAPSHOT_MAGIC = b"BSGS"
+SNAPSHOT_VERSION = 1
+_SNAPSHOT_HEADER = struct.Struct("<4sBHHBBH")
+# one entry per ship: ship height and width, our and the opponent's top-left corner
+# (NOT_PLACED if the ship isn't placed), and whether each side's ship is rotated
+_SNAPSHOT_SHIP = struct.Struct("<HHHHHHB")
+_SNAPSHOT_NOT_PLACED = 0xFFFF
+_SNAPSHOT_IS_MY_TURN = 1
+_SNAPSHOT_IS_GAME_OVER = 2
+_SNAPSHOT_VERBOSE = 4
+
+
+class ShotRecord(NamedTuple):
+    """ The change made to the game state by one call_square, enough to undo it """
+
+    row_idx: int
+    col_idx: int
+    # whose turn it was (True if we took the shot)
+    by_us: bool
+    previous_guess: Optional[bool]
+    # the ship that lost a square of health (None for a miss or a repeated hit)
+    hit_ship_value: Optional[int]
+    sunk: bool
+    was_game_over: bool
+
+
+class PlayerFleet:
+    """
+    Keeps track of one player's ships, in sync with their ship locations grid: which
+    ship is on each square, the bounding box of each ship, how many squares of each
+    ship haven't been hit yet by the opponent, and how many ships are still alive. This
+    makes hit, sink and game over checks O(1) per shot, and placement checks O(ship
+    area), instead of a scan of the whole board.
+    """
+
+    def __init__(self, locations_grid: GameGrid, opponents_guesses_grid: GameGrid):
+        self.locations_grid = locations_grid
+        self.opponents_guesses_grid = opponents_guesses_grid
+        self.ship_at: Dict[Tuple[int, int], int] = {}
+        self.ship_squares: Dict[int, List[Tuple[int, int]]] = {}
+        # (top_row_idx, left_col_idx, bottom_row_idx, right_col_idx) of each ship's squares
+        self.ship_bounds: Dict[int, Tuple[int, int, int, int]] = {}
+        self.remaining_hits: Dict[int, int] = {}
+        self.num_ships_alive = 0
+
+    def copy(
+        self, locations_grid: GameGrid, opponents_guesses_grid: GameGrid
+    ) -> "PlayerFleet":
+        """ A copy of the lookups, in sync with copies of the fleet's grids """
+        fleet_copy = PlayerFleet(locations_grid, opponents_guesses_grid)
+        fleet_copy.ship_at = dict(self.ship_at)
+        fleet_copy.ship_squares = {
+            ship_value: list(squares)
+            for ship_value, squares in self.ship_squares.items()
+        }
+        fleet_copy.ship_bounds = dict(self.ship_bounds)
+        fleet_copy.remaining_hits = dict(self.remaining_hits)
+        fleet_copy.num_ships_alive = self.num_ships_alive
+        return fleet_copy
+
+    def add_ship_square(self, row_idx: int, col_idx: int, ship_value):
+        self.ship_at[(row_idx, col_idx)] = ship_value
+        self.ship_squares.setdefault(ship_value, []).append((row_idx, col_idx))
+        top_row_idx, left_col_idx, bottom_row_idx, right_col_idx = self.ship_bounds.get(
+            ship_value, (row_idx, col_idx, row_idx, col_idx)
+        )
+        self.ship_bounds[ship_value] = (
+            min(top_row_idx, row_idx),
+            min(left_col_idx, col_idx),
+            max(bottom_row_idx, row_idx),
+            max(right_col_idx, col_idx),
+        )
+        if (
+            self.opponents_guesses_grid.read_grid(row_idx, col_idx)
+            != LOCATION_GUESS_HIT
+        ):
+            if self.remaining_hits.get(ship_value, 0) == 0:
+                self.num_ships_alive += 1
+            self.remaining_hits[ship_value] = self.remaining_hits.get(ship_value, 0) + 1
+
+    def add_ship(
+        self,
+        ship_value,
+        top_row_idx: int,
+        left_col_idx: int,
+        ship_height: int,
+        ship_width: int,
+    ):
+        """ Add a ship that isn't in the fleet yet (the grid must already hold it) """
+        squares = [
+            (row_idx, col_idx)
+            for row_idx in range(top_row_idx, top_row_idx + ship_height)
+            for col_idx in range(left_col_idx, left_col_idx + ship_width)
+        ]
+        for square in squares:
+            self.ship_at[square] = ship_value
+        self.ship_squares[ship_value] = squares
+        self.ship_bounds[ship_value] = (
+            top_row_idx,
+            left_col_idx,
+            top_row_idx + ship_height - 1,
+            left_col_idx + ship_width - 1,
+        )
+        if isinstance(self.opponents_guesses_grid, BitboardGameGrid):
+            num_unhit_squares = popcount(
+                self.opponents_guesses_grid.rect_mask(
+                    top_row_idx, left_col_idx, ship_height, ship_width
+                )
+                & ~self.opponents_guesses_grid.value_mask(LOCATION_GUESS_HIT)
+            )
+        else:
+            num_unhit_squares = 0
+            for row_idx, col_idx in squares:
+                if (
+                    self.opponents_guesses_grid.read_grid(row_idx, col_idx)
+                    != LOCATION_GUESS_HIT
+                ):
+                    num_unhit_squares += 1
+        self.remaining_hits[ship_value] = num_unhit_squares
+        if num_unhit_squares > 0:
+            self.num_ships_alive += 1
+
+    def remove_ship(self, ship_value):
+        for square in self.ship_squares.pop(ship_value, []):
+            del self.ship_at[square]
+        self.ship_bounds.pop(ship_value, None)
+        if self.remaining_hits.pop(ship_value, 0) > 0:
+            self.num_ships_alive -= 1
+
+    def clear(self):
+        self.ship_at = {}
+        self.ship_squares = {}
+        self.ship_bounds = {}
+        self.remaining_hits = {}
+        self.num_ships_alive = 0
+
+    def rebuild(self):
+        """ Rebuild the lookups by scanning the ship locations grid """
+        self.clear()
+        for row_idx in range(self.locations_grid.num_rows):
+            for col_idx in range(self.locations_grid.num_cols):
+                ship_value = self.locations_grid.read_grid(row_idx, col_idx)
+                if ship_value != SHIP_LOCATION_EMPTY:
+                    self.add_ship_square(row_idx, col_idx, ship_value)
+
+    def ship_placement(self, ship_value) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Returns: (top_row_idx, left_col_idx, ship_height, ship_width) of the ship, or None
+        if the ship isn't on the grid or its squares don't form a rectangle
+        """
+        if ship_value not in self.ship_bounds:
+            return None
+        top_row_idx, left_col_idx, bottom_row_idx, right_col_idx = self.ship_bounds[
+            ship_value
+        ]
+        ship_height = bottom_row_idx - top_row_idx + 1
+        ship_width = right_col_idx - left_col_idx + 1
+        if len(self.ship_squares[ship_value]) != ship_height * ship_width:
+            return None
+        return top_row_idx, left_col_idx, ship_height, ship_width
+
+    def unregister_hit(self, ship_value):
+        """ Undo register_hit on one of the ship's squares """
+        if self.remaining_hits[ship_value] == 0:
+            self.num_ships_alive += 1
+        self.remaining_hits[ship_value] += 1
+
+    def is_ship_alive(self, ship_value) -> bool:
+        return self.remaining_hits.get(ship_value, 0) > 0
+
+    def register_hit(self, row_idx: int, col_idx: int) -> Optional[int]:
+        """
+        Call when the opponent hits the square for the first time.
+        Returns the value of the ship if the hit sunk it, otherwise None.
+        """
+        ship_value = self.ship_at[(row_idx, col_idx)]
+        self.remaining_hits[ship_value] -= 1
+        if self.remaining_hits[ship_value] == 0:
+            self.num_ships_alive -= 1
+            return ship_value
+        return None
+
+
+# the arrays of UnguessedSquares before any guess, by (num_rows, num_cols)
+_all_unguessed_squares: Dict[Tuple[int, int], Tuple[List[List[int]], List[int]]] = {}
+
+
+class UnguessedSquares:
+    """
+    The squares one player hasn't guessed yet, split by checkerboard parity
+    ((row_idx + col_idx) % 2). Each parity's squares are kept in an array, along with
+    the position of every square in its array: a square is removed by moving the last
+    square of the array into its place, so membership checks, removals, re-adding (for
+    undo) and uniform random sampling are all O(1).
+    """
+
+    def __init__(
+        self, num_rows: int, num_cols: int, guessed: Optional[np.ndarray] = None
+    ):
+        """ guessed - (num_rows x num_cols) Booleans, True for the squares already guessed """
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        if guessed is None and (num_rows, num_cols) in _all_unguessed_squares:
+            parity_squares, positions = _all_unguessed_squares[(num_rows, num_cols)]
+            self._squares = [list(squares) for squares in parity_squares]
+            self._positions = list(positions)
+            return
+
+        num_squares = num_rows * num_cols
+        square_idxs = np.arange(num_squares)
+        parities = (square_idxs // num_cols + square_idxs % num_cols) % 2
+        is_unguessed = np.ones(num_squares, dtype=bool)
+        if guessed is not None:
+            is_unguessed = ~np.asarray(guessed, dtype=bool).ravel()
+
+        # squares are stored as flat indexes (row_idx * num_cols + col_idx)
+        self._squares: List[List[int]] = []
+        positions = np.full(num_squares, -1, dtype=np.int64)
+        for parity in [0, 1]:
+            parity_square_idxs = square_idxs[(parities == parity) & is_unguessed]
+            positions[parity_square_idxs] = np.arange(len(parity_square_idxs))
+            self._squares.append(parity_square_idxs.tolist())
+        # position of each square in its parity's array (-1 if it was guessed)
+        self._positions: List[int] = positions.tolist()
+        if guessed is None:
+            _all_unguessed_squares[(num_rows, num_cols)] = (
+                [list(squares) for squares in self._squares],
+                list(self._positions),
+            )
+
+    def copy(self) -> "UnguessedSquares":
+        squares_copy = UnguessedSquares.__new__(UnguessedSquares)
+        squares_copy.num_rows = self.num_rows
+        squares_copy.num_cols = self.num_cols
+        squares_copy._squares = [list(squares) for squares in self._squares]
+        squares_copy._positions = list(self._positions)
+        return squares_copy
+
+    def __len__(self) -> int:
+        return len(self._squares[0]) + len(self._squares[1])
+
+    def __contains__(self, square: Tuple[int, int]) -> bool:
+        row_idx, col_idx = square
+        return self._positions[row_idx * self.num_cols + col_idx] >= 0
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        for parity_squares in self._squares:
+            for square_idx in parity_squares:
+                yield divmod(square_idx, self.num_cols)
+
+    def count(self, parity: int) -> int:
+        """ The number of unguessed squares with (row_idx + col_idx) % 2 == parity """
+        return len(self._squares[parity])
+
+    def remove(self, row_idx: int, col_idx: int) -> bool:
+        """ Returns False if the square was already guessed """
+        square_idx = row_idx * self.num_cols + col_idx
+        position = self._positions[square_idx]
+        if position < 0:
+            return False
+        parity_squares = self._squares[(row_idx + col_idx) % 2]
+        last_square_idx = parity_squares.pop()
+        if last_square_idx != square_idx:
+            parity_squares[position] = last_square_idx
+            self._positions[last_square_idx] = position
+        self._positions[square_idx] = -1
+        return True
+
+    def add(self, row_idx: int, col_idx: int):
+        square_idx = row_idx * self.num_cols + col_idx
+        if self._positions[square_idx] >= 0:
+            return
+        parity_squares = self._squares[(row_idx + col_idx) % 2]
+        self._positions[square_idx] = len(parity_squares)
+        parity_squares.append(square_idx)
+
+    def sample(
+        self, rng: random.Random, parity: Optional[int] = None
+    ) -> Tuple[int, int]:
+        """
+        parity - if set, only sample the squares with (row_idx + col_idx) % 2 == parity
+
+        Returns: (row_idx, col_idx) of an unguessed square, chosen uniformly at random
+        Raises ValueError if there is no such square.
+        """
+        if parity is None:
+            num_squares = len(self)
+            if num_squares == 0:
+                raise ValueError("Every square has already been guessed")
+            sample_idx = rng.randrange(num_squares)
+            if sample_idx < len(self._squares[0]):
+                square_idx = self._squares[0][sample_idx]
+            else:
+                square_idx = self._squares[1][sample_idx - len(self._squares[0])]
+        else:
+            parity_squares = self._squares[parity]
+            if not parity_squares:
+                raise ValueError(f"Every square of parity {parity} has been guessed")
+            square_idx = parity_squares[rng.randrange(len(parity_squares))]
+        return divmod(square_idx, self.num_cols)
+
 
 class BattleshipGameState:
     def __init__(
@@ -23,34 +346,79 @@ class BattleshipGameState:
         our_guesses: Optional[List[List]] = None,
         opponent_guesses: Optional[List[List]] = None,
         ships_dimensions: Optional[List[Tuple[int, int]]] = None,
+        grid_backend: str = "list",
+        verbose: bool = True,
     ):
+        """
+        grid_backend - which GameGrid implementation stores the grids: "list" (nested
+            lists) or "bitboard" (one int per value, for fast headless simulations)
+        verbose - if True, print the game events (placements, shots, game over) to stdout
+        """
+        assert grid_backend in GRID_BACKENDS, f"Unknown grid backend {grid_backend}"
+        grid_class = GRID_BACKENDS[grid_backend]
+        self.grid_backend = grid_backend
         self.is_my_turn = is_my_turn
         self.is_game_over = False
+        self.verbose = verbose
         self.num_rows = num_rows
         self.num_cols = num_cols
 
-        self.our_ship_locations = GameGrid(
+        self.our_ship_locations = grid_class(
             num_rows=num_rows, num_cols=num_cols, initial_value=SHIP_LOCATION_EMPTY
         )
         if our_ship_locations is not None:
             self.our_ship_locations.update_entire_grid(our_ship_locations)
-        self.opponent_ship_locations = GameGrid(
+        self.opponent_ship_locations = grid_class(
             num_rows=num_rows, num_cols=num_cols, initial_value=SHIP_LOCATION_EMPTY
         )
         if opponent_ship_locations is not None:
             self.opponent_ship_locations.update_entire_grid(opponent_ship_locations)
 
-        self.our_guesses = GameGrid(
+        self.our_guesses = grid_class(
             num_rows=num_rows, num_cols=num_cols, initial_value=LOCATION_NOT_GUESSED
         )
         if our_guesses is not None:
             self.our_guesses.update_entire_grid(our_guesses)
-        self.opponent_guesses = GameGrid(
+        self.opponent_guesses = grid_class(
             num_rows=num_rows, num_cols=num_cols, initial_value=LOCATION_NOT_GUESSED
         )
         if opponent_guesses is not None:
             self.opponent_guesses.update_entire_grid(opponent_guesses)
 
+        # cell -> ship lookups and per-ship health, kept in sync with the grids
+        self.our_fleet = PlayerFleet(self.our_ship_locations, self.opponent_guesses)
+        if our_ship_locations is not None:
+            self.our_fleet.rebuild()
+        self.opponent_fleet = PlayerFleet(
+            self.opponent_ship_locations, self.our_guesses
+        )
+        if opponent_ship_locations is not None:
+            self.opponent_fleet.rebuild()
+
+        # the squares each player can still call
+        self.our_unguessed = UnguessedSquares(
+            num_rows, num_cols, _guessed_array(our_guesses)
+        )
+        self.opponent_unguessed = UnguessedSquares(
+            num_rows, num_cols, _guessed_array(opponent_guesses)
+        )
+
+        # game events (see instrumentation.GAME_EVENTS), counters and timings
+        self.instrumentation = Instrumentation()
+        if verbose:
+            print_events(self.instrumentation)
+
+        # squares whose home/tracking grid symbols may have changed since the last poll
+        # (everything, to begin with)
+        self._changed_home_squares: Set[Tuple[int, int]] = set()
+        self._changed_tracking_squares: Set[Tuple[int, int]] = set()
+        self._all_home_squares_changed = True
+        self._all_tracking_squares_changed = True
+
+        # journal of the shots taken, for undo and redo
+        self.move_log: List[ShotRecord] = []
+        self._undone_moves: List[ShotRecord] = []
+
         # track which ships are still alive for us and our opponent
         if ships_dimensions is None:
             ship_dimensions_to_use = STANDARD_SHIP_DIMENSIONS
@@ -106,57 +474,105 @@ class BattleshipGameState:
                 self.opponent_ship_locations, ship_value, (ship_height, ship_width)
             )
 
-        # check if the ship placement overlaps with a buffer! (can do neighboring check for each)
+        locations_grid = (
+            self.our_ship_locations if is_our_ship else self.opponent_ship_locations
+        )
         bottom_row_idx = top_row_idx + ship_height - 1
         right_col_idx = left_col_idx + ship_width - 1
+        if has_placement_index(self.num_rows, self.num_cols):
+            # look up the placement in the placement index (it isn't there if the ship
+            # would be out of bounds), which also has the squares of the ship's buffer
+            placement_index = get_placement_index(
+                self.num_rows, self.num_cols, ship_height, ship_width
+            )
+            placement_idx = placement_index.placement_idx(top_row_idx, left_col_idx)
+            if placement_idx is None:
+                return False
 
-        # check if ship placement has an invalid coordinates
-        for row_idx in range(top_row_idx, bottom_row_idx + 1):
-            for col_idx in range(left_col_idx, right_col_idx + 1):
-                if is_our_ship and not self.our_ship_locations.are_indexes_valid(
-                    row_idx, col_idx
-                ):
-                    return False
-                elif (
-                    not is_our_ship
-                    and not self.opponent_ship_locations.are_indexes_valid(
-                        row_idx, col_idx
-                    )
-                ):
-                    return False
-
-        top_buffer_row_idx = max(0, top_row_idx - 1)
-        bottom_buffer_row_idx = min(self.num_rows - 1, bottom_row_idx + 1)
-        left_buffer_row_idx = max(0, left_col_idx - 1)
-        right_buffer_row_idx = min(self.num_cols - 1, right_col_idx + 1)
-        for row_idx in range(top_buffer_row_idx, bottom_buffer_row_idx + 1):
-            for col_idx in range(left_buffer_row_idx, right_buffer_row_idx + 1):
-                if is_our_ship:
-                    ship_loc_value = self.our_ship_locations.read_grid(row_idx, col_idx)
-                else:
-                    ship_loc_value = self.opponent_ship_locations.read_grid(
-                        row_idx, col_idx
-                    )
-
-                if ship_loc_value != SHIP_LOCATION_EMPTY:
+            # check if the ship placement overlaps with a buffer!
+            if isinstance(locations_grid, BitboardGameGrid):
+                buffer_mask = placement_index.buffer_bitmask(placement_idx)
+                if buffer_mask & locations_grid.occupied_mask():
                     # can't place ship because another ship is overlapping with the buffer
                     return False
+            else:
+                for row_idx, col_idx in placement_index.buffer_squares(placement_idx):
+                    ship_loc_value = locations_grid.read_grid(row_idx, col_idx)
+                    if ship_loc_value != SHIP_LOCATION_EMPTY:
+                        # can't place ship because another ship is overlapping with the buffer
+                        return False
+        else:
+            # large board: check the bounds and the buffer directly
+            if not (
+                0 <= top_row_idx
+                and bottom_row_idx < self.num_rows
+                and 0 <= left_col_idx
+                and right_col_idx < self.num_cols
+            ):
+                return False
+            if not _is_rect_empty(
+                locations_grid,
+                top_row_idx - 1,
+                left_col_idx - 1,
+                ship_height + 2,
+                ship_width + 2,
+            ):
+                # can't place ship because another ship is overlapping with the buffer
+                return False
 
         # now that the ship placement is verified, we can safely update the locations grid
-        for row_idx in range(top_row_idx, bottom_row_idx + 1):
-            for col_idx in range(left_col_idx, right_col_idx + 1):
-                if is_our_ship:
-                    self.our_ship_locations.update_grid(
-                        row_idx, col_idx, new_value=ship_value
-                    )
-                else:
-                    self.opponent_ship_locations.update_grid(
-                        row_idx, col_idx, new_value=ship_value
-                    )
+        if isinstance(locations_grid, NumpyGameGrid):
+            locations_grid.fill_rect(
+                top_row_idx, left_col_idx, ship_height, ship_width, ship_value
+            )
+        else:
+            for row_idx in range(top_row_idx, bottom_row_idx + 1):
+                for col_idx in range(left_col_idx, right_col_idx + 1):
+                    locations_grid.update_grid(row_idx, col_idx, new_value=ship_value)
+        fleet = self.our_fleet if is_our_ship else self.opponent_fleet
+        fleet.add_ship(ship_value, top_row_idx, left_col_idx, ship_height, ship_width)
+        self._mark_squares_changed(locations_grid, fleet.ship_squares[ship_value])
+        if self.instrumentation.enabled:
+            self.instrumentation.emit(
+                SHIP_PLACED,
+                is_our_ship=is_our_ship,
+                ship_value=ship_value,
+                top_row_idx=top_row_idx,
+                left_col_idx=left_col_idx,
+                ship_height=ship_height,
+                ship_width=ship_width,
+            )
 
         self.ships_placed = self.check_placements_ready()
         return True
 
+    def _get_fleet(
+        self,
+        locations_grid: GameGrid,
+        opponents_guesses_grid: Optional[GameGrid] = None,
+    ) -> Optional[PlayerFleet]:
+        """
+        Returns the fleet tracking the ship locations grid (and the opponent's guesses
+        grid, if given), or None if the grids don't belong to this game state.
+        """
+        for fleet in [self.our_fleet, self.opponent_fleet]:
+            if fleet.locations_grid is locations_grid and (
+                opponents_guesses_grid is None
+                or fleet.opponents_guesses_grid is opponents_guesses_grid
+            ):
+                return fleet
+        return None
+
+    def _get_unguessed_squares(
+        self, guesses_grid: GameGrid
+    ) -> Optional[UnguessedSquares]:
+        """ Returns None if the guesses grid doesn't belong to this game state """
+        if guesses_grid is self.our_guesses:
+            return self.our_unguessed
+        if guesses_grid is self.opponent_guesses:
+            return self.opponent_unguessed
+        return None
+
     def check_placements_ready(self) -> bool:
         # not only check if placements are valid, but check that both players have placed all available ships
         for ship_value, ship_dims in self.our_ships:
@@ -177,6 +593,28 @@ class BattleshipGameState:
         # ship dimensions must not be 0
         assert ship_dims[0] > 0 and ship_dims[1] > 0
 
+        fleet = self._get_fleet(ship_locations_grid)
+        if fleet is not None:
+            ship_placement = fleet.ship_placement(ship_value)
+            return ship_placement is not None and (
+                ship_placement[2:] == tuple(ship_dims)
+                or ship_placement[2:] == tuple(ship_dims[::-1])
+            )
+
+        if isinstance(ship_locations_grid, BitboardGameGrid):
+            ship_mask = ship_locations_grid.value_mask(ship_value)
+            if popcount(ship_mask) != ship_dims[0] * ship_dims[1]:
+                return False
+            # the lowest set bit is the top-left corner of the ship
+            top_row_idx, left_col_idx = divmod(
+                (ship_mask & -ship_mask).bit_length() - 1, self.num_cols
+            )
+            return ship_mask == ship_locations_grid.rect_mask(
+                top_row_idx, left_col_idx, ship_dims[0], ship_dims[1]
+            ) or ship_mask == ship_locations_grid.rect_mask(
+                top_row_idx, left_col_idx, ship_dims[1], ship_dims[0]
+            )
+
         # make sure the ship is located, and the dimensions match
         # 1. check the count of locations vs. dimensions
         # 2. check the bounds of dimensions (min and max, x and y)
@@ -211,7 +649,26 @@ class BattleshipGameState:
     def clear_ship_placement(
         self, locations_grid: GameGrid, ship_value, ship_dims: Tuple[int, int]
     ):
-        print(f"clearing ship placement: value = {ship_value}, dims = {ship_dims}")
+        fleet = self._get_fleet(locations_grid)
+        if self.instrumentation.enabled:
+            self.instrumentation.emit(
+                SHIP_CLEARED,
+                is_our_ship=locations_grid is self.our_ship_locations,
+                ship_value=ship_value,
+            )
+        if fleet is not None:
+            for row_idx, col_idx in fleet.ship_squares.get(ship_value, []):
+                locations_grid.update_grid(
+                    row_idx, col_idx, new_value=SHIP_LOCATION_EMPTY
+                )
+            self._mark_squares_changed(
+                locations_grid, fleet.ship_squares.get(ship_value, [])
+            )
+            fleet.remove_ship(ship_value)
+            return
+        if isinstance(locations_grid, BitboardGameGrid):
+            locations_grid.clear_value(ship_value)
+            return
         for row_idx in range(self.num_rows):
             for col_idx in range(self.num_cols):
                 if locations_grid.read_grid(row_idx, col_idx) == ship_value:
@@ -220,6 +677,15 @@ class BattleshipGameState:
                     )
 
     def clear_all_ship_placements(self, locations_grid: GameGrid):
+        fleet = self._get_fleet(locations_grid)
+        if fleet is not None:
+            for row_idx, col_idx in list(fleet.ship_at):
+                locations_grid.update_grid(
+                    row_idx, col_idx, new_value=SHIP_LOCATION_EMPTY
+                )
+            self._mark_squares_changed(locations_grid, fleet.ship_at)
+            fleet.clear()
+            return
         for row_idx in range(self.num_rows):
             for col_idx in range(self.num_cols):
                 locations_grid.update_grid(
@@ -230,19 +696,17 @@ class BattleshipGameState:
         self,
         ship_dims: List[Tuple[int, int]],
         our_ships: bool,
+        rng: Optional[random.Random] = None,
     ):
-        available_squares = []
-        for r in range(self.num_rows):
-            row = []
-            for c in range(self.num_cols):
-                row.append(True)
-            available_squares.append(row)
+        """ rng - random number generator (default: the random module's global generator) """
+        available_squares = np.ones((self.num_rows, self.num_cols), dtype=bool)
         random_ship_placements = random_ships_placement(
             ship_dims,
             available_squares=available_squares,
             num_rows=self.num_rows,
             num_cols=self.num_cols,
             rotate_allowed=True,
+            rng=rng,
         )
         for idx in range(len(random_ship_placements)):
             ship_placement = random_ship_placements[idx]
@@ -255,15 +719,28 @@ class BattleshipGameState:
                 ship_value=idx + 1,
                 is_our_ship=our_ships,
             )
-            print(
-                f"placed ship {idx + 1}, dims {ship_height}, {ship_width} at {top_row_idx}, {left_col_idx}"
-            )
 
     def rotate_ship_placement(self, locations_grid: GameGrid, ship_value) -> bool:
         """
         Rotate the ship around its top left corner.
         Returns False if the rotation isn't possible (and doesn't change the game state).
         """
+        fleet = self._get_fleet(locations_grid)
+        if fleet is not None:
+            if ship_value not in fleet.ship_bounds:
+                return False
+            min_row_idx, min_col_idx, max_row_idx, max_col_idx = fleet.ship_bounds[
+                ship_value
+            ]
+            return self._rotate_ship_bounds(
+                locations_grid,
+                ship_value,
+                min_row_idx,
+                min_col_idx,
+                max_row_idx,
+                max_col_idx,
+            )
+
         min_row_idx, max_row_idx = None, None
         min_col_idx, max_col_idx = None, None
         count_ship_value = 0
@@ -279,7 +756,24 @@ class BattleshipGameState:
                         min_col_idx = col_idx
                     if max_col_idx is None or col_idx > max_col_idx:
                         max_col_idx = col_idx
+        return self._rotate_ship_bounds(
+            locations_grid,
+            ship_value,
+            min_row_idx,
+            min_col_idx,
+            max_row_idx,
+            max_col_idx,
+        )
 
+    def _rotate_ship_bounds(
+        self,
+        locations_grid: GameGrid,
+        ship_value,
+        min_row_idx: int,
+        min_col_idx: int,
+        max_row_idx: int,
+        max_col_idx: int,
+    ) -> bool:
         ship_width, ship_height = (
             max_col_idx - min_col_idx + 1,
             max_row_idx - min_row_idx + 1,
@@ -313,6 +807,16 @@ class BattleshipGameState:
         self, locations_grid: GameGrid, opponents_guesses_grid: GameGrid, ship_value
     ):
         assert ship_value != SHIP_LOCATION_EMPTY
+        fleet = self._get_fleet(locations_grid, opponents_guesses_grid)
+        if fleet is not None:
+            return fleet.is_ship_alive(ship_value)
+        if isinstance(locations_grid, BitboardGameGrid) and isinstance(
+            opponents_guesses_grid, BitboardGameGrid
+        ):
+            return bool(
+                locations_grid.value_mask(ship_value)
+                & ~opponents_guesses_grid.value_mask(LOCATION_GUESS_HIT)
+            )
         for row_idx in range(self.num_rows):
             for col_idx in range(self.num_cols):
                 if (
@@ -326,6 +830,16 @@ class BattleshipGameState:
     def any_ships_alive(
         self, locations_grid: GameGrid, opponents_guesses_grid: GameGrid
     ):
+        fleet = self._get_fleet(locations_grid, opponents_guesses_grid)
+        if fleet is not None:
+            return fleet.num_ships_alive > 0
+        if isinstance(locations_grid, BitboardGameGrid) and isinstance(
+            opponents_guesses_grid, BitboardGameGrid
+        ):
+            return bool(
+                locations_grid.occupied_mask()
+                & ~opponents_guesses_grid.value_mask(LOCATION_GUESS_HIT)
+            )
         for row_idx in range(self.num_rows):
             for col_idx in range(self.num_cols):
                 if (
@@ -336,63 +850,134 @@ class BattleshipGameState:
                     return True
         return False
 
+    def get_home_square_symbol(self, row_idx: int, col_idx: int) -> str:
+        ship_loc_value = self.our_ship_locations.read_grid(row_idx, col_idx)
+        opponent_guess_value = self.opponent_guesses.read_grid(row_idx, col_idx)
+        if ship_loc_value != SHIP_LOCATION_EMPTY:
+            # check if opponent has struck our ship here:
+            if opponent_guess_value == LOCATION_GUESS_HIT:
+                # check if the ship is sunk
+                if self.check_ship_alive(
+                    self.our_ship_locations,
+                    self.opponent_guesses,
+                    ship_loc_value,
+                ):
+                    return "X"
+                return "S"
+            return str(ship_loc_value)
+        # check if opponent has missed here
+        if opponent_guess_value == LOCATION_GUESS_MISS:
+            return "."
+        return " "
+
+    def get_tracking_square_symbol(self, row_idx: int, col_idx: int) -> str:
+        guess_value = self.our_guesses.read_grid(row_idx, col_idx)
+        if guess_value == LOCATION_GUESS_HIT:
+            # check if we struck a ship here:
+            ship_loc_value = self.opponent_ship_locations.read_grid(row_idx, col_idx)
+            assert ship_loc_value != SHIP_LOCATION_EMPTY
+            # check if the ship is sunk
+            if self.check_ship_alive(
+                self.opponent_ship_locations,
+                self.our_guesses,
+                ship_loc_value,
+            ):
+                return "X"
+            return "S"
+        elif guess_value == LOCATION_GUESS_MISS:
+            return "."
+        return " "
+
     def get_player_home_grid(self) -> List[List]:
-        grid_symbols = []
-        for row_idx in range(self.num_rows):
-            grid_row = []
-            for col_idx in range(self.num_cols):
-                ship_loc_value = self.our_ship_locations.read_grid(row_idx, col_idx)
-                opponent_guess_value = self.opponent_guesses.read_grid(row_idx, col_idx)
-                grid_symbol = " "
-                if ship_loc_value != SHIP_LOCATION_EMPTY:
-                    # check if opponent has struck our ship here:
-                    if opponent_guess_value == LOCATION_GUESS_HIT:
-                        # check if the ship is sunk
-                        if self.check_ship_alive(
-                            self.our_ship_locations,
-                            self.opponent_guesses,
-                            ship_loc_value,
-                        ):
-                            grid_symbol = "X"
-                        else:
-                            grid_symbol = "S"
-                    else:
-                        grid_symbol = str(ship_loc_value)
-                else:
-                    # check if opponent has missed here
-                    if opponent_guess_value == LOCATION_GUESS_MISS:
-                        grid_symbol = "."
-                grid_row.append(grid_symbol)
-            grid_symbols.append(grid_row)
-        return grid_symbols
+        if isinstance(self.our_ship_locations, NumpyGameGrid):
+            return self._get_symbols_array(
+                self.our_fleet, self.opponent_guesses, show_ships=True
+            ).tolist()
+        return [
+            [
+                self.get_home_square_symbol(row_idx, col_idx)
+                for col_idx in range(self.num_cols)
+            ]
+            for row_idx in range(self.num_rows)
+        ]
 
     def get_player_tracking_grid(self) -> List[List]:
-        grid_symbols = []
-        for row_idx in range(self.num_rows):
-            grid_row = []
-            for col_idx in range(self.num_cols):
-                guess_value = self.our_guesses.read_grid(row_idx, col_idx)
-                grid_symbol = " "
-                if guess_value == LOCATION_GUESS_HIT:
-                    # check if we struck a ship here:
-                    ship_loc_value = self.opponent_ship_locations.read_grid(
-                        row_idx, col_idx
-                    )
-                    assert ship_loc_value != SHIP_LOCATION_EMPTY
-                    # check if the ship is sunk
-                    if self.check_ship_alive(
-                        self.opponent_ship_locations,
-                        self.our_guesses,
-                        ship_loc_value,
-                    ):
-                        grid_symbol = "X"
-                    else:
-                        grid_symbol = "S"
-                elif guess_value == LOCATION_GUESS_MISS:
-                    grid_symbol = "."
-                grid_row.append(grid_symbol)
-            grid_symbols.append(grid_row)
-        return grid_symbols
+        if isinstance(self.opponent_ship_locations, NumpyGameGrid):
+            return self._get_symbols_array(
+                self.opponent_fleet, self.our_guesses, show_ships=False
+            ).tolist()
+        return [
+            [
+                self.get_tracking_square_symbol(row_idx, col_idx)
+                for col_idx in range(self.num_cols)
+            ]
+            for row_idx in range(self.num_rows)
+        ]
+
+    def _get_symbols_array(
+        self,
+        fleet: PlayerFleet,
+        opponents_guesses_grid: NumpyGameGrid,
+        show_ships: bool,
+    ) -> np.ndarray:
+        """
+        Vectorized get_player_home_grid (show_ships=True) or get_player_tracking_grid
+        (show_ships=False) for numpy grids
+        """
+        ship_values = fleet.locations_grid.values_array()
+        is_ship = ship_values != SHIP_LOCATION_EMPTY
+        is_hit = opponents_guesses_grid.value_array(LOCATION_GUESS_HIT)
+        sunk_ship_values = [
+            ship_value
+            for ship_value, remaining_hits in fleet.remaining_hits.items()
+            if remaining_hits == 0
+        ]
+        symbols = np.full((self.num_rows, self.num_cols), " ", dtype=object)
+        symbols[opponents_guesses_grid.value_array(LOCATION_GUESS_MISS)] = "."
+        if show_ships:
+            symbols[is_ship] = ship_values[is_ship].astype(str)
+        symbols[is_ship & is_hit] = "X"
+        symbols[is_hit & np.isin(ship_values, sunk_ship_values)] = "S"
+        return symbols
+
+    def _mark_squares_changed(self, grid: GameGrid, squares: Iterable[Tuple[int, int]]):
+        """ Record changed squares of the grid, for the home/tracking grid showing it """
+        if grid is self.our_ship_locations or grid is self.opponent_guesses:
+            self._changed_home_squares.update(squares)
+        elif grid is self.our_guesses or grid is self.opponent_ship_locations:
+            self._changed_tracking_squares.update(squares)
+
+    def poll_home_grid_changes(self) -> Dict[Tuple[int, int], str]:
+        """
+        Returns: the new symbol (as in get_player_home_grid) of every square of the home
+        grid that may have changed since the last poll
+        """
+        if self._all_home_squares_changed:
+            changes = _grid_to_changes(self.get_player_home_grid())
+        else:
+            changes = {
+                square: self.get_home_square_symbol(*square)
+                for square in self._changed_home_squares
+            }
+        self._changed_home_squares = set()
+        self._all_home_squares_changed = False
+        return changes
+
+    def poll_tracking_grid_changes(self) -> Dict[Tuple[int, int], str]:
+        """
+        Returns: the new symbol (as in get_player_tracking_grid) of every square of the
+        tracking grid that may have changed since the last poll
+        """
+        if self._all_tracking_squares_changed:
+            changes = _grid_to_changes(self.get_player_tracking_grid())
+        else:
+            changes = {
+                square: self.get_tracking_square_symbol(*square)
+                for square in self._changed_tracking_squares
+            }
+        self._changed_tracking_squares = set()
+        self._all_tracking_squares_changed = False
+        return changes
 
     def is_game_over(self):
         return self.any_ships_alive(
@@ -407,6 +992,10 @@ class BattleshipGameState:
         square_col_idx: int,
     ) -> bool:
         """ Returns True if the guess hit a ship """
+        unguessed_squares = self._get_unguessed_squares(strikers_guesses_grid)
+        if unguessed_squares is not None:
+            unguessed_squares.remove(square_row_idx, square_col_idx)
+
         # Did the guess hit a ship? (check struck_locations_grid)
         if (
             struck_locations_grid.read_grid(square_row_idx, square_col_idx)
@@ -416,50 +1005,492 @@ class BattleshipGameState:
             strikers_guesses_grid.update_grid(
                 square_row_idx, square_col_idx, LOCATION_GUESS_MISS
             )
+            self._mark_squares_changed(
+                strikers_guesses_grid, [(square_row_idx, square_col_idx)]
+            )
+            if self.instrumentation.enabled:
+                self.instrumentation.emit(
+                    SHOT,
+                    by_us=strikers_guesses_grid is self.our_guesses,
+                    row_idx=square_row_idx,
+                    col_idx=square_col_idx,
+                    is_hit=False,
+                )
             return False
 
         # The guess hit! (update strikers_guesses_grid with a hit)
+        already_hit = (
+            strikers_guesses_grid.read_grid(square_row_idx, square_col_idx)
+            == LOCATION_GUESS_HIT
+        )
         strikers_guesses_grid.update_grid(
             square_row_idx, square_col_idx, LOCATION_GUESS_HIT
         )
-        # Did the hit sink a ship? (check struck_locations_grid again)
-        ship_that_was_hit = struck_locations_grid.read_grid(
-            square_row_idx, square_col_idx
+        self._mark_squares_changed(
+            strikers_guesses_grid, [(square_row_idx, square_col_idx)]
         )
-        if not self.check_ship_alive(
-            struck_locations_grid, strikers_guesses_grid, ship_that_was_hit
-        ):
-            # The guess sunk an ship!
-            # TODO update the struck player's alive ships
+        if self.instrumentation.enabled:
+            self.instrumentation.emit(
+                SHOT,
+                by_us=strikers_guesses_grid is self.our_guesses,
+                row_idx=square_row_idx,
+                col_idx=square_col_idx,
+                is_hit=True,
+            )
+
+        fleet = self._get_fleet(struck_locations_grid, strikers_guesses_grid)
+        if fleet is None:
+            # the grids aren't tracked by a fleet: check by scanning the grids instead
+            ship_that_was_hit = struck_locations_grid.read_grid(
+                square_row_idx, square_col_idx
+            )
+            if not self.check_ship_alive(
+                struck_locations_grid, strikers_guesses_grid, ship_that_was_hit
+            ) and not self.any_ships_alive(
+                struck_locations_grid, strikers_guesses_grid
+            ):
+                self.is_game_over = True
+                if self.instrumentation.enabled:
+                    self.instrumentation.emit(
+                        GAME_OVER,
+                        we_won=struck_locations_grid is self.opponent_ship_locations,
+                    )
+            return True
+
+        # Did the hit sink a ship? (a repeated hit on the same square can't)
+        if already_hit:
+            return True
+        sunk_ship_value = fleet.register_hit(square_row_idx, square_col_idx)
+        if self.instrumentation.enabled:
+            self.instrumentation.emit(
+                HIT,
+                by_us=fleet is self.opponent_fleet,
+                row_idx=square_row_idx,
+                col_idx=square_col_idx,
+                ship_value=fleet.ship_at[(square_row_idx, square_col_idx)],
+            )
+        if sunk_ship_value is not None:
+            # The guess sunk a ship! (all of its squares are now shown as sunk)
+            self._mark_squares_changed(
+                struck_locations_grid, fleet.ship_squares[sunk_ship_value]
+            )
+            if self.instrumentation.enabled:
+                self.instrumentation.emit(
+                    SHIP_SUNK,
+                    is_our_ship=fleet is self.our_fleet,
+                    ship_value=sunk_ship_value,
+                )
 
             # Did the guess end the game?
-            if not self.any_ships_alive(struck_locations_grid, strikers_guesses_grid):
-                print("game is now over!")
+            if fleet.num_ships_alive == 0:
                 self.is_game_over = True
+                if self.instrumentation.enabled:
+                    self.instrumentation.emit(
+                        GAME_OVER, we_won=fleet is self.opponent_fleet
+                    )
         return True
 
+    def to_bytes(self) -> bytes:
+        """
+        Encodes the game state in a compact fixed layout: a header, a table of the ships
+        and their placements, then the hits and misses of each side as packed bits
+        (about 150 bytes for the standard game). Event subscribers aren't part of the
+        snapshot (the verbose flag is).
+        Raises ValueError if a ship is only partially placed.
+        """
+        flags = (
+            (_SNAPSHOT_IS_MY_TURN if self.is_my_turn else 0)
+            | (_SNAPSHOT_IS_GAME_OVER if self.is_game_over else 0)
+            | (_SNAPSHOT_VERBOSE if self.verbose else 0)
+        )
+        chunks = [
+            _SNAPSHOT_HEADER.pack(
+                SNAPSHOT_MAGIC,
+                SNAPSHOT_VERSION,
+                self.num_rows,
+                self.num_cols,
+                flags,
+                list(GRID_BACKENDS).index(self.grid_backend),
+                len(self.our_ships),
+            )
+        ]
+
+        for fleet in [self.our_fleet, self.opponent_fleet]:
+            for ship_value in fleet.ship_squares:
+                if fleet.ship_placement(ship_value) is None:
+                    raise ValueError(f"Ship {ship_value} is only partially placed")
+        for ship_value, (ship_height, ship_width) in self.our_ships:
+            corners = []
+            rotated_flags = 0
+            for side_idx, fleet in enumerate([self.our_fleet, self.opponent_fleet]):
+                ship_placement = fleet.ship_placement(ship_value)
+                if ship_placement is None:
+                    corners += [_SNAPSHOT_NOT_PLACED, _SNAPSHOT_NOT_PLACED]
+                    continue
+                top_row_idx, left_col_idx, placed_height, _ = ship_placement
+                corners += [top_row_idx, left_col_idx]
+                if placed_height != ship_height:
+                    rotated_flags |= 1 << side_idx
+            chunks.append(
+                _SNAPSHOT_SHIP.pack(ship_height, ship_width, *corners, rotated_flags)
+            )
+
+        num_plane_bytes = (self.num_rows * self.num_cols + 7) // 8
+        for guesses_grid in [self.our_guesses, self.opponent_guesses]:
+            for guess_value in [LOCATION_GUESS_HIT, LOCATION_GUESS_MISS]:
+                chunks.append(
+                    _get_value_mask(guesses_grid, guess_value).to_bytes(
+                        num_plane_bytes, "little"
+                    )
+                )
+        return b"".join(chunks)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BattleshipGameState":
+        """ Decodes a game state encoded with to_bytes """
+        (
+            magic,
+            version,
+            num_rows,
+            num_cols,
+            flags,
+            grid_backend_idx,
+            num_ships,
+        ) = _SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError("Not a game state snapshot (or an unsupported version)")
+        offset = _SNAPSHOT_HEADER.size
+        ship_entries = [
+            _SNAPSHOT_SHIP.unpack_from(data, offset + ship_idx * _SNAPSHOT_SHIP.size)
+            for ship_idx in range(num_ships)
+        ]
+        offset += num_ships * _SNAPSHOT_SHIP.size
+
+        game_state = cls(
+            num_rows=num_rows,
+            num_cols=num_cols,
+            is_my_turn=bool(flags & _SNAPSHOT_IS_MY_TURN),
+            ships_dimensions=[(entry[0], entry[1]) for entry in ship_entries],
+            grid_backend=list(GRID_BACKENDS)[grid_backend_idx],
+            verbose=bool(flags & _SNAPSHOT_VERBOSE),
+        )
+        game_state.is_game_over = bool(flags & _SNAPSHOT_IS_GAME_OVER)
+
+        # the guesses go first, so the fleets count the hits on the ships as they're added
+        num_plane_bytes = (num_rows * num_cols + 7) // 8
+        for guesses_grid in [game_state.our_guesses, game_state.opponent_guesses]:
+            guessed_mask = 0
+            for guess_value in [LOCATION_GUESS_HIT, LOCATION_GUESS_MISS]:
+                guess_mask = int.from_bytes(
+                    data[offset : offset + num_plane_bytes], "little"
+                )
+                _set_value_mask(guesses_grid, guess_value, guess_mask)
+                guessed_mask |= guess_mask
+                offset += num_plane_bytes
+            if guessed_mask == 0:
+                continue
+            unguessed_squares = UnguessedSquares(
+                num_rows, num_cols, _mask_to_array(guessed_mask, num_rows, num_cols)
+            )
+            if guesses_grid is game_state.our_guesses:
+                game_state.our_unguessed = unguessed_squares
+            else:
+                game_state.opponent_unguessed = unguessed_squares
+
+        for ship_value, ship_entry in enumerate(ship_entries, start=1):
+            (
+                ship_height,
+                ship_width,
+                our_top_row_idx,
+                our_left_col_idx,
+                opponent_top_row_idx,
+                opponent_left_col_idx,
+                rotated_flags,
+            ) = ship_entry
+            for side_idx, (fleet, top_row_idx, left_col_idx) in enumerate(
+                [
+                    (game_state.our_fleet, our_top_row_idx, our_left_col_idx),
+                    (
+                        game_state.opponent_fleet,
+                        opponent_top_row_idx,
+                        opponent_left_col_idx,
+                    ),
+                ]
+            ):
+                if top_row_idx == _SNAPSHOT_NOT_PLACED:
+                    continue
+                placed_height, placed_width = ship_height, ship_width
+                if rotated_flags & (1 << side_idx):
+                    placed_height, placed_width = ship_width, ship_height
+                locations_grid = fleet.locations_grid
+                if isinstance(locations_grid, BitboardGameGrid):
+                    locations_grid.set_value_mask(
+                        ship_value,
+                        locations_grid.rect_mask(
+                            top_row_idx, left_col_idx, placed_height, placed_width
+                        ),
+                    )
+                else:
+                    for row_idx in range(top_row_idx, top_row_idx + placed_height):
+                        for col_idx in range(left_col_idx, left_col_idx + placed_width):
+                            locations_grid.update_grid(row_idx, col_idx, ship_value)
+                fleet.add_ship(
+                    ship_value, top_row_idx, left_col_idx, placed_height, placed_width
+                )
+
+        game_state.ships_placed = game_state.check_placements_ready()
+        return game_state
+
+    def clone(self) -> "BattleshipGameState":
+        """
+        An independent copy of the game state, including the moves that can be undone and
+        redone, but not the event subscribers (like from_bytes, the copy prints the events
+        if verbose) nor the squares changed since the last poll (everything has changed,
+        for the copy). The grids, fleets and unguessed squares are copied directly, which
+        is much cheaper than a to_bytes and from_bytes round trip.
+        """
+        game_state = type(self).__new__(type(self))
+        game_state.grid_backend = self.grid_backend
+        game_state.is_my_turn = self.is_my_turn
+        game_state.is_game_over = self.is_game_over
+        game_state.verbose = self.verbose
+        game_state.num_rows = self.num_rows
+        game_state.num_cols = self.num_cols
+
+        game_state.our_ship_locations = self.our_ship_locations.copy()
+        game_state.opponent_ship_locations = self.opponent_ship_locations.copy()
+        game_state.our_guesses = self.our_guesses.copy()
+        game_state.opponent_guesses = self.opponent_guesses.copy()
+        game_state.our_fleet = self.our_fleet.copy(
+            game_state.our_ship_locations, game_state.opponent_guesses
+        )
+        game_state.opponent_fleet = self.opponent_fleet.copy(
+            game_state.opponent_ship_locations, game_state.our_guesses
+        )
+        game_state.our_unguessed = self.our_unguessed.copy()
+        game_state.opponent_unguessed = self.opponent_unguessed.copy()
+
+        game_state.instrumentation = Instrumentation()
+        if self.verbose:
+            print_events(game_state.instrumentation)
+        game_state._changed_home_squares = set()
+        game_state._changed_tracking_squares = set()
+        game_state._all_home_squares_changed = True
+        game_state._all_tracking_squares_changed = True
+
+        # shot records are immutable, so the journals can share them
+        game_state.move_log = list(self.move_log)
+        game_state._undone_moves = list(self._undone_moves)
+        game_state.our_ships = list(self.our_ships)
+        game_state.opponent_ships = list(self.opponent_ships)
+        game_state.ships_placed = self.ships_placed
+        return game_state
+
     def call_square(self, square_row_idx: int, square_col_idx: int) -> bool:
-        """ Returns True if the guess hit a ship """
-        if self.is_my_turn:
-            did_hit = self.attempt_strike(
-                self.opponent_ship_locations,
-                self.our_guesses,
-                square_row_idx,
-                square_col_idx,
+        """
+        Returns True if the guess hit a ship.
+        Raises ValueError if the player whose turn it is already guessed the square.
+        """
+        unguessed_squares = (
+            self.our_unguessed if self.is_my_turn else self.opponent_unguessed
+        )
+        if (square_row_idx, square_col_idx) not in unguessed_squares:
+            raise ValueError(
+                f"Square ({square_row_idx}, {square_col_idx}) was already guessed"
             )
+        # a new move replaces the moves that were undone
+        self._undone_moves = []
+        return self._call_square(square_row_idx, square_col_idx)
+
+    def _call_square(self, square_row_idx: int, square_col_idx: int) -> bool:
+        by_us = self.is_my_turn
+        if by_us:
+            struck_fleet, guesses_grid = self.opponent_fleet, self.our_guesses
         else:
-            did_hit = self.attempt_strike(
-                self.our_ship_locations,
-                self.opponent_guesses,
-                square_row_idx,
-                square_col_idx,
-            )
+            struck_fleet, guesses_grid = self.our_fleet, self.opponent_guesses
+        previous_guess = guesses_grid.read_grid(square_row_idx, square_col_idx)
+        was_game_over = self.is_game_over
+
+        did_hit = self.attempt_strike(
+            struck_fleet.locations_grid,
+            guesses_grid,
+            square_row_idx,
+            square_col_idx,
+        )
 
         # if the guess missed, then the turn passes to the other player
         if not did_hit and not self.is_game_over:
             self.is_my_turn = not self.is_my_turn
+
+        hit_ship_value = None
+        if did_hit and previous_guess != LOCATION_GUESS_HIT:
+            hit_ship_value = struck_fleet.ship_at[(square_row_idx, square_col_idx)]
+        self.move_log.append(
+            ShotRecord(
+                row_idx=square_row_idx,
+                col_idx=square_col_idx,
+                by_us=by_us,
+                previous_guess=previous_guess,
+                hit_ship_value=hit_ship_value,
+                sunk=hit_ship_value is not None
+                and not struck_fleet.is_ship_alive(hit_ship_value),
+                was_game_over=was_game_over,
+            )
+        )
         return did_hit
 
+    def undo(self) -> bool:
+        """
+        Restores the game state to exactly what it was before the last call_square.
+        Only shots are journaled: ship placements can't be undone.
+        Returns False if there is no move to undo.
+        """
+        if not self.move_log:
+            return False
+        shot = self.move_log.pop()
+        if shot.by_us:
+            struck_fleet, guesses_grid = self.opponent_fleet, self.our_guesses
+        else:
+            struck_fleet, guesses_grid = self.our_fleet, self.opponent_guesses
+
+        guesses_grid.update_grid(shot.row_idx, shot.col_idx, shot.previous_guess)
+        self._mark_squares_changed(guesses_grid, [(shot.row_idx, shot.col_idx)])
+        if shot.previous_guess == LOCATION_NOT_GUESSED:
+            self._get_unguessed_squares(guesses_grid).add(shot.row_idx, shot.col_idx)
+        if shot.hit_ship_value is not None:
+            struck_fleet.unregister_hit(shot.hit_ship_value)
+            if shot.sunk:
+                self._mark_squares_changed(
+                    struck_fleet.locations_grid,
+                    struck_fleet.ship_squares[shot.hit_ship_value],
+                )
+        self.is_my_turn = shot.by_us
+        self.is_game_over = shot.was_game_over
+
+        self._undone_moves.append(shot)
+        return True
+
+    def redo(self) -> bool:
+        """
+        Replays the last undone move (emitting its events again).
+        Returns False if there is no move to redo.
+        """
+        if not self._undone_moves:
+            return False
+        shot = self._undone_moves.pop()
+        self._call_square(shot.row_idx, shot.col_idx)
+        return True
+
+
+def _get_value_mask(grid: GameGrid, value) -> int:
+    """ Bitboard of the squares of the grid holding the value (see BitboardGameGrid) """
+    if isinstance(grid, BitboardGameGrid):
+        return grid.value_mask(value)
+    if isinstance(grid, NumpyGameGrid):
+        return int.from_bytes(
+            np.packbits(grid.value_array(value).ravel(), bitorder="little").tobytes(),
+            "little",
+        )
+    mask = 0
+    for row_idx, row in enumerate(grid.grid):
+        for col_idx, square_value in enumerate(row):
+            if square_value == value:
+                mask |= 1 << (row_idx * grid.num_cols + col_idx)
+    return mask
+
+
+def _set_value_mask(grid: GameGrid, value, mask: int):
+    """ Set every square in the bitboard to the value """
+    if isinstance(grid, BitboardGameGrid):
+        grid.set_value_mask(value, mask)
+        return
+    if isinstance(grid, NumpyGameGrid):
+        grid.set_value_array(value, _mask_to_array(mask, grid.num_rows, grid.num_cols))
+        return
+    while mask:
+        lowest_bit = mask & -mask
+        row_idx, col_idx = divmod(lowest_bit.bit_length() - 1, grid.num_cols)
+        grid.update_grid(row_idx, col_idx, value)
+        mask ^= lowest_bit
+
+
+def get_value_array(grid: GameGrid, value) -> np.ndarray:
+    """ (num_rows, num_cols) Booleans, True for the squares of the grid holding the value """
+    if isinstance(grid, NumpyGameGrid):
+        return grid.value_array(value)
+    if isinstance(grid, BitboardGameGrid):
+        return _mask_to_array(grid.value_mask(value), grid.num_rows, grid.num_cols)
+    return np.array(
+        [[square_value == value for square_value in row] for row in grid.grid],
+        dtype=bool,
+    )
+
+
+def get_value_mask(grid: GameGrid, value) -> int:
+    """ The squares of the grid holding the value, as a bitboard (see BitboardGameGrid) """
+    if isinstance(grid, BitboardGameGrid):
+        return grid.value_mask(value)
+    return array_to_mask(get_value_array(grid, value))
+
+
+def array_to_mask(squares: np.ndarray) -> int:
+    """ The (num_rows, num_cols) Booleans as a bitboard """
+    return int.from_bytes(
+        np.packbits(
+            np.asarray(squares, dtype=bool).ravel(), bitorder="little"
+        ).tobytes(),
+        "little",
+    )
+
+
+def _mask_to_array(mask: int, num_rows: int, num_cols: int) -> np.ndarray:
+    """ The bitboard as (num_rows, num_cols) Booleans """
+    num_squares = num_rows * num_cols
+    squares = np.unpackbits(
+        np.frombuffer(mask.to_bytes((num_squares + 7) // 8, "little"), np.uint8),
+        count=num_squares,
+        bitorder="little",
+    )
+    return squares.reshape(num_rows, num_cols).astype(bool)
+
+
+def _guessed_array(guesses: Optional[List[List]]) -> Optional[np.ndarray]:
+    """ Booleans, True for the squares of the guesses grid that were guessed """
+    if guesses is None:
+        return None
+    return np.array(
+        [[guess != LOCATION_NOT_GUESSED for guess in row] for row in guesses],
+        dtype=bool,
+    )
+
+
+def _is_rect_empty(
+    grid: GameGrid, top_row_idx: int, left_col_idx: int, height: int, width: int
+) -> bool:
+    """ True if the rectangle (clipped to the grid bounds) only holds the initial value """
+    if isinstance(grid, NumpyGameGrid):
+        return grid.is_rect_empty(top_row_idx, left_col_idx, height, width)
+    if isinstance(grid, BitboardGameGrid):
+        return not (
+            grid.rect_mask(top_row_idx, left_col_idx, height, width)
+            & grid.occupied_mask()
+        )
+    for row_idx in range(max(0, top_row_idx), min(grid.num_rows, top_row_idx + height)):
+        for col_idx in range(
+            max(0, left_col_idx), min(grid.num_cols, left_col_idx + width)
+        ):
+            if grid.read_grid(row_idx, col_idx) != SHIP_LOCATION_EMPTY:
+                return False
+    return True
+
+
+def _grid_to_changes(grid_symbols: List[List[str]]) -> Dict[Tuple[int, int], str]:
+    return {
+        (row_idx, col_idx): symbol
+        for row_idx, row in enumerate(grid_symbols)
+        for col_idx, symbol in enumerate(row)
+    }
+
 
 def main():
     # CLASS_NAME() calls __init__() method (i.e. the "constructor")
@@ -2,7 +2,7 @@ import pygame
 import pygame_gui
 from tabulate import tabulate
 
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 
 class Grid:
@@ -89,3 +89,9 @@ class Grid:
                 else:
                     button_text = text_list[r][c]
                 self._board_buttons[r][c].set_text(button_text)
+
+    def update_board_cells(self, changes: Dict[Tuple[int, int], Optional[str]]):
+        """ Like update_board_text, but only updates the buttons of the changed squares """
+        for (r, c), text in changes.items():
+            self._board_buttons[r][c].rebuild()
+            self._board_buttons[r][c].set_text("" if text is None else text)
@@ -0,0 +1,228 @@
+import click
+import csv
+import json
+import multiprocessing
+import random
+import time
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from bots import BOTS
+from game_grid import GRID_BACKENDS
+from game_state import BattleshipGameState, STANDARD_SHIP_DIMENSIONS
+from opening_book import OpeningBookBot
+from placement_index import load_fleet_placement_indexes
+
+
+class GameResult(NamedTuple):
+    seed: int
+    winner: str
+    num_turns: int
+    shots_a: int
+    hits_a: int
+    shots_b: int
+    hits_b: int
+
+
+def simulate_game(
+    attacker_a,
+    attacker_b,
+    seed: int,
+    num_rows: int = 10,
+    num_cols: int = 10,
+    ship_dims: Optional[List[Tuple[int, int]]] = None,
+    grid_backend: str = "bitboard",
+) -> GameResult:
+    """
+    Plays a full game between two bots, without a GUI and without printing. Both fleets
+    are placed randomly, and attacker_a (our side of the game state) shoots first. A
+    player keeps shooting until they miss, as in the GUI.
+
+    attacker_a, attacker_b - bots with a choose_square method (see bots.py)
+    seed - seeds the ship placements and the bots, so the game can be replayed
+
+    Returns: the winner ("a" or "b"), the number of turns (a turn lasts until its player
+    misses), and the number of shots and hits of each player
+    """
+    if ship_dims is None:
+        ship_dims = STANDARD_SHIP_DIMENSIONS
+    rng = random.Random(seed)
+    game_state = BattleshipGameState(
+        num_rows=num_rows,
+        num_cols=num_cols,
+        ships_dimensions=ship_dims,
+        grid_backend=grid_backend,
+        verbose=False,
+    )
+    game_state.randomize_ship_placements(ship_dims, our_ships=True, rng=rng)
+    game_state.randomize_ship_placements(ship_dims, our_ships=False, rng=rng)
+
+    # indexed by side: 0 for attacker_a (our side), 1 for attacker_b
+    num_shots = [0, 0]
+    num_hits = [0, 0]
+    num_turns = 1
+    our_side = game_state.is_my_turn
+    while not game_state.is_game_over:
+        our_side = game_state.is_my_turn
+        attacker = attacker_a if our_side else attacker_b
+        row_idx, col_idx = attacker.choose_square(game_state, our_side, rng)
+        side_idx = 0 if our_side else 1
+        num_shots[side_idx] += 1
+        if game_state.call_square(row_idx, col_idx):
+            num_hits[side_idx] += 1
+        if game_state.is_my_turn != our_side:
+            num_turns += 1
+
+    return GameResult(
+        seed=seed,
+        winner="a" if our_side else "b",
+        num_turns=num_turns,
+        shots_a=num_shots[0],
+        hits_a=num_hits[0],
+        shots_b=num_shots[1],
+        hits_b=num_hits[1],
+    )
+
+
+def _make_bot(bot_name: str, opening_book: bool):
+    bot = BOTS[bot_name]()
+    return OpeningBookBot(bot, bot_name) if opening_book else bot
+
+
+def _simulate_game_worker(
+    args: Tuple[str, str, int, int, int, List[Tuple[int, int]], str, bool],
+) -> GameResult:
+    bot_a, bot_b, seed, num_rows, num_cols, ship_dims, grid_backend, opening_book = args
+    return simulate_game(
+        _make_bot(bot_a, opening_book),
+        _make_bot(bot_b, opening_book),
+        seed,
+        num_rows=num_rows,
+        num_cols=num_cols,
+        ship_dims=ship_dims,
+        grid_backend=grid_backend,
+    )
+
+
+def simulate_many(
+    bot_a: str,
+    bot_b: str,
+    num_games: int,
+    random_seed: int = 0,
+    num_rows: int = 10,
+    num_cols: int = 10,
+    ship_dims: Optional[List[Tuple[int, int]]] = None,
+    grid_backend: str = "bitboard",
+    num_workers: int = 1,
+    opening_book: bool = False,
+) -> Iterator[GameResult]:
+    """
+    Plays num_games games between the named bots (see bots.BOTS), yielding each result
+    as soon as it is ready (in order of the games), so results can be streamed to disk.
+    Game game_idx is played with seed random_seed + game_idx, so any game can be
+    replayed with simulate_game.
+
+    num_workers - split the games across this many processes
+    opening_book - play the openings from the bots' opening books, where there are
+        some (see opening_book.py)
+    """
+    if ship_dims is None:
+        ship_dims = STANDARD_SHIP_DIMENSIONS
+    game_args = (
+        (
+            bot_a,
+            bot_b,
+            random_seed + game_idx,
+            num_rows,
+            num_cols,
+            ship_dims,
+            grid_backend,
+            opening_book,
+        )
+        for game_idx in range(num_games)
+    )
+    if num_workers == 1:
+        yield from map(_simulate_game_worker, game_args)
+        return
+    with multiprocessing.Pool(num_workers) as pool:
+        yield from pool.imap(_simulate_game_worker, game_args, chunksize=256)
+
+
+@click.command()
+@click.option("--num-games", "-n", type=int, required=True)
+@click.option("--bot-a", type=click.Choice(sorted(BOTS)), default="random")
+@click.option("--bot-b", type=click.Choice(sorted(BOTS)), default="random")
+@click.option("--random-seed", "-r", type=int, default=0)
+@click.option("--out-file", "-o", type=str, required=True)
+@click.option(
+    "--format",
+    "out_format",
+    type=click.Choice(["csv", "jsonl"]),
+    help="output format (default: from the extension of --out-file)",
+)
+@click.option("--num-rows", type=int, default=10)
+@click.option("--num-cols", type=int, default=10)
+@click.option(
+    "--grid-backend", type=click.Choice(sorted(GRID_BACKENDS)), default="bitboard"
+)
+@click.option(
+    "--workers",
+    "-w",
+    "num_workers",
+    type=int,
+    default=1,
+    help="split the games across this many processes",
+)
+@click.option(
+    "--opening-book",
+    is_flag=True,
+    help="play the openings from the bots' opening books (see opening_book.py)",
+)
+def cli(
+    num_games: int,
+    bot_a: str,
+    bot_b: str,
+    random_seed: int,
+    out_file: str,
+    out_format: Optional[str],
+    num_rows: int,
+    num_cols: int,
+    grid_backend: str,
+    num_workers: int,
+    opening_book: bool,
+):
+    if out_format is None:
+        out_format = "jsonl" if out_file.endswith(".jsonl") else "csv"
+
+    load_fleet_placement_indexes(num_rows, num_cols, STANDARD_SHIP_DIMENSIONS)
+    start_time = time.perf_counter()
+    num_wins_a = 0
+    with open(out_file, "w", newline="") as out:
+        if out_format == "csv":
+            writer = csv.writer(out)
+            writer.writerow(GameResult._fields)
+        for result in simulate_many(
+            bot_a,
+            bot_b,
+            num_games,
+            random_seed=random_seed,
+            num_rows=num_rows,
+            num_cols=num_cols,
+            grid_backend=grid_backend,
+            num_workers=num_workers,
+            opening_book=opening_book,
+        ):
+            if out_format == "csv":
+                writer.writerow(result)
+            else:
+                out.write(json.dumps(result._asdict()) + "\n")
+            num_wins_a += result.winner == "a"
+
+    elapsed_time = time.perf_counter() - start_time
+    print(
+        f"{num_games} games in {elapsed_time:.1f}s ({num_games / elapsed_time:.0f} games/s), "
+        f"{bot_a} (a) won {num_wins_a / num_games:.1%} against {bot_b} (b)"
+    )
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,117 @@
+import functools
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, List
+
+# events emitted by BattleshipGameState, with the keyword arguments passed to subscribers
+# ship_placed: is_our_ship, ship_value, top_row_idx, left_col_idx, ship_height, ship_width
+SHIP_PLACED = "ship_placed"
+# ship_cleared: is_our_ship, ship_value
+SHIP_CLEARED = "ship_cleared"
+# shot: by_us, row_idx, col_idx, is_hit
+SHOT = "shot"
+# hit: by_us, row_idx, col_idx, ship_value (only the first hit on a square)
+HIT = "hit"
+# ship_sunk: is_our_ship, ship_value
+SHIP_SUNK = "ship_sunk"
+# game_over: we_won
+GAME_OVER = "game_over"
+GAME_EVENTS = [SHIP_PLACED, SHIP_CLEARED, SHOT, HIT, SHIP_SUNK, GAME_OVER]
+
+# emitted by long-running sampling loops: num_iterations_done, num_iterations, rate
+# (iterations per second)
+PROGRESS = "progress"
+# emitted by sampling loops with a target precision each time the error is estimated:
+# num_samples, error, is_final (True for the final estimate, once sampling stopped)
+PRECISION = "precision"
+
+
+class Instrumentation:
+    """
+    Subscribable events, per-event counters and optional timing of method calls.
+
+    Nothing is computed unless someone is listening: emitting code checks the enabled
+    attribute before building an event (one attribute lookup when it's False), and
+    timing wraps the methods of one instance only, leaving every other instance as is.
+    """
+
+    def __init__(self):
+        # event -> callbacks (an event is only present while it has subscribers)
+        self.subscribers: Dict[str, List[Callable[..., None]]] = {}
+        # number of times each event was emitted (if counting), and each timed method called
+        self.counters: Counter = Counter()
+        # total seconds spent in each timed method
+        self.timings: Dict[str, float] = {}
+        self.is_counting = False
+        # True if emitting an event does anything
+        self.enabled = False
+
+    def _update_enabled(self):
+        self.enabled = self.is_counting or bool(self.subscribers)
+
+    def subscribe(
+        self, event: str, callback: Callable[..., None]
+    ) -> Callable[..., None]:
+        """ callback - called with the event's keyword arguments (returned as is) """
+        self.subscribers.setdefault(event, []).append(callback)
+        self._update_enabled()
+        return callback
+
+    def unsubscribe(self, event: str, callback: Callable[..., None]):
+        callbacks = self.subscribers.get(event, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+        if not callbacks:
+            self.subscribers.pop(event, None)
+        self._update_enabled()
+
+    def set_counting(self, is_counting: bool = True):
+        """ Count the number of times each event is emitted, in counters """
+        self.is_counting = is_counting
+        self._update_enabled()
+
+    def emit(self, event: str, **kwargs):
+        if self.is_counting:
+            self.counters[event] += 1
+        for callback in self.subscribers.get(event, []):
+            callback(**kwargs)
+
+    def time_methods(self, obj, method_names: Iterable[str]):
+        """
+        Wraps the methods of obj (the instance, not its class) to count their calls in
+        counters and add up their run time in timings, keyed by method name.
+        """
+        for method_name in method_names:
+            method = getattr(obj, method_name)
+            setattr(obj, method_name, self._timed(method_name, method))
+
+    def untime_methods(self, obj, method_names: Iterable[str]):
+        for method_name in method_names:
+            if method_name in vars(obj):
+                delattr(obj, method_name)
+
+    def _timed(self, name: str, method: Callable) -> Callable:
+        @functools.wraps(method)
+        def timed_method(*args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.timings[name] = (
+                    self.timings.get(name, 0.0) + time.perf_counter() - start_time
+                )
+                self.counters[name] += 1
+
+        return timed_method
+
+
+def print_events(
+    instrumentation: Instrumentation, events: Iterable[str] = tuple(GAME_EVENTS)
+):
+    """ Subscribes a callback printing each of the events to stdout """
+    for event in events:
+        instrumentation.subscribe(event, functools.partial(_print_event, event))
+
+
+def _print_event(event: str, **kwargs):
+    print(f"{event}: " + ", ".join(f"{key} = {value}" for key, value in kwargs.items()))
@@ -1,12 +1,15 @@
 import pygame
 import pygame_gui
 import random
+from bots import ProbabilityDensityBot
+from computer_turn import ComputerTurn
 from gui.grid import Grid
 from game_state import (
     BattleshipGameState,
     STANDARD_SHIP_DIMENSIONS,
     SHIP_LOCATION_EMPTY,
 )
+from placement_index import load_fleet_placement_indexes
 from ship_placement import random_ships_placement
 
 
@@ -131,17 +134,20 @@ randomize_placement_button = pygame_gui.elements.UIButton(
     manager=manager,
 )
 
+# load the placement index of each ship (from the disk cache, if it's warm)
+load_fleet_placement_indexes(num_rows, num_cols, STANDARD_SHIP_DIMENSIONS)
+
 # initialize game state
 game_state = BattleshipGameState()
 game_state.randomize_ship_placements(
     ship_dims=STANDARD_SHIP_DIMENSIONS, our_ships=False
 )
+# the computer chooses its squares in a worker thread, so the frames keep coming
+computer_turn = ComputerTurn(ProbabilityDensityBot())
 
 # initialize the grids after placement phase
-new_home_grid = game_state.get_player_home_grid()
-new_tracking_grid = game_state.get_player_tracking_grid()
-home_grid.update_board_text(new_home_grid)
-tracking_grid.update_board_text(new_tracking_grid)
+home_grid.update_board_cells(game_state.poll_home_grid_changes())
+tracking_grid.update_board_cells(game_state.poll_tracking_grid_changes())
 
 # disable grid based on which player's turn it is
 if not game_state.ships_placed:
@@ -165,15 +171,12 @@ next_ship_index = 0
 placing_ships = True
 confirm_placement_button.disable()
 
-# delay counter for computer's turn
-thinking_delay = 0
+# home grid squares currently showing a preview of the next ship placement
+preview_squares = set()
 
 while is_running:
     time_delta = clock.tick(30) / 1000.0
 
-    if placing_ships:
-        ship_placement_render = game_state.get_player_home_grid()
-
     # disable buttons based on whose turn it is
     # TODO why does the opposite grid's button theme/color change when a player scores a hit
     # (but the turn hasn't finished)
@@ -191,27 +194,16 @@ while is_running:
         tracking_grid.enable_board_buttons()
     else:
         # disable buttons and allow computer to move
-        game_status_label.set_text("Opponent's turn!")
+        game_status_label.set_text("Opponent is thinking...")
         home_grid.disable_board_buttons()
         tracking_grid.disable_board_buttons()
-        if thinking_delay <= 0:
-            thinking_delay = 15
-
-        thinking_delay -= 1
-        if not game_state.is_my_turn and thinking_delay <= 0:
-            row_idx = random.randrange(game_state.num_rows)
-            col_idx = random.randrange(game_state.num_cols)
-            print(f"computer guesses ({row_idx}, {col_idx})")
-
-            game_state.call_square(row_idx, col_idx)
-            new_home_grid = game_state.get_player_home_grid()
-            new_tracking_grid = game_state.get_player_tracking_grid()
-            home_grid.update_board_text(new_home_grid)
-            tracking_grid.update_board_text(new_tracking_grid)
-            thinking_delay = 0
+        if not computer_turn.is_thinking:
+            computer_turn.start(game_state, our_side=False, rng=random)
+        computer_square = computer_turn.poll(game_state, our_side=False, rng=random)
+        if computer_square is not None:
+            game_state.call_square(*computer_square)
 
     if game_state.ships_placed and not confirm_placement_button.is_enabled:
-        print("ships are ready, enabling the confirmation button")
         confirm_placement_button.enable()
 
     for event in pygame.event.get():
@@ -232,15 +224,12 @@ while is_running:
                         randomize_placement_button.hide()
                     if event.ui_element == randomize_placement_button:
                         # TODO UI bug: how come the button press sometimes is not registered?
-                        print("randomizing player ship locations")
                         game_state.clear_all_ship_placements(
                             game_state.our_ship_locations
                         )
                         game_state.randomize_ship_placements(
                             ship_dims=STANDARD_SHIP_DIMENSIONS, our_ships=True
                         )
-                        new_home_grid = game_state.get_player_home_grid()
-                        home_grid.update_board_text(new_home_grid)
                     if home_grid.is_element_on_board(event.ui_element):
                         row_idx, col_idx = home_grid.get_element_index(event.ui_element)
                         ship_loc_value = game_state.our_ship_locations.read_grid(
@@ -248,9 +237,6 @@ while is_running:
                         )
                         if ship_loc_value == SHIP_LOCATION_EMPTY:
                             ship_width, ship_height = ship_dimensions[next_ship_index]
-                            print(
-                                f"attempting to place ship dims ({ship_height}, {ship_width}) on ({row_idx}, {col_idx})"
-                            )
                             ship_placement_success = game_state.place_ship(
                                 row_idx,
                                 col_idx,
@@ -263,22 +249,23 @@ while is_running:
                                 next_ship_index = (next_ship_index + 1) % len(
                                     ship_dimensions
                                 )
-                                new_home_grid = game_state.get_player_home_grid()
-                                home_grid.update_board_text(new_home_grid)
                         else:
                             # rotate the ship
-                            rotate_success = game_state.rotate_ship_placement(
+                            game_state.rotate_ship_placement(
                                 game_state.our_ship_locations, ship_loc_value
                             )
-                            if rotate_success:
-                                new_home_grid = game_state.get_player_home_grid()
-                                home_grid.update_board_text(new_home_grid)
                 if event.user_type == pygame_gui.UI_BUTTON_ON_HOVERED:
                     if home_grid.is_element_on_board(event.ui_element):
                         row_idx, col_idx = home_grid.get_element_index(event.ui_element)
                         ship_loc_value = game_state.our_ship_locations.read_grid(
                             row_idx, col_idx
                         )
+                        # restore the squares of the previous preview
+                        preview_changes = {
+                            square: game_state.get_home_square_symbol(*square)
+                            for square in preview_squares
+                        }
+                        preview_squares = set()
                         if ship_loc_value == SHIP_LOCATION_EMPTY:
                             for r in range(
                                 row_idx,
@@ -294,14 +281,9 @@ while is_running:
                                         col_idx + ship_dimensions[next_ship_index][0],
                                     ),
                                 ):
-                                    ship_placement_render[r][c] = str(
-                                        next_ship_index + 1
-                                    )
-
-                            home_grid.update_board_text(ship_placement_render)
-                        else:
-                            ship_placement_render = game_state.get_player_home_grid()
-                            home_grid.update_board_text(ship_placement_render)
+                                    preview_changes[(r, c)] = str(next_ship_index + 1)
+                                    preview_squares.add((r, c))
+                        home_grid.update_board_cells(preview_changes)
             else:
                 # in playing phase
                 if event.user_type == pygame_gui.UI_BUTTON_PRESSED:
@@ -310,14 +292,12 @@ while is_running:
                             event.ui_element
                         )
 
-                        if game_state.is_my_turn:
+                        # squares can only be called once
+                        if (
+                            game_state.is_my_turn
+                            and (row_idx, col_idx) in game_state.our_unguessed
+                        ):
                             game_state.call_square(row_idx, col_idx)
-                            new_home_grid = game_state.get_player_home_grid()
-                            new_tracking_grid = game_state.get_player_tracking_grid()
-                            home_grid.update_board_text(new_home_grid)
-                            tracking_grid.update_board_text(new_tracking_grid)
-                        else:
-                            print(f"not the player's turn!")
                     # elif home_grid.is_element_on_board(event.ui_element):
                     #     row_idx, col_idx = home_grid.get_element_index(event.ui_element)
 
@@ -335,9 +315,19 @@ while is_running:
     home_grid_rect = pygame.Rect(
         (home_grid_left, home_grid_top), (board_width, board_height)
     )
-    if placing_ships and not home_grid_rect.collidepoint(pygame.mouse.get_pos()):
-        ship_placement_render = game_state.get_player_home_grid()
-        home_grid.update_board_text(ship_placement_render)
+    if preview_squares and not home_grid_rect.collidepoint(pygame.mouse.get_pos()):
+        # the mouse left the home grid: restore the squares of the preview
+        home_grid.update_board_cells(
+            {
+                square: game_state.get_home_square_symbol(*square)
+                for square in preview_squares
+            }
+        )
+        preview_squares = set()
+
+    # only redraw the squares that changed since the last frame
+    home_grid.update_board_cells(game_state.poll_home_grid_changes())
+    tracking_grid.update_board_cells(game_state.poll_tracking_grid_changes())
 
     manager.update(time_delta)
 
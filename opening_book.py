@@ -0,0 +1,291 @@
+import click
+import os
+import random
+import time
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from bots import (
+    BOTS,
+    Observation,
+    choose_best_square,
+    get_guesses_grid,
+    get_unguessed_squares,
+)
+from game_state import (
+    BattleshipGameState,
+    LOCATION_GUESS_HIT,
+    LOCATION_GUESS_MISS,
+    STANDARD_SHIP_DIMENSIONS,
+    get_value_mask,
+)
+from instrumentation import PROGRESS, Instrumentation, print_events
+from placement_index import load_fleet_placement_indexes, save_npz_atomically
+
+DEFAULT_BOOK_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "opening_book"
+)
+
+# bots that can have an opening book: their choice only depends on the observation
+BOOK_BOTS = sorted(name for name, bot in BOTS.items() if hasattr(bot, "best_squares"))
+
+
+class OpeningBook:
+    """
+    The squares a bot chooses between in each position of the opening (before its first
+    hit), up to depth shots into the game. Positions are keyed by their misses as a
+    bitboard (see BitboardGameGrid), so the order of the shots doesn't matter.
+    """
+
+    def __init__(
+        self,
+        num_rows: int,
+        num_cols: int,
+        depth: int,
+        best_squares: Dict[int, np.ndarray],
+    ):
+        """ best_squares - misses bitboard -> flat indexes of the squares to choose between """
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.depth = depth
+        self.best_squares = best_squares
+
+    def __len__(self) -> int:
+        return len(self.best_squares)
+
+    def choose_square(
+        self, game_state: BattleshipGameState, our_side: bool, rng: random.Random
+    ) -> Optional[Tuple[int, int]]:
+        """
+        Returns: (row_idx, col_idx) of the bot's square for the position (breaking ties
+        at random), or None once the game is out of the book
+        """
+        num_guessed = self.num_rows * self.num_cols - len(
+            get_unguessed_squares(game_state, our_side)
+        )
+        if num_guessed >= self.depth:
+            return None
+        misses_mask = 0
+        if num_guessed > 0:
+            guesses_grid = get_guesses_grid(game_state, our_side)
+            if get_value_mask(guesses_grid, LOCATION_GUESS_HIT):
+                return None
+            misses_mask = get_value_mask(guesses_grid, LOCATION_GUESS_MISS)
+        best_square_idxs = self.best_squares.get(misses_mask)
+        if best_square_idxs is None or len(best_square_idxs) == 0:
+            return None
+        return choose_best_square(best_square_idxs, self.num_cols, rng)
+
+    def save(self, path: str):
+        """
+        Saves the book as a .npz file: the bit-packed misses of every position, and the
+        squares of all positions in one array, split by offsets
+        """
+        misses_masks = sorted(self.best_squares)
+        num_bytes = (self.num_rows * self.num_cols + 7) // 8
+        misses = np.frombuffer(
+            b"".join(mask.to_bytes(num_bytes, "little") for mask in misses_masks),
+            dtype=np.uint8,
+        ).reshape(len(misses_masks), num_bytes)
+        squares = [self.best_squares[mask] for mask in misses_masks]
+        offsets = np.cumsum([0] + [len(square_idxs) for square_idxs in squares])
+        save_npz_atomically(
+            path,
+            shape=np.array([self.num_rows, self.num_cols, self.depth]),
+            misses=misses,
+            offsets=offsets.astype(np.uint32),
+            squares=np.concatenate(squares).astype(np.uint16),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "OpeningBook":
+        with np.load(path) as book:
+            num_rows, num_cols, depth = book["shape"].tolist()
+            offsets = book["offsets"].tolist()
+            squares = book["squares"].astype(np.int64)
+            best_squares = {
+                int.from_bytes(misses.tobytes(), "little"): squares[start:end]
+                for misses, start, end in zip(book["misses"], offsets, offsets[1:])
+            }
+        return cls(num_rows, num_cols, depth, best_squares)
+
+
+def opening_book_path(
+    num_rows: int,
+    num_cols: int,
+    ship_dims: List[Tuple[int, int]],
+    bot_name: str,
+    book_dir: str = DEFAULT_BOOK_DIR,
+) -> str:
+    fleet = "_".join(
+        f"{ship_height}x{ship_width}"
+        for ship_height, ship_width in sorted(ship_dims, reverse=True)
+    )
+    return os.path.join(
+        book_dir, f"opening_book_{bot_name}_{num_rows}x{num_cols}_{fleet}.npz"
+    )
+
+
+# in-memory cache of the books loaded, keyed by path (None if there's no book)
+_opening_books: Dict[str, Optional[OpeningBook]] = {}
+
+
+def get_opening_book(
+    num_rows: int,
+    num_cols: int,
+    ship_dims: List[Tuple[int, int]],
+    bot_name: str,
+    book_dir: str = DEFAULT_BOOK_DIR,
+) -> Optional[OpeningBook]:
+    """ Returns the bot's opening book, loading it on first use (None if there's none) """
+    path = opening_book_path(num_rows, num_cols, ship_dims, bot_name, book_dir)
+    if path not in _opening_books:
+        _opening_books[path] = OpeningBook.load(path) if os.path.exists(path) else None
+    return _opening_books[path]
+
+
+def build_opening_book(
+    bot,
+    num_rows: int,
+    num_cols: int,
+    ship_dims: List[Tuple[int, int]],
+    depth: int,
+    max_positions: int = 100000,
+    rng: Optional[random.Random] = None,
+    instrumentation: Optional[Instrumentation] = None,
+) -> OpeningBook:
+    """
+    Runs the bot over the miss-only prefix tree: starting from the empty board, each
+    square the bot chooses between is assumed to miss, until depth shots. The tree only
+    branches where the bot has ties, and positions reached by several orders of shots
+    are expanded once.
+
+    bot - bot with a best_squares method (see BOOK_BOTS)
+    max_positions - stop expanding the tree past this many positions (the positions
+        left out are played by the bot itself)
+    instrumentation - emits PROGRESS after each level of the tree
+    """
+    if rng is None:
+        rng = random.Random(0)
+    no_squares = np.zeros((num_rows, num_cols), dtype=bool)
+    best_squares = {}
+    # misses bitboard -> misses of the positions of the current level
+    positions = {0: no_squares}
+    start_time = time.perf_counter()
+    for num_shots in range(depth):
+        next_positions = {}
+        for misses_mask, misses in positions.items():
+            observation = Observation(
+                hits=no_squares,
+                misses=misses,
+                sunk_squares=no_squares,
+                remaining_ship_dims=list(ship_dims),
+            )
+            best_squares[misses_mask] = bot.best_squares(observation, rng)
+            for square_idx in best_squares[misses_mask].tolist():
+                next_mask = misses_mask | 1 << square_idx
+                if (
+                    next_mask in next_positions
+                    or len(best_squares) + len(next_positions) >= max_positions
+                ):
+                    continue
+                next_positions[next_mask] = misses.copy()
+                next_positions[next_mask].flat[square_idx] = True
+        positions = next_positions
+
+        if instrumentation is not None and instrumentation.enabled:
+            elapsed_time = time.perf_counter() - start_time
+            instrumentation.emit(
+                PROGRESS,
+                num_iterations_done=num_shots + 1,
+                num_iterations=depth,
+                rate=len(best_squares) / elapsed_time if elapsed_time > 0 else 0.0,
+            )
+    return OpeningBook(num_rows, num_cols, depth, best_squares)
+
+
+class OpeningBookBot:
+    """
+    Plays the opening from the bot's opening book for the board and fleet of the game
+    (loaded on first use, see get_opening_book), and lets the bot choose once the game
+    is out of the book, or if there is no book.
+    """
+
+    def __init__(self, bot, bot_name: str, book_dir: str = DEFAULT_BOOK_DIR):
+        """ bot_name - name of the bot in bots.BOTS, which its book is saved under """
+        self.bot = bot
+        self.bot_name = bot_name
+        self.book_dir = book_dir
+        # number of squares chosen from the book
+        self.num_book_moves = 0
+        self._book_key = None
+        self._book: Optional[OpeningBook] = None
+
+    def choose_square(
+        self, game_state: BattleshipGameState, our_side: bool, rng: random.Random
+    ) -> Tuple[int, int]:
+        """ See RandomBot.choose_square """
+        ships = game_state.opponent_ships if our_side else game_state.our_ships
+        ship_dims = [ship_dims for _, ship_dims in ships]
+        book_key = (game_state.num_rows, game_state.num_cols, tuple(ship_dims))
+        if book_key != self._book_key:
+            self._book_key = book_key
+            self._book = get_opening_book(
+                game_state.num_rows,
+                game_state.num_cols,
+                ship_dims,
+                self.bot_name,
+                self.book_dir,
+            )
+        if self._book is not None:
+            square = self._book.choose_square(game_state, our_side, rng)
+            if square is not None:
+                self.num_book_moves += 1
+                return square
+        return self.bot.choose_square(game_state, our_side, rng)
+
+
+@click.command()
+@click.option("--bot", "bot_name", type=click.Choice(BOOK_BOTS), default="density")
+@click.option("--depth", "-d", type=int, default=10, help="number of shots")
+@click.option("--num-rows", type=int, default=10)
+@click.option("--num-cols", type=int, default=10)
+@click.option("--max-positions", type=int, default=100000)
+@click.option("--random-seed", "-r", type=int, default=0)
+@click.option("--book-dir", type=str, default=DEFAULT_BOOK_DIR)
+def cli(
+    bot_name: str,
+    depth: int,
+    num_rows: int,
+    num_cols: int,
+    max_positions: int,
+    random_seed: int,
+    book_dir: str,
+):
+    load_fleet_placement_indexes(num_rows, num_cols, STANDARD_SHIP_DIMENSIONS)
+    instrumentation = Instrumentation()
+    print_events(instrumentation, [PROGRESS])
+    start_time = time.perf_counter()
+    book = build_opening_book(
+        BOTS[bot_name](),
+        num_rows,
+        num_cols,
+        STANDARD_SHIP_DIMENSIONS,
+        depth,
+        max_positions=max_positions,
+        rng=random.Random(random_seed),
+        instrumentation=instrumentation,
+    )
+    os.makedirs(book_dir, exist_ok=True)
+    path = opening_book_path(
+        num_rows, num_cols, STANDARD_SHIP_DIMENSIONS, bot_name, book_dir
+    )
+    book.save(path)
+    print(
+        f"{len(book)} positions to depth {depth} in "
+        f"{time.perf_counter() - start_time:.1f}s, saved to {path}"
+    )
+
+
+if __name__ == "__main__":
+    cli()
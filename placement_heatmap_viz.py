@@ -1,50 +1,146 @@
 import click
+import json
+import multiprocessing
+import os
 import random
 import time
+from statistics import NormalDist
 import seaborn as sns
 import matplotlib.pylab as plt
 import numpy as np
 from typing import List, Optional, Tuple
 
+from exact_placement import compute_exact_placement_distribution
 from game_state import STANDARD_SHIP_DIMENSIONS
-from ship_placement import random_ships_placement
+from instrumentation import Instrumentation, PRECISION, PROGRESS, print_events
+from placement_index import load_fleet_placement_indexes
+from ship_placement import random_ships_placement, sample_ships_placements
 
 
 NUM_ROWS = 10
 NUM_COLS = 10
 
 
-def compute_symmetries(square_numpy_array: np.ndarray) -> List[np.ndarray]:
-    assert len(square_numpy_array.shape) == 2
-    assert square_numpy_array.shape[0] == square_numpy_array.shape[1]
+def compute_symmetries(board_array: np.ndarray) -> List[np.ndarray]:
+    """
+    Returns the images of the board under every symmetry of the board (including the
+    identity): the 8 rotations and reflections of a square board, or the 4 of a
+    non-square board (identity, vertical and horizontal reflections, and 180 degree rotation)
 
-    symmetry = square_numpy_array.copy()
-    return []
+    board_array - a (num_rows, num_cols) array, or a stack of boards (..., num_rows, num_cols)
+    """
+    assert len(board_array.shape) >= 2
+    board_axes = (-2, -1)
+
+    symmetries = [
+        board_array,
+        np.flip(board_array, axis=-2),
+        np.flip(board_array, axis=-1),
+        np.rot90(board_array, 2, axes=board_axes),
+    ]
+    if board_array.shape[-2] == board_array.shape[-1]:
+        symmetries += [
+            np.rot90(board_array, 1, axes=board_axes),
+            np.rot90(board_array, 3, axes=board_axes),
+            np.swapaxes(board_array, -2, -1),
+            np.swapaxes(np.rot90(board_array, 2, axes=board_axes), -2, -1),
+        ]
+    return symmetries
 
 
 def compute_placement_distribution(
-    ship_dims: List[Tuple[int, int]], num_iterations: int, with_symmetries: bool = False
+    ship_dims: List[Tuple[int, int]],
+    num_iterations: int,
+    with_symmetries: bool = False,
+    batch_size: Optional[int] = None,
+    rng: Optional[np.random.Generator] = None,
+    backtracking: bool = False,
+    target_error: Optional[float] = None,
+    confidence: Optional[float] = None,
+    instrumentation: Optional[Instrumentation] = None,
 ) -> np.ndarray:
+    """
+    batch_size - if set, sample the fleets in chunks of batch_size with sample_ships_placements
+        (using rng) instead of one at a time with random_ships_placement
+    backtracking - if True, sample the fleets one at a time with backtracking_ships_placement
+    target_error - if set, stop sampling (with the batched sampler) as soon as the
+        precision of every square reaches the target (see
+        compute_placement_distribution_to_precision), with num_iterations as the maximum
+    instrumentation - if set, progress events are emitted to it while sampling (and
+        precision events with the achieved error, if target_error is set)
+    """
+    if target_error is not None:
+        assert not backtracking, "Only the batched sampler supports a target error"
+        placement_distribution, _, _ = compute_placement_distribution_to_precision(
+            ship_dims,
+            target_error,
+            max_iterations=num_iterations,
+            batch_size=batch_size if batch_size is not None else 10000,
+            with_symmetries=with_symmetries,
+            confidence=confidence,
+            rng=rng,
+            instrumentation=instrumentation,
+        )
+        return placement_distribution
+
+    sampled_placements, num_samples = compute_placement_counts(
+        ship_dims,
+        num_iterations,
+        with_symmetries,
+        batch_size,
+        rng,
+        backtracking,
+        instrumentation,
+    )
+    return sampled_placements / num_samples
+
+
+def compute_placement_counts(
+    ship_dims: List[Tuple[int, int]],
+    num_iterations: int,
+    with_symmetries: bool = False,
+    batch_size: Optional[int] = None,
+    rng: Optional[np.random.Generator] = None,
+    backtracking: bool = False,
+    instrumentation: Optional[Instrumentation] = None,
+) -> Tuple[np.ndarray, int]:
+    """
+    instrumentation - if set, a progress event is emitted to it every 10000 iterations
+        (every chunk with the batched sampler)
+
+    Returns: the number of times each square was occupied, and the number of samples
+    (partial results from separate runs can be merged by summing both)
+    """
+    assert not (
+        batch_size is not None and backtracking
+    ), "The batched sampler doesn't support backtracking"
+    if batch_size is not None:
+        return _compute_placement_counts_batched(
+            ship_dims, num_iterations, batch_size, with_symmetries, rng, instrumentation
+        )
+
     sampled_placements = np.zeros((NUM_ROWS, NUM_COLS), dtype=np.uint32)
     num_samples = 0
+    report_progress = instrumentation is not None and instrumentation.enabled
     start_time = time.time()
     for iter_num in range(num_iterations):
-        if (iter_num + 1) % 10000 == 0:
-            print(f"Iteration number {iter_num + 1} of {num_iterations}")
-            end_time = time.time()
-            print(f"average rate = {(iter_num + 1) / (end_time - start_time)}")
+        if report_progress and (iter_num + 1) % 10000 == 0:
+            instrumentation.emit(
+                PROGRESS,
+                num_iterations_done=iter_num + 1,
+                num_iterations=num_iterations,
+                rate=(iter_num + 1) / (time.time() - start_time),
+            )
 
-        available_squares = np.zeros((NUM_ROWS, NUM_COLS), dtype=np.bool8)
-        available_squares.fill(True)
-        available_squares = available_squares.tolist()
+        available_squares = np.ones((NUM_ROWS, NUM_COLS), dtype=bool)
 
-        # TODO placement with ascending ship dims is taking too long, need to fix
         placements = random_ships_placement(
             ship_dims=ship_dims,
             available_squares=available_squares,
             num_rows=NUM_ROWS,
             num_cols=NUM_COLS,
             rotate_allowed=True,
+            backtracking=backtracking,
         )
 
         ship_squares = np.zeros((NUM_ROWS, NUM_COLS), dtype=np.uint32)
@@ -54,26 +150,383 @@ def compute_placement_distribution(
                 left_col_idx : left_col_idx + ship_width,
             ] += 1
 
-        # TODO calculate symmetries (maybe not necessary, given that 1 million iterations 
-        # with ship dims in descending order is pretty fast and seems pretty even)
-
         # TODO analyze exactly how asymmetrical the heatmap/distribution is (without symmetry)
 
         if with_symmetries:
-            raise NotImplementedError
+            # each sampled layout counts as one sample per symmetry of the board
+            for symmetry in compute_symmetries(ship_squares):
+                sampled_placements += symmetry
+                num_samples += 1
         else:
             sampled_placements += ship_squares
             num_samples += 1
 
+    return sampled_placements, num_samples
+
+
+def _compute_placement_counts_batched(
+    ship_dims: List[Tuple[int, int]],
+    num_iterations: int,
+    batch_size: int,
+    with_symmetries: bool = False,
+    rng: Optional[np.random.Generator] = None,
+    instrumentation: Optional[Instrumentation] = None,
+) -> Tuple[np.ndarray, int]:
+    sampled_placements = np.zeros((NUM_ROWS, NUM_COLS), dtype=np.uint64)
+    num_samples = 0
+    iter_num = 0
+    start_time = time.time()
+    while iter_num < num_iterations:
+        chunk_size = min(batch_size, num_iterations - iter_num)
+        labels = sample_ships_placements(
+            ship_dims,
+            num_samples=chunk_size,
+            num_rows=NUM_ROWS,
+            num_cols=NUM_COLS,
+            rotate_allowed=True,
+            rng=rng,
+            as_labels=True,
+        )
+        iter_num += chunk_size
+
+        chunk_placements = np.count_nonzero(labels, axis=0).astype(np.uint64)
+        if with_symmetries:
+            # the symmetries are linear, so they can be applied to the chunk's sum
+            for symmetry in compute_symmetries(chunk_placements):
+                sampled_placements += symmetry
+                num_samples += chunk_size
+        else:
+            sampled_placements += chunk_placements
+            num_samples += chunk_size
+
+        if instrumentation is not None and instrumentation.enabled:
+            instrumentation.emit(
+                PROGRESS,
+                num_iterations_done=iter_num,
+                num_iterations=num_iterations,
+                rate=iter_num / (time.time() - start_time),
+            )
+
+    return sampled_placements, num_samples
+
+
+def _placement_counts_worker(
+    args: Tuple[
+        List[Tuple[int, int]], int, bool, Optional[int], bool, np.random.SeedSequence
+    ]
+) -> Tuple[np.ndarray, int]:
+    (
+        ship_dims,
+        num_iterations,
+        with_symmetries,
+        batch_size,
+        backtracking,
+        seed_sequence,
+    ) = args
+    # seed both random number generators, since the unbatched sampler uses the random module
+    random.seed(int(seed_sequence.generate_state(1)[0]))
+    sampled_placements, num_samples = compute_placement_counts(
+        ship_dims,
+        num_iterations,
+        with_symmetries=with_symmetries,
+        batch_size=batch_size,
+        rng=np.random.default_rng(seed_sequence),
+        backtracking=backtracking,
+    )
+    return sampled_placements.astype(np.uint64), num_samples
+
+
+def compute_placement_distribution_parallel(
+    ship_dims: List[Tuple[int, int]],
+    num_iterations: int,
+    num_workers: int,
+    with_symmetries: bool = False,
+    batch_size: Optional[int] = None,
+    random_seed: Optional[int] = None,
+    backtracking: bool = False,
+) -> np.ndarray:
+    """
+    Splits the iterations across a pool of num_workers processes. Each worker gets its own
+    independent seed spawned from random_seed, so the result is the same on every run with
+    the same random_seed and num_workers.
+    """
+    worker_seeds = np.random.SeedSequence(random_seed).spawn(num_workers)
+    iterations_per_worker, extra_iterations = divmod(num_iterations, num_workers)
+    worker_args = [
+        (
+            ship_dims,
+            iterations_per_worker + (1 if worker_idx < extra_iterations else 0),
+            with_symmetries,
+            batch_size,
+            backtracking,
+            worker_seeds[worker_idx],
+        )
+        for worker_idx in range(num_workers)
+    ]
+    with multiprocessing.Pool(num_workers) as pool:
+        partial_results = pool.map(_placement_counts_worker, worker_args)
+
+    sampled_placements = np.zeros((NUM_ROWS, NUM_COLS), dtype=np.uint64)
+    num_samples = 0
+    for partial_placements, partial_num_samples in partial_results:
+        sampled_placements += partial_placements
+        num_samples += partial_num_samples
     return sampled_placements / num_samples
 
 
+def compute_placement_distribution_to_precision(
+    ship_dims: List[Tuple[int, int]],
+    target_error: float,
+    max_iterations: Optional[int] = None,
+    batch_size: int = 10000,
+    with_symmetries: bool = False,
+    confidence: Optional[float] = None,
+    rng: Optional[np.random.Generator] = None,
+    min_iterations: int = 1000,
+    instrumentation: Optional[Instrumentation] = None,
+) -> Tuple[np.ndarray, float, int]:
+    """
+    Samples fleets in chunks of batch_size until the estimate of every square is precise
+    enough: the running mean and variance of each square's occupancy are updated after each
+    chunk, and sampling stops once the largest standard error (or the largest half-width
+    of the confidence interval, if confidence is set, e.g. 0.95) is at most target_error.
+
+    With symmetries, each layout contributes the average over its symmetric images, so the
+    error is estimated over independent samples.
+
+    max_iterations - stop after this many sampled layouts even if the target isn't reached
+    min_iterations - sample at least this many layouts before checking the error
+    instrumentation - if set, a progress event is emitted to it after each chunk, a
+        precision event after each estimate of the error, and a final precision event
+        with the achieved error once sampling stops
+
+    Returns: the distribution, the achieved error and the number of layouts sampled
+    Raises ValueError if target_error isn't positive, or confidence isn't in (0, 1)
+    """
+    if not target_error > 0:
+        raise ValueError(f"The target error must be positive, not {target_error}")
+    if confidence is not None and not 0 < confidence < 1:
+        raise ValueError(f"The confidence must be in (0, 1), not {confidence}")
+    z_score = 1.0
+    if confidence is not None:
+        z_score = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    # running mean and sum of squared deviations of each square (merged chunk by chunk)
+    mean = np.zeros((NUM_ROWS, NUM_COLS), dtype=np.float64)
+    squared_deviations = np.zeros((NUM_ROWS, NUM_COLS), dtype=np.float64)
+    num_samples = 0
+    achieved_error = np.inf
+    start_time = time.perf_counter()
+    while max_iterations is None or num_samples < max_iterations:
+        chunk_size = batch_size
+        if max_iterations is not None:
+            chunk_size = min(batch_size, max_iterations - num_samples)
+        labels = sample_ships_placements(
+            ship_dims,
+            num_samples=chunk_size,
+            num_rows=NUM_ROWS,
+            num_cols=NUM_COLS,
+            rotate_allowed=True,
+            rng=rng,
+            as_labels=True,
+        )
+        samples = (labels > 0).astype(np.float64)
+        if with_symmetries:
+            samples = np.mean(compute_symmetries(samples), axis=0)
+
+        chunk_mean = samples.mean(axis=0)
+        chunk_squared_deviations = ((samples - chunk_mean) ** 2).sum(axis=0)
+        delta = chunk_mean - mean
+        total_samples = num_samples + chunk_size
+        mean += delta * chunk_size / total_samples
+        squared_deviations += (
+            chunk_squared_deviations
+            + delta ** 2 * num_samples * chunk_size / total_samples
+        )
+        num_samples = total_samples
+
+        report_progress = instrumentation is not None and instrumentation.enabled
+        if report_progress:
+            elapsed_time = time.perf_counter() - start_time
+            instrumentation.emit(
+                PROGRESS,
+                num_iterations_done=num_samples,
+                num_iterations=max_iterations,
+                rate=num_samples / elapsed_time if elapsed_time > 0 else 0.0,
+            )
+        if num_samples >= max(min_iterations, 2):
+            variance = squared_deviations / (num_samples - 1)
+            achieved_error = z_score * float(np.sqrt(variance / num_samples).max())
+            if achieved_error <= target_error:
+                break
+            if report_progress:
+                instrumentation.emit(
+                    PRECISION,
+                    num_samples=num_samples,
+                    error=achieved_error,
+                    is_final=False,
+                )
+
+    if instrumentation is not None and instrumentation.enabled:
+        instrumentation.emit(
+            PRECISION, num_samples=num_samples, error=achieved_error, is_final=True
+        )
+    return mean, achieved_error, num_samples
+
+
+CHECKPOINT_COUNTS_FILE = "counts.npy"
+CHECKPOINT_PENDING_FILE = "pending_counts.npy"
+CHECKPOINT_STATE_FILE = "state.json"
+
+
+def _write_checkpoint_state(checkpoint_dir: str, state: dict):
+    # write to a temporary file first, so the state file is never partially written
+    state_path = os.path.join(checkpoint_dir, CHECKPOINT_STATE_FILE)
+    with open(state_path + ".tmp", "w") as out_file:
+        json.dump(state, out_file)
+    os.replace(state_path + ".tmp", state_path)
+
+
+def _recover_pending_counts(checkpoint_dir: str, counts: np.ndarray, state: dict):
+    """
+    Finishes (or discards) a checkpoint that was interrupted while it was being written:
+    the pending counts are added to the accumulator only if the state file already
+    accounts for them.
+    """
+    pending_path = os.path.join(checkpoint_dir, CHECKPOINT_PENDING_FILE)
+    # interrupted before the pending counts were complete (the state doesn't have them)
+    if os.path.exists(pending_path + ".tmp"):
+        os.remove(pending_path + ".tmp")
+    if not os.path.exists(pending_path):
+        return
+    pending_counts = np.load(pending_path)
+    if int(counts.sum()) + int(pending_counts.sum()) == state["counts_sum"]:
+        counts += pending_counts
+        counts.flush()
+    os.remove(pending_path)
+
+
+def compute_placement_distribution_checkpointed(
+    ship_dims: List[Tuple[int, int]],
+    num_iterations: int,
+    checkpoint_dir: str,
+    checkpoint_every: int,
+    batch_size: int,
+    with_symmetries: bool = False,
+    random_seed: Optional[int] = None,
+    resume: bool = False,
+    instrumentation: Optional[Instrumentation] = None,
+) -> np.ndarray:
+    """
+    Samples with the batched sampler, accumulating the counts in a memory-mapped .npy file
+    in checkpoint_dir. Every checkpoint_every iterations the counts are flushed to disk,
+    along with the number of iterations and samples so far and the random generator state.
+
+    resume - continue the run saved in checkpoint_dir until num_iterations iterations
+        in total (which may be more than the interrupted run was going to do), with
+        the same ship_dims, with_symmetries, batch_size and checkpoint_every
+    instrumentation - if set, a progress event is emitted to it after each checkpoint
+    """
+    counts_path = os.path.join(checkpoint_dir, CHECKPOINT_COUNTS_FILE)
+    state_path = os.path.join(checkpoint_dir, CHECKPOINT_STATE_FILE)
+    rng = np.random.default_rng(random_seed)
+    if resume:
+        with open(state_path, "r") as in_file:
+            state = json.load(in_file)
+        if [tuple(dims) for dims in state["ship_dims"]] != list(ship_dims) or (
+            state["with_symmetries"],
+            state["batch_size"],
+            state["checkpoint_every"],
+        ) != (with_symmetries, batch_size, checkpoint_every):
+            raise ValueError(
+                f"The checkpoint in {checkpoint_dir} was made with different settings"
+            )
+        counts = np.lib.format.open_memmap(counts_path, mode="r+")
+        _recover_pending_counts(checkpoint_dir, counts, state)
+        rng.bit_generator.state = state["rng_state"]
+    else:
+        if os.path.exists(state_path):
+            raise FileExistsError(
+                f"{checkpoint_dir} already has a checkpoint (resume it instead)"
+            )
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        counts = np.lib.format.open_memmap(
+            counts_path, mode="w+", dtype=np.uint64, shape=(NUM_ROWS, NUM_COLS)
+        )
+        state = {
+            "ship_dims": [list(dims) for dims in ship_dims],
+            "with_symmetries": with_symmetries,
+            # the samples drawn depend on the chunks, so a resumed run must use the same
+            "batch_size": batch_size,
+            "checkpoint_every": checkpoint_every,
+            "num_iterations": 0,
+            "num_samples": 0,
+            "counts_sum": 0,
+            "rng_state": rng.bit_generator.state,
+        }
+        _write_checkpoint_state(checkpoint_dir, state)
+
+    start_time = time.perf_counter()
+    start_iterations = state["num_iterations"]
+    while state["num_iterations"] < num_iterations:
+        chunk_iterations = min(
+            checkpoint_every, num_iterations - state["num_iterations"]
+        )
+        chunk_counts, chunk_samples = _compute_placement_counts_batched(
+            ship_dims, chunk_iterations, batch_size, with_symmetries, rng
+        )
+
+        # checkpoint: save the pending counts, then the state that accounts for them,
+        # and only then add them to the accumulator
+        pending_path = os.path.join(checkpoint_dir, CHECKPOINT_PENDING_FILE)
+        # (written to a temporary file first, so a pending file is never truncated)
+        with open(pending_path + ".tmp", "wb") as out_file:
+            np.save(out_file, chunk_counts)
+        os.replace(pending_path + ".tmp", pending_path)
+        state["num_iterations"] += chunk_iterations
+        state["num_samples"] += chunk_samples
+        state["counts_sum"] += int(chunk_counts.sum())
+        state["rng_state"] = rng.bit_generator.state
+        _write_checkpoint_state(checkpoint_dir, state)
+        counts += chunk_counts
+        counts.flush()
+        os.remove(pending_path)
+
+        if instrumentation is not None and instrumentation.enabled:
+            elapsed_time = time.perf_counter() - start_time
+            num_iterations_done = state["num_iterations"] - start_iterations
+            instrumentation.emit(
+                PROGRESS,
+                num_iterations_done=state["num_iterations"],
+                num_iterations=num_iterations,
+                rate=num_iterations_done / elapsed_time if elapsed_time > 0 else 0.0,
+            )
+
+    return np.asarray(counts) / state["num_samples"]
+
+
 def generate_placement_distributions(
     ship_dims: List[Tuple[int, int]],
     num_iterations: int,
     with_symmetry: bool,
     random_seed: Optional[int],
+    batch_size: Optional[int] = None,
+    num_workers: int = 1,
+    backtracking: bool = False,
+    instrumentation: Optional[Instrumentation] = None,
 ):
+    """ instrumentation - if set, progress events are emitted to it (single process only) """
+    if num_workers > 1:
+        return compute_placement_distribution_parallel(
+            ship_dims=ship_dims,
+            num_iterations=num_iterations,
+            num_workers=num_workers,
+            with_symmetries=with_symmetry,
+            batch_size=batch_size,
+            random_seed=random_seed,
+            backtracking=backtracking,
+        )
+
     if random_seed is not None:
         random.seed(random_seed)
 
@@ -81,32 +534,171 @@ def generate_placement_distributions(
         ship_dims=ship_dims,
         num_iterations=num_iterations,
         with_symmetries=with_symmetry,
+        batch_size=batch_size,
+        rng=np.random.default_rng(random_seed),
+        backtracking=backtracking,
+        instrumentation=instrumentation,
     )
     return placement_distribution
 
 
 @click.command()
-@click.option("--num-iterations", "-n", type=int, required=True)
+@click.option("--num-iterations", "-n", type=int)
 @click.option("--ship-dims-file", "-i", type=str, required=True)
 @click.option("--with-symmetry", is_flag=True)
 @click.option("--random-seed", "-r", type=int)
 @click.option("--out-file-prefix", "-o", type=str)
+@click.option(
+    "--batch-size",
+    "-b",
+    type=int,
+    help="sample fleets in vectorized chunks of this size (e.g. 10000)",
+)
+@click.option(
+    "--workers",
+    "-w",
+    "num_workers",
+    type=int,
+    default=1,
+    help="split the iterations across this many processes",
+)
+@click.option(
+    "--backtracking",
+    is_flag=True,
+    help="place ships with a backtracking search instead of restarting when a ship doesn't fit",
+)
+@click.option(
+    "--checkpoint-dir",
+    type=str,
+    help="accumulate the counts in a memory-mapped file in this directory, with checkpoints",
+)
+@click.option(
+    "--checkpoint-every",
+    type=int,
+    default=100000,
+    help="number of iterations between checkpoints",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="continue the run saved in --checkpoint-dir (up to --num-iterations in total)",
+)
+@click.option(
+    "--target-error",
+    type=float,
+    help="sample until the standard error of every square is at most this (--num-iterations is the maximum)",
+)
+@click.option(
+    "--confidence",
+    type=float,
+    help="with --target-error, bound the confidence interval half-width at this level (e.g. 0.95) instead",
+)
+@click.option(
+    "--exact",
+    is_flag=True,
+    help="compute the exact distribution (uniform over all legal layouts) instead of sampling",
+)
 def cli(
-    num_iterations: int,
+    num_iterations: Optional[int],
     ship_dims_file: str,
     with_symmetry: bool,
     random_seed: Optional[int],
     out_file_prefix: Optional[str],
+    batch_size: Optional[int],
+    num_workers: int,
+    backtracking: bool,
+    checkpoint_dir: Optional[str],
+    checkpoint_every: int,
+    resume: bool,
+    target_error: Optional[float],
+    confidence: Optional[float],
+    exact: bool,
 ):
+    if num_iterations is None and not (exact or target_error is not None):
+        raise click.UsageError(
+            "One of --num-iterations, --target-error or --exact is required"
+        )
+    if backtracking and batch_size is not None:
+        raise click.UsageError("--backtracking can't be combined with --batch-size")
+    if resume and checkpoint_dir is None:
+        raise click.UsageError("--resume requires --checkpoint-dir")
+    if checkpoint_dir is not None and (exact or backtracking or num_workers > 1):
+        raise click.UsageError(
+            "--checkpoint-dir can't be combined with --exact, --backtracking or --workers"
+        )
+    if target_error is not None and (
+        exact or backtracking or num_workers > 1 or checkpoint_dir is not None
+    ):
+        raise click.UsageError(
+            "--target-error can't be combined with --exact, --backtracking, --workers "
+            "or --checkpoint-dir"
+        )
+    if confidence is not None and target_error is None:
+        raise click.UsageError("--confidence requires --target-error")
+    if target_error is not None and not target_error > 0:
+        raise click.UsageError("--target-error must be positive")
+    if confidence is not None and not 0 < confidence < 1:
+        raise click.UsageError("--confidence must be in (0, 1)")
+
     ship_dims = []
     with open(ship_dims_file, "r") as in_file:
         for line in in_file.readlines():
             dims = [int(token.strip()) for token in line.split(",")]
             ship_dims.append(tuple(dims))
 
-    placement_distribution = generate_placement_distributions(
-        ship_dims, num_iterations, with_symmetry, random_seed
-    )
+    if exact:
+        placement_distribution, num_layouts = compute_exact_placement_distribution(
+            ship_dims, num_rows=NUM_ROWS, num_cols=NUM_COLS, rotate_allowed=True
+        )
+        print(f"number of legal layouts = {num_layouts}")
+    elif target_error is not None:
+        load_fleet_placement_indexes(NUM_ROWS, NUM_COLS, ship_dims)
+        instrumentation = Instrumentation()
+        print_events(instrumentation, [PROGRESS, PRECISION])
+        (
+            placement_distribution,
+            achieved_error,
+            num_samples,
+        ) = compute_placement_distribution_to_precision(
+            ship_dims,
+            target_error,
+            max_iterations=num_iterations,
+            batch_size=batch_size if batch_size is not None else 10000,
+            with_symmetries=with_symmetry,
+            confidence=confidence,
+            rng=np.random.default_rng(random_seed),
+            instrumentation=instrumentation,
+        )
+        print(f"achieved error = {achieved_error} with {num_samples} samples")
+    elif checkpoint_dir is not None:
+        load_fleet_placement_indexes(NUM_ROWS, NUM_COLS, ship_dims)
+        instrumentation = Instrumentation()
+        print_events(instrumentation, [PROGRESS])
+        placement_distribution = compute_placement_distribution_checkpointed(
+            ship_dims,
+            num_iterations,
+            checkpoint_dir=checkpoint_dir,
+            checkpoint_every=checkpoint_every,
+            batch_size=batch_size if batch_size is not None else 10000,
+            with_symmetries=with_symmetry,
+            random_seed=random_seed,
+            resume=resume,
+            instrumentation=instrumentation,
+        )
+    else:
+        load_fleet_placement_indexes(NUM_ROWS, NUM_COLS, ship_dims)
+        instrumentation = Instrumentation()
+        print_events(instrumentation, [PROGRESS])
+        placement_distribution = generate_placement_distributions(
+            ship_dims,
+            num_iterations,
+            with_symmetry,
+            random_seed,
+            batch_size,
+            num_workers,
+            backtracking,
+            instrumentation,
+        )
 
     if out_file_prefix is not None:
         # save numpy array to file output in binary .npy format
@@ -0,0 +1,244 @@
+import os
+import warnings
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "placement_index"
+)
+
+
+class PlacementIndex:
+    """
+    Every in-bounds placement of a (ship_height x ship_width) ship on a
+    (num_rows x num_cols) board, in row-major order of the top-left corner, with the
+    squares each placement covers (cell mask) and the squares that must be free of
+    other ships for the placement to be legal (buffer mask, including the cells).
+    Masks are flattened over the board squares in row-major order.
+    """
+
+    def __init__(
+        self,
+        num_rows: int,
+        num_cols: int,
+        ship_height: int,
+        ship_width: int,
+        placements: np.ndarray,
+        cell_masks: np.ndarray,
+        buffer_masks: np.ndarray,
+    ):
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.ship_height = ship_height
+        self.ship_width = ship_width
+        self.placements = placements
+        self.cell_masks = cell_masks
+        self.buffer_masks = buffer_masks
+
+        # lookup from top-left corner to placement index (-1 if out of bounds)
+        self._placement_lookup = np.full((num_rows, num_cols), -1, dtype=np.int32)
+        self._placement_lookup[placements[:, 0], placements[:, 1]] = np.arange(
+            len(placements), dtype=np.int32
+        )
+        self._buffer_squares = {}
+        self._buffer_bitmasks = {}
+
+    def __len__(self) -> int:
+        return len(self.placements)
+
+    @classmethod
+    def build(
+        cls, num_rows: int, num_cols: int, ship_height: int, ship_width: int
+    ) -> "PlacementIndex":
+        placements, cell_masks, buffer_masks = [], [], []
+        for top_row_idx in range(num_rows - ship_height + 1):
+            for left_col_idx in range(num_cols - ship_width + 1):
+                cell_mask = np.zeros((num_rows, num_cols), dtype=bool)
+                cell_mask[
+                    top_row_idx : top_row_idx + ship_height,
+                    left_col_idx : left_col_idx + ship_width,
+                ] = True
+                buffer_mask = np.zeros((num_rows, num_cols), dtype=bool)
+                buffer_mask[
+                    max(0, top_row_idx - 1) : top_row_idx + ship_height + 1,
+                    max(0, left_col_idx - 1) : left_col_idx + ship_width + 1,
+                ] = True
+                placements.append((top_row_idx, left_col_idx, ship_height, ship_width))
+                cell_masks.append(cell_mask.ravel())
+                buffer_masks.append(buffer_mask.ravel())
+
+        num_squares = num_rows * num_cols
+        return cls(
+            num_rows,
+            num_cols,
+            ship_height,
+            ship_width,
+            np.array(placements, dtype=np.int32).reshape(-1, 4),
+            np.array(cell_masks, dtype=bool).reshape(-1, num_squares),
+            np.array(buffer_masks, dtype=bool).reshape(-1, num_squares),
+        )
+
+    def placement_idx(self, top_row_idx: int, left_col_idx: int) -> Optional[int]:
+        """ Returns None if the placement is out of bounds """
+        if not (0 <= top_row_idx < self.num_rows and 0 <= left_col_idx < self.num_cols):
+            return None
+        placement_idx = int(self._placement_lookup[top_row_idx, left_col_idx])
+        return placement_idx if placement_idx >= 0 else None
+
+    def valid_placement_idxs(self, available_squares) -> np.ndarray:
+        """ Indexes of the placements whose squares are all available """
+        blocked_squares = ~np.asarray(available_squares, dtype=bool).ravel()
+        return np.flatnonzero(~(self.cell_masks & blocked_squares).any(axis=1))
+
+    def buffer_squares(self, placement_idx: int) -> List[Tuple[int, int]]:
+        """ (row_idx, col_idx) of every square in the placement's buffer mask """
+        if placement_idx not in self._buffer_squares:
+            self._buffer_squares[placement_idx] = [
+                divmod(square_idx, self.num_cols)
+                for square_idx in np.flatnonzero(
+                    self.buffer_masks[placement_idx]
+                ).tolist()
+            ]
+        return self._buffer_squares[placement_idx]
+
+    def buffer_bitmask(self, placement_idx: int) -> int:
+        """ The placement's buffer mask as a bitboard (see BitboardGameGrid) """
+        if placement_idx not in self._buffer_bitmasks:
+            bitmask = 0
+            for square_idx in np.flatnonzero(self.buffer_masks[placement_idx]).tolist():
+                bitmask |= 1 << square_idx
+            self._buffer_bitmasks[placement_idx] = bitmask
+        return self._buffer_bitmasks[placement_idx]
+
+
+# boards with more squares than this don't get placement indexes: the masks take
+# (number of placements x number of squares) memory, which grows with the square of
+# the board area (scans of the board are used instead)
+PLACEMENT_INDEX_MAX_SQUARES = 1024
+
+
+def has_placement_index(num_rows: int, num_cols: int) -> bool:
+    return num_rows * num_cols <= PLACEMENT_INDEX_MAX_SQUARES
+
+
+# in-memory cache, keyed by (num_rows, num_cols, ship_height, ship_width)
+_placement_indexes: Dict[Tuple[int, int, int, int], PlacementIndex] = {}
+
+
+def get_placement_index(
+    num_rows: int, num_cols: int, ship_height: int, ship_width: int
+) -> PlacementIndex:
+    """ Returns the placement index for the ship, building it on first use """
+    key = (num_rows, num_cols, ship_height, ship_width)
+    if key not in _placement_indexes:
+        _placement_indexes[key] = PlacementIndex.build(*key)
+    return _placement_indexes[key]
+
+
+def _fleet_shapes(
+    ship_dims: List[Tuple[int, int]], rotate_allowed: bool
+) -> List[Tuple[int, int]]:
+    shapes = set()
+    for ship_height, ship_width in ship_dims:
+        shapes.add((ship_height, ship_width))
+        if rotate_allowed:
+            shapes.add((ship_width, ship_height))
+    return sorted(shapes)
+
+
+def fleet_cache_path(
+    num_rows: int,
+    num_cols: int,
+    ship_dims: List[Tuple[int, int]],
+    rotate_allowed: bool = True,
+    cache_dir: str = DEFAULT_CACHE_DIR,
+) -> str:
+    shapes = "_".join(
+        f"{ship_height}x{ship_width}"
+        for ship_height, ship_width in _fleet_shapes(ship_dims, rotate_allowed)
+    )
+    return os.path.join(
+        cache_dir, f"placement_index_{num_rows}x{num_cols}_{shapes}.npz"
+    )
+
+
+def save_npz_atomically(path: str, **arrays: np.ndarray):
+    """
+    Saves the arrays as a .npz file through a temporary file that replaces path once it
+    is complete, so concurrent readers never see a partial file (the temporary file is
+    removed if the save fails)
+    """
+    tmp_path = f"{path[:-len('.npz')]}.{os.getpid()}.tmp.npz"
+    try:
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_fleet_placement_indexes(
+    num_rows: int,
+    num_cols: int,
+    ship_dims: List[Tuple[int, int]],
+    rotate_allowed: bool = True,
+    cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+) -> Dict[Tuple[int, int], PlacementIndex]:
+    """
+    Loads the placement index of every ship shape in the fleet from the .npz cache in
+    cache_dir (building and saving it on a cache miss), and makes them available to
+    get_placement_index. Masks are stored bit-packed.
+
+    cache_dir - directory of the .npz cache (None to skip the disk cache); if the cache
+        can't be saved there, a warning is issued and the indexes are still returned
+
+    Returns: dictionary of ship shape (height, width) to its placement index (empty if
+    the board is too large for placement indexes, see has_placement_index)
+    """
+    if not has_placement_index(num_rows, num_cols):
+        return {}
+    shapes = _fleet_shapes(ship_dims, rotate_allowed)
+    num_squares = num_rows * num_cols
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = fleet_cache_path(
+            num_rows, num_cols, ship_dims, rotate_allowed, cache_dir
+        )
+
+    if cache_path is not None and os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            for ship_height, ship_width in shapes:
+                key = (num_rows, num_cols, ship_height, ship_width)
+                if key in _placement_indexes:
+                    continue
+                prefix = f"{ship_height}x{ship_width}"
+                _placement_indexes[key] = PlacementIndex(
+                    num_rows,
+                    num_cols,
+                    ship_height,
+                    ship_width,
+                    cached[f"{prefix}_placements"],
+                    np.unpackbits(
+                        cached[f"{prefix}_cell_masks"], axis=1, count=num_squares
+                    ).astype(bool),
+                    np.unpackbits(
+                        cached[f"{prefix}_buffer_masks"], axis=1, count=num_squares
+                    ).astype(bool),
+                )
+    else:
+        arrays = {}
+        for ship_height, ship_width in shapes:
+            index = get_placement_index(num_rows, num_cols, ship_height, ship_width)
+            prefix = f"{ship_height}x{ship_width}"
+            arrays[f"{prefix}_placements"] = index.placements
+            arrays[f"{prefix}_cell_masks"] = np.packbits(index.cell_masks, axis=1)
+            arrays[f"{prefix}_buffer_masks"] = np.packbits(index.buffer_masks, axis=1)
+        if cache_path is not None:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                save_npz_atomically(cache_path, **arrays)
+            except OSError as e:
+                warnings.warn(f"Could not save placement index cache {cache_path}: {e}")
+
+    return {shape: get_placement_index(num_rows, num_cols, *shape) for shape in shapes}
@@ -1,7 +1,10 @@
 import random
 import numpy as np
-from typing import List, Tuple
+from functools import lru_cache
+from typing import List, Optional, Tuple, Union
+from exact_placement import has_legal_layout
 from game_grid import GameGrid
+from placement_index import get_placement_index, has_placement_index
 
 
 ShipPlacement = Tuple[int, int, int, int]
@@ -33,12 +36,15 @@ def random_place_ship(
     return row_idx, col_idx
 
 
-def get_possible_ship_placements(
+def get_possible_ship_placements_loop(
     ship_height: int,
     ship_width: int,
     available_squares: List[List[bool]],
 ) -> List[ShipPlacement]:
-    # TODO implement this step with a 2d matrix convolution
+    """
+    Reference implementation of get_possible_ship_placements: checks every top-left
+    corner with nested loops. Kept for testing the vectorized version against.
+    """
     top_left = []
     for top_row_idx in range(len(available_squares) - ship_height + 1):
         for left_col_idx in range(len(available_squares[top_row_idx]) - ship_width + 1):
@@ -63,13 +69,96 @@ def get_possible_ship_placements(
     return ship_placements
 
 
-# def get_possible_ship_placements_convolve(
-#     ship_height: int,
-#     ship_width: int,
-#     blocked_squares: np.ndarray,
-# ) -> List[ShipPlacement]:
-#     k = np.ones((ship_height, ship_width))
-#     scipy.ndimage.correlate(available_squares, k, mode="constant", cval=1.0, origin=(-, ))
+def window_sums(
+    values: np.ndarray, window_height: int, window_width: int
+) -> np.ndarray:
+    """
+    2d correlation of values with a (window_height x window_width) kernel of ones,
+    anchored at the top-left corner of the window (computed with a summed-area table).
+
+    Returns: an array of shape (num_rows - window_height + 1, num_cols - window_width + 1)
+    where entry [r, c] is the sum of values[r : r + window_height, c : c + window_width]
+    """
+    num_rows, num_cols = values.shape
+    if window_height > num_rows or window_width > num_cols:
+        return np.zeros(
+            (max(0, num_rows - window_height + 1), max(0, num_cols - window_width + 1)),
+            dtype=np.int64,
+        )
+    summed_area = np.zeros((num_rows + 1, num_cols + 1), dtype=np.int64)
+    summed_area[1:, 1:] = values.cumsum(axis=0).cumsum(axis=1)
+    return (
+        summed_area[window_height:, window_width:]
+        - summed_area[:-window_height, window_width:]
+        - summed_area[window_height:, :-window_width]
+        + summed_area[:-window_height, :-window_width]
+    )
+
+
+def get_possible_ship_placement_mask(
+    ship_height: int,
+    ship_width: int,
+    available_squares,
+) -> np.ndarray:
+    """
+    available_squares - grid of Booleans (nested lists or a 2d numpy array), where True
+        is a square that is available
+
+    Returns: a 2d Boolean array of shape (num_rows - ship_height + 1, num_cols - ship_width + 1),
+    where entry [r, c] is True if the ship can be placed with its top-left corner at (r, c)
+    """
+    blocked_squares = ~np.asarray(available_squares, dtype=bool)
+    return window_sums(blocked_squares, ship_height, ship_width) == 0
+
+
+def get_possible_ship_placements(
+    ship_height: int,
+    ship_width: int,
+    available_squares,
+) -> List[ShipPlacement]:
+    """
+    Returns every valid placement (top_row_idx, left_col_idx, ship_height, ship_width)
+    of the ship, in row-major order of the top-left corner (same as
+    get_possible_ship_placements_loop), using a single vectorized pass.
+    """
+    placement_mask = get_possible_ship_placement_mask(
+        ship_height, ship_width, available_squares
+    )
+    top_row_idxs, left_col_idxs = np.nonzero(placement_mask)
+    return [
+        (top_row_idx, left_col_idx, ship_height, ship_width)
+        for top_row_idx, left_col_idx in zip(
+            top_row_idxs.tolist(), left_col_idxs.tolist()
+        )
+    ]
+
+
+def _random_valid_placement(
+    ship_height: int,
+    ship_width: int,
+    available_squares: np.ndarray,
+    rng,
+    max_attempts: int = 100,
+) -> Optional[ShipPlacement]:
+    """
+    Rejection sampling: draws uniformly random in-bounds placements until one only covers
+    available squares, so the result is uniform over the valid placements.
+
+    Returns: the placement, or None if every attempt was rejected
+    """
+    num_rows, num_cols = available_squares.shape
+    if ship_height > num_rows or ship_width > num_cols:
+        return None
+    for _ in range(max_attempts):
+        top_row_idx = rng.randrange(num_rows - ship_height + 1)
+        left_col_idx = rng.randrange(num_cols - ship_width + 1)
+        if available_squares[
+            top_row_idx : top_row_idx + ship_height,
+            left_col_idx : left_col_idx + ship_width,
+        ].all():
+            return top_row_idx, left_col_idx, ship_height, ship_width
+    return None
+
 
 def random_ships_placement(
     ship_dims: List[Tuple[int, int]],
@@ -77,41 +166,79 @@ def random_ships_placement(
     num_rows: int,
     num_cols: int,
     rotate_allowed: bool = True,
+    backtracking: bool = False,
+    rng: Optional[random.Random] = None,
 ) -> List[ShipPlacement]:
     """
     ship_dims - a list of N ship dimensions: (height, width)
     available_squares - grid of Booleans, where True is a square that is available
     rotate_allowed - if True, the ship dimensions can be switched
+    backtracking - if True, use backtracking_ships_placement instead of restarting
+        from scratch whenever a ship doesn't fit (only on boards with placement indexes:
+        large boards are mostly empty, so restarting is cheap there)
+    rng - random number generator (default: the random module's global generator)
 
     Returns: returns a list of N tuples: (top_row_idx, left_col_idx, ship_height, ship_width)
     """
-    available_squares_copy = []
-    assert len(available_squares) == num_rows
-    for r in range(len(available_squares)):
-        assert len(available_squares[r]) == num_cols
-        copy_row = []
-        for c in range(len(available_squares[r])):
-            copy_row.append(available_squares[r][c])
-        available_squares_copy.append(copy_row)
+    if backtracking and has_placement_index(num_rows, num_cols):
+        return backtracking_ships_placement(
+            ship_dims, available_squares, num_rows, num_cols, rotate_allowed, rng
+        )
+    if rng is None:
+        rng = random
+
+    initial_available_squares = np.array(available_squares, dtype=bool)
+    assert initial_available_squares.shape == (num_rows, num_cols)
 
     got_stuck = True
     while got_stuck:
         got_stuck = False
 
+        available_squares_copy = initial_available_squares.copy()
         ship_placements = []
         for ship_dim in ship_dims:
             ship_height, ship_width = ship_dim
-            if rotate_allowed and random.randint(0, 1) == 1:
+            if rotate_allowed and rng.randint(0, 1) == 1:
                 ship_width, ship_height = ship_dim
 
-            possible_placements = get_possible_ship_placements(
-                ship_height, ship_width, available_squares=available_squares_copy
-            )
-            if len(possible_placements) == 0:
-                got_stuck = True
-                break
-
-            chosen_placement = random.choice(possible_placements)
+            if has_placement_index(num_rows, num_cols):
+                placement_index = get_placement_index(
+                    num_rows, num_cols, ship_height, ship_width
+                )
+                possible_placement_idxs = placement_index.valid_placement_idxs(
+                    available_squares_copy
+                )
+                if len(possible_placement_idxs) == 0:
+                    got_stuck = True
+                    break
+                chosen_placement = tuple(
+                    placement_index.placements[
+                        rng.choice(possible_placement_idxs)
+                    ].tolist()
+                )
+            else:
+                # large board: no placement index, so try random placements first (large
+                # boards are mostly empty), then scan the board for the valid placements
+                chosen_placement = _random_valid_placement(
+                    ship_height, ship_width, available_squares_copy, rng
+                )
+                if chosen_placement is None:
+                    placement_mask = get_possible_ship_placement_mask(
+                        ship_height, ship_width, available_squares_copy
+                    )
+                    possible_square_idxs = np.flatnonzero(placement_mask)
+                    if len(possible_square_idxs) == 0:
+                        got_stuck = True
+                        break
+                    top_row_idx, left_col_idx = divmod(
+                        int(rng.choice(possible_square_idxs)), placement_mask.shape[1]
+                    )
+                    chosen_placement = (
+                        top_row_idx,
+                        left_col_idx,
+                        ship_height,
+                        ship_width,
+                    )
             ship_placements.append(chosen_placement)
             top_row_idx, left_col_idx, _, _ = chosen_placement
 
@@ -124,15 +251,396 @@ def random_ships_placement(
             right_buffer_row_idx = min(num_cols - 1, right_col_idx + 1)
 
             # set the squares (including the ship's buffer) to be unavailable
-            for r in range(top_buffer_row_idx, bottom_buffer_row_idx + 1):
-                for c in range(left_buffer_row_idx, right_buffer_row_idx + 1):
-                    available_squares_copy[r][c] = False
+            available_squares_copy[
+                top_buffer_row_idx : bottom_buffer_row_idx + 1,
+                left_buffer_row_idx : right_buffer_row_idx + 1,
+            ] = False
         if len(ship_placements) == len(ship_dims):
             got_stuck = False
 
     return ship_placements
 
 
+@lru_cache(maxsize=None)
+def _candidate_placement_table(
+    num_rows: int,
+    num_cols: int,
+    ship_dims: Tuple[int, int],
+    rotate_allowed: bool,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Every in-bounds placement of the ship (in both orientations if rotate_allowed), from
+    the placement index of each orientation.
+
+    Returns: placements (C, 4) array of (top_row_idx, left_col_idx, ship_height, ship_width),
+    is_rotated (C,) Boolean array, cell masks (C, num_rows * num_cols) and buffer masks
+    (C, num_rows * num_cols), where the buffer mask also includes the ship's own squares
+    Raises ValueError if the board is too large for placement indexes
+    """
+    if not has_placement_index(num_rows, num_cols):
+        raise ValueError(
+            f"A {num_rows}x{num_cols} board is too large for placement indexes"
+        )
+    ship_height, ship_width = ship_dims
+    indexes = [get_placement_index(num_rows, num_cols, ship_height, ship_width)]
+    if rotate_allowed and ship_height != ship_width:
+        indexes.append(
+            get_placement_index(num_rows, num_cols, ship_width, ship_height)
+        )
+
+    return (
+        np.concatenate([index.placements for index in indexes]),
+        np.concatenate(
+            [
+                np.full(len(index), rotated, dtype=bool)
+                for rotated, index in enumerate(indexes)
+            ]
+        ),
+        np.concatenate([index.cell_masks for index in indexes]),
+        np.concatenate([index.buffer_masks for index in indexes]),
+    )
+
+
+# node budget of one randomized search of backtracking_ships_placement, and the number
+# of searches (restarting from a new random order) before giving up
+BACKTRACKING_MAX_NODES = 2000
+BACKTRACKING_MAX_RESTARTS = 50
+# number of fleets sample_ships_placements draws in one vectorized step (the memory it
+# uses is proportional)
+SAMPLING_CHUNK_SIZE = 16384
+# minimum number of fleets sample_ships_placements draws when redrawing the fleets that
+# got stuck (so a few fleets that rarely fit don't take one round each)
+SAMPLING_MIN_RETRY_SIZE = 1024
+
+
+class _FleetBound:
+    """
+    Joint pruning for the placement search: whether the ships left to place can still fit
+    on the free squares, all together (not just one at a time). Two lower bounds on what
+    the ships need are checked:
+    - squares: a ship covers height x width free squares
+    - 2x2 blocks: in any tiling of the board into 2x2 blocks, two ships can't share a
+      block (they would touch), and a ship covers at least
+      ceil(height / 2) x ceil(width / 2) blocks, which must each hold a free square
+    """
+
+    def __init__(self, num_rows: int, num_cols: int, ship_dims: List[Tuple[int, int]]):
+        row_idxs, col_idxs = np.divmod(np.arange(num_rows * num_cols), num_cols)
+        # block of each square, for the 4 tilings (offset by 0 or 1 row and column)
+        self.block_idxs = []
+        for row_offset in range(2):
+            for col_offset in range(2):
+                num_block_cols = (num_cols + col_offset + 1) // 2
+                self.block_idxs.append(
+                    ((row_idxs + row_offset) // 2) * num_block_cols
+                    + (col_idxs + col_offset) // 2
+                )
+        # what the ships from each index onwards need
+        self.num_squares_needed = np.cumsum(
+            [height * width for height, width in ship_dims][::-1]
+        )[::-1].tolist() + [0]
+        self.num_blocks_needed = np.cumsum(
+            [-(-height // 2) * -(-width // 2) for height, width in ship_dims][::-1]
+        )[::-1].tolist() + [0]
+
+    def fits(self, ship_idx: int, blocked: np.ndarray) -> bool:
+        """ True if the ships from ship_idx onwards may fit around the blocked squares """
+        is_free = ~blocked
+        if int(is_free.sum()) < self.num_squares_needed[ship_idx]:
+            return False
+        for block_idxs in self.block_idxs:
+            num_free_blocks = len(np.unique(block_idxs[is_free]))
+            if num_free_blocks < self.num_blocks_needed[ship_idx]:
+                return False
+        return True
+
+
+def backtracking_ships_placement(
+    ship_dims: List[Tuple[int, int]],
+    available_squares: List[List[bool]],
+    num_rows: int,
+    num_cols: int,
+    rotate_allowed: bool = True,
+    rng: Optional[random.Random] = None,
+    max_nodes: int = BACKTRACKING_MAX_NODES,
+    max_restarts: int = BACKTRACKING_MAX_RESTARTS,
+) -> List[ShipPlacement]:
+    """
+    Places the ships in order with a randomized depth-first search: each ship tries its
+    valid placements (over both orientations, if rotate_allowed) in a random order, and
+    a placement is only accepted if the remaining ships can still fit afterwards, each on
+    its own and all together (see _FleetBound). When a ship runs out of placements, only
+    the previous ship's choice is undone, instead of restarting the whole fleet.
+
+    The cost is bounded: a search gives up after max_nodes placements tried, and starts
+    over with a new random order, up to max_restarts times.
+
+    Note the layouts are not sampled from exactly the same distribution as
+    random_ships_placement, since the orientation isn't chosen before the placement.
+
+    rng - random number generator (default: the random module's global generator)
+
+    Returns: returns a list of N tuples: (top_row_idx, left_col_idx, ship_height, ship_width)
+    Raises ValueError if there is no legal layout of the ships, or none was found within
+    the budget
+    """
+    if rng is None:
+        rng = random
+    initial_blocked = ~np.array(available_squares, dtype=bool)
+    assert initial_blocked.shape == (num_rows, num_cols)
+    tables = [
+        _candidate_placement_table(num_rows, num_cols, tuple(dims), rotate_allowed)
+        for dims in ship_dims
+    ]
+    fleet_bound = _FleetBound(num_rows, num_cols, ship_dims)
+
+    def valid_candidates(ship_idx: int, blocked: np.ndarray) -> np.ndarray:
+        _, _, cell_masks, _ = tables[ship_idx]
+        return np.flatnonzero(~(cell_masks & blocked).any(axis=1))
+
+    def remaining_ships_fit(ship_idx: int, blocked: np.ndarray) -> bool:
+        for remaining_ship_idx in range(ship_idx + 1, len(tables)):
+            _, _, cell_masks, _ = tables[remaining_ship_idx]
+            if (cell_masks & blocked).any(axis=1).all():
+                return False
+        return fleet_bound.fits(ship_idx + 1, blocked)
+
+    def shuffled_candidates(ship_idx: int, blocked: np.ndarray) -> List[int]:
+        candidates = valid_candidates(ship_idx, blocked).tolist()
+        rng.shuffle(candidates)
+        return candidates
+
+    if not remaining_ships_fit(-1, initial_blocked.ravel()):
+        raise ValueError("There is no legal layout of the ships on the board")
+
+    for _ in range(max_restarts):
+        chosen_candidates = _search_ships_placement(
+            tables,
+            initial_blocked.ravel(),
+            shuffled_candidates,
+            remaining_ships_fit,
+            max_nodes,
+        )
+        if chosen_candidates is not None:
+            return [
+                tuple(tables[ship_idx][0][candidate_idx].tolist())
+                for ship_idx, candidate_idx in enumerate(chosen_candidates)
+            ]
+    raise ValueError(
+        f"No legal layout of the ships found in {max_restarts} searches of "
+        f"{max_nodes} placements"
+    )
+
+
+def _search_ships_placement(
+    tables, initial_blocked, shuffled_candidates, remaining_ships_fit, max_nodes: int
+) -> Optional[List[int]]:
+    """
+    One search of backtracking_ships_placement
+
+    Returns: the candidate placement index of each ship, or None if the search ran out
+    of nodes
+    Raises ValueError if the whole search space was exhausted
+    """
+    num_ships = len(tables)
+    # search stack: for each placed ship, the squares blocked before placing it, and the
+    # candidate placements it has not tried yet
+    blocked_stack = [initial_blocked]
+    candidates_stack = [shuffled_candidates(0, initial_blocked)]
+    chosen_candidates = []
+    num_nodes = 0
+    while len(chosen_candidates) < num_ships:
+        ship_idx = len(chosen_candidates)
+        blocked = blocked_stack[-1]
+        candidates = candidates_stack[-1]
+
+        next_blocked = None
+        while candidates:
+            if num_nodes >= max_nodes:
+                return None
+            num_nodes += 1
+            candidate_idx = candidates.pop()
+            _, _, _, buffer_masks = tables[ship_idx]
+            next_blocked = blocked | buffer_masks[candidate_idx]
+            if remaining_ships_fit(ship_idx, next_blocked):
+                break
+            next_blocked = None
+
+        if next_blocked is None:
+            # this ship has no placement left: undo the previous ship's choice
+            if not chosen_candidates:
+                raise ValueError("There is no legal layout of the ships on the board")
+            chosen_candidates.pop()
+            blocked_stack.pop()
+            candidates_stack.pop()
+            continue
+
+        chosen_candidates.append(candidate_idx)
+        if len(chosen_candidates) < num_ships:
+            blocked_stack.append(next_blocked)
+            candidates_stack.append(shuffled_candidates(ship_idx + 1, next_blocked))
+    return chosen_candidates
+
+
+def ship_placements_to_labels(
+    placements: np.ndarray, num_rows: int, num_cols: int
+) -> np.ndarray:
+    """
+    placements - (N, num_ships, 4) array of (top_row_idx, left_col_idx, ship_height, ship_width)
+
+    Returns: (N, num_rows, num_cols) uint8 array, where a square holds the 1-based index of
+    the ship covering it (0 if the square is empty)
+    """
+    num_samples, num_ships, _ = placements.shape
+    row_idxs = np.arange(num_rows).reshape(1, num_rows, 1)
+    col_idxs = np.arange(num_cols).reshape(1, 1, num_cols)
+    labels = np.zeros((num_samples, num_rows, num_cols), dtype=np.uint8)
+    for ship_idx in range(num_ships):
+        top, left, height, width = (
+            placements[:, ship_idx, dim].reshape(-1, 1, 1) for dim in range(4)
+        )
+        ship_mask = (
+            (top <= row_idxs)
+            & (row_idxs < top + height)
+            & (left <= col_idxs)
+            & (col_idxs < left + width)
+        )
+        labels[ship_mask] = ship_idx + 1
+    return labels
+
+
+def _sample_fleets(
+    tables, initial_blocked: np.ndarray, num_fleets: int, rng: np.random.Generator
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    One attempt at num_fleets fleets of sample_ships_placements
+
+    Returns: the (num_fleets, num_ships, 4) placements, the log probability of each
+    fleet, and which fleets got stuck (their placements are meaningless)
+    """
+    blocked = np.tile(initial_blocked, (num_fleets, 1))
+    attempt = np.zeros((num_fleets, len(tables), 4), dtype=np.int32)
+    got_stuck = np.zeros(num_fleets, dtype=bool)
+    attempt_log_proposal = np.zeros(num_fleets)
+    for ship_idx, (placements, is_rotated, cell_masks, buffer_masks) in enumerate(
+        tables
+    ):
+        # a placement is valid if none of its squares are blocked
+        valid = (blocked.astype(np.float32) @ cell_masks.T.astype(np.float32)) == 0
+        if is_rotated.any():
+            rotate = rng.integers(0, 2, size=num_fleets).astype(bool)
+            valid &= is_rotated[np.newaxis, :] == rotate[:, np.newaxis]
+
+        # choose uniformly among the valid placements of each board
+        num_valid = valid.sum(axis=1)
+        got_stuck |= num_valid == 0
+        attempt_log_proposal -= np.log(np.maximum(num_valid, 1))
+        choice = np.floor(rng.random(num_fleets) * num_valid)
+        chosen_idxs = np.argmax(
+            valid.cumsum(axis=1, dtype=np.int32) > choice[:, np.newaxis], axis=1
+        )
+
+        attempt[:, ship_idx] = placements[chosen_idxs]
+        blocked |= buffer_masks[chosen_idxs]
+    return attempt, attempt_log_proposal, got_stuck
+
+
+def sample_ships_placements(
+    ship_dims: List[Tuple[int, int]],
+    num_samples: int,
+    num_rows: int,
+    num_cols: int,
+    rotate_allowed: bool = True,
+    available_squares=None,
+    rng: Optional[np.random.Generator] = None,
+    as_labels: bool = False,
+    with_log_proposal: bool = False,
+) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Batched version of random_ships_placement: samples num_samples fleets at once, placing
+    ship k on every board of the batch in the same vectorized step. Each fleet follows the
+    same procedure as random_ships_placement (random orientation, then a uniformly random
+    valid placement, restarting the fleet from scratch if a ship doesn't fit).
+
+    The fleets are drawn SAMPLING_CHUNK_SIZE at a time, so the memory used on top of the
+    result doesn't grow with num_samples. If no fleet at all was placed in the first
+    round, whether the ships have a legal layout is checked once (see has_legal_layout),
+    and fleets are redrawn until there are num_samples only if they do.
+
+    available_squares - grid of Booleans shared by every sample (default: every square is available)
+    rng - numpy random generator (default: a freshly seeded generator)
+    as_labels - if True, return the dense label tensor from ship_placements_to_labels
+    with_log_proposal - if True, also return the log of the probability that each fleet
+        was sampled, up to a constant shared by every fleet (for importance weights)
+
+    Returns: (num_samples, num_ships, 4) int32 array of
+    (top_row_idx, left_col_idx, ship_height, ship_width), or the label tensor (and the
+    (num_samples,) array of log probabilities, if with_log_proposal)
+    Raises ValueError if the board is too large for placement indexes, or if there is no
+    legal layout of the ships on the available squares
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    if available_squares is None:
+        initial_blocked = np.zeros(num_rows * num_cols, dtype=bool)
+    else:
+        initial_blocked = ~np.asarray(available_squares, dtype=bool).ravel()
+        assert initial_blocked.shape == (num_rows * num_cols,)
+
+    tables = [
+        _candidate_placement_table(num_rows, num_cols, tuple(dims), rotate_allowed)
+        for dims in ship_dims
+    ]
+    for dims, (placements, _, _, _) in zip(ship_dims, tables):
+        if len(placements) == 0:
+            raise ValueError(f"Ship with dimensions {dims} does not fit on the board")
+    ship_placements = np.zeros((num_samples, len(ship_dims), 4), dtype=np.int32)
+    log_proposal = np.zeros(num_samples)
+    num_placed = 0
+    is_first_round = True
+    while num_placed < num_samples:
+        num_fleets = num_samples - num_placed
+        if not is_first_round:
+            # the fleets that fit are few: draw more than are missing at once
+            num_fleets = max(num_fleets, SAMPLING_MIN_RETRY_SIZE)
+        for chunk_start in range(0, num_fleets, SAMPLING_CHUNK_SIZE):
+            attempt, attempt_log_proposal, got_stuck = _sample_fleets(
+                tables,
+                initial_blocked,
+                min(SAMPLING_CHUNK_SIZE, num_fleets - chunk_start),
+                rng,
+            )
+            placed_idxs = np.flatnonzero(~got_stuck)[: num_samples - num_placed]
+            new_idxs = slice(num_placed, num_placed + len(placed_idxs))
+            ship_placements[new_idxs] = attempt[placed_idxs]
+            log_proposal[new_idxs] = attempt_log_proposal[placed_idxs]
+            num_placed += len(placed_idxs)
+            if num_placed == num_samples:
+                break
+
+        if (
+            is_first_round
+            and num_placed == 0
+            and not has_legal_layout(
+                ship_dims,
+                num_rows,
+                num_cols,
+                rotate_allowed=rotate_allowed,
+                available_squares=~initial_blocked.reshape(num_rows, num_cols),
+            )
+        ):
+            raise ValueError(
+                "There is no legal layout of the ships on the available squares"
+            )
+        is_first_round = False
+
+    if as_labels:
+        ship_placements = ship_placements_to_labels(ship_placements, num_rows, num_cols)
+    if with_log_proposal:
+        return ship_placements, log_proposal
+    return ship_placements
+
+
 def main():
     # testing the possible ship placements
     NUM_ROWS = 10
@@ -0,0 +1,67 @@
+import numpy as np
+
+from batch_engine import BatchGames, RandomPolicy, evaluate_policy
+from instrumentation import SHIP_SUNK
+from game_state import BattleshipGameState, STANDARD_SHIP_DIMENSIONS
+from ship_placement import sample_ships_placements, ship_placements_to_labels
+
+
+def test_batch_games_match_game_state():
+    rng = np.random.default_rng(0)
+    num_games = 20
+    placements = sample_ships_placements(
+        STANDARD_SHIP_DIMENSIONS, num_games, 10, 10, rng=rng
+    )
+    games = BatchGames(
+        ship_placements_to_labels(placements, 10, 10), len(STANDARD_SHIP_DIMENSIONS)
+    )
+    game_states = []
+    for fleet_placement in placements.tolist():
+        game_state = BattleshipGameState(verbose=False)
+        for ship_idx, (top, left, height, width) in enumerate(fleet_placement):
+            assert game_state.place_ship(top, left, width, height, ship_idx + 1, False)
+        sunk_ships = []
+        game_state.instrumentation.subscribe(
+            SHIP_SUNK,
+            lambda is_our_ship, ship_value, sunk_ships=sunk_ships: sunk_ships.append(
+                ship_value
+            ),
+        )
+        game_states.append((game_state, sunk_ships))
+
+    # shots are uniformly random (including repeated shots), and only our side shoots
+    while not games.is_game_over.all():
+        row_idxs = rng.integers(0, 10, size=num_games)
+        col_idxs = rng.integers(0, 10, size=num_games)
+        result = games.step(row_idxs, col_idxs)
+        for game_idx, (game_state, sunk_ships) in enumerate(game_states):
+            if game_state.is_game_over:
+                assert result.is_game_over[game_idx]
+                continue
+            num_sunk = len(sunk_ships)
+            did_hit = game_state.attempt_strike(
+                game_state.opponent_ship_locations,
+                game_state.our_guesses,
+                row_idxs[game_idx],
+                col_idxs[game_idx],
+            )
+            assert result.hit[game_idx] == did_hit
+            expected_sunk = sunk_ships[-1] if len(sunk_ships) > num_sunk else 0
+            assert result.sunk_ship[game_idx] == expected_sunk
+            assert result.is_game_over[game_idx] == game_state.is_game_over
+            assert games.num_ships_alive[game_idx] == (
+                game_state.opponent_fleet.num_ships_alive
+            )
+
+
+def test_evaluate_random_policy():
+    num_shots = evaluate_policy(
+        RandomPolicy(),
+        num_games=50,
+        ship_dims=STANDARD_SHIP_DIMENSIONS,
+        batch_size=20,
+        rng=np.random.default_rng(1),
+    )
+    assert num_shots.shape == (50,)
+    # the random policy never repeats a square, so it needs at most 100 shots
+    assert (num_shots >= 17).all() and (num_shots <= 100).all()
@@ -0,0 +1,179 @@
+import random
+
+import numpy as np
+
+from bots import (
+    HIT_WEIGHT,
+    MonteCarloBot,
+    Observation,
+    ProbabilityDensityBot,
+    compute_placement_density,
+    estimate_hit_probabilities,
+    get_observation,
+)
+from exact_inference import ExactInference
+from exact_placement import compute_exact_placement_distribution
+from game_state import BattleshipGameState, STANDARD_SHIP_DIMENSIONS
+from ship_placement import get_possible_ship_placements
+
+
+def _brute_force_density(observation: Observation) -> np.ndarray:
+    num_rows, num_cols = observation.hits.shape
+    density = np.zeros((num_rows, num_cols), dtype=np.int64)
+    for ship_height, ship_width in observation.remaining_ship_dims:
+        for height, width in {(ship_height, ship_width), (ship_width, ship_height)}:
+            all_squares = np.ones((num_rows, num_cols), dtype=bool)
+            for top, left, _, _ in get_possible_ship_placements(
+                height, width, all_squares
+            ):
+                cells = np.zeros((num_rows, num_cols), dtype=bool)
+                cells[top : top + height, left : left + width] = True
+                buffer = np.zeros((num_rows, num_cols), dtype=bool)
+                buffer[
+                    max(0, top - 1) : top + height + 1,
+                    max(0, left - 1) : left + width + 1,
+                ] = True
+                if (cells & observation.misses).any():
+                    continue
+                if (buffer & observation.sunk_squares).any():
+                    continue
+                if (buffer & ~cells & observation.hits).any():
+                    continue
+                density[cells] += HIT_WEIGHT ** int((cells & observation.hits).sum())
+    return density
+
+
+def test_placement_density_matches_brute_force():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        misses = rng.random((6, 7)) < 0.2
+        hits = ~misses & (rng.random((6, 7)) < 0.1)
+        sunk_squares = np.zeros((6, 7), dtype=bool)
+        sunk_squares[0, 0:2] = True
+        observation = Observation(
+            hits=hits & ~sunk_squares,
+            misses=misses & ~sunk_squares,
+            sunk_squares=sunk_squares,
+            remaining_ship_dims=[(3, 1), (2, 1), (2, 1), (2, 2)],
+        )
+        assert (
+            compute_placement_density(observation) == _brute_force_density(observation)
+        ).all()
+
+
+def test_density_bot_targets_around_hits():
+    random.seed(0)
+    game_state = BattleshipGameState(verbose=False)
+    game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=True)
+    game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=False)
+    row_idx, col_idx = next(iter(game_state.opponent_fleet.ship_at))
+    game_state.call_square(row_idx, col_idx)
+
+    observation = get_observation(game_state, our_side=True)
+    assert observation.hits[row_idx, col_idx]
+    assert observation.remaining_ship_dims == STANDARD_SHIP_DIMENSIONS
+    next_row_idx, next_col_idx = ProbabilityDensityBot().choose_square(
+        game_state, our_side=True, rng=random.Random(1)
+    )
+    assert abs(next_row_idx - row_idx) + abs(next_col_idx - col_idx) == 1
+
+
+def test_hit_probabilities_match_exact_distribution():
+    misses = np.zeros((5, 5), dtype=bool)
+    misses[1, 1] = misses[3, 2] = True
+    observation = Observation(
+        hits=np.zeros((5, 5), dtype=bool),
+        misses=misses,
+        sunk_squares=np.zeros((5, 5), dtype=bool),
+        remaining_ship_dims=[(3, 1), (2, 1)],
+    )
+    probabilities, stats = estimate_hit_probabilities(
+        observation,
+        time_budget=None,
+        max_samples=20000,
+        batch_size=5000,
+        rng=np.random.default_rng(0),
+    )
+    expected_probabilities, _ = compute_exact_placement_distribution(
+        [(3, 1), (2, 1)], 5, 5, available_squares=~misses
+    )
+    assert np.abs(probabilities - expected_probabilities).max() < 0.02
+    assert stats.num_samples == stats.num_consistent == 20000
+    assert 0 < stats.effective_sample_size <= 20000
+
+
+def test_hit_probabilities_with_hits_match_exact_inference():
+    hits = np.zeros((6, 6), dtype=bool)
+    hits[0, 0] = hits[0, 1] = True
+    observation = Observation(
+        hits=hits,
+        misses=np.zeros((6, 6), dtype=bool),
+        sunk_squares=np.zeros((6, 6), dtype=bool),
+        remaining_ship_dims=[(3, 1), (2, 1)],
+    )
+    probabilities, _ = estimate_hit_probabilities(
+        observation,
+        time_budget=None,
+        max_samples=200000,
+        batch_size=20000,
+        rng=np.random.default_rng(0),
+    )
+    expected_probabilities = ExactInference(6, 6).hit_probabilities(observation)
+    # the 2x1 ship can't be on the hits, or it would have been sunk
+    assert expected_probabilities[0, 2] == 1
+    assert np.abs(probabilities - expected_probabilities).max() < 0.02
+
+
+def test_hit_probabilities_when_the_ships_dont_fit():
+    misses = np.ones((6, 6), dtype=bool)
+    misses[0, :] = False
+    observation = Observation(
+        hits=np.zeros((6, 6), dtype=bool),
+        misses=misses,
+        sunk_squares=np.zeros((6, 6), dtype=bool),
+        remaining_ship_dims=[(3, 1), (3, 1)],
+    )
+    # the sampler gives up instead of redrawing forever
+    probabilities, stats = estimate_hit_probabilities(
+        observation, time_budget=None, max_samples=1000
+    )
+    assert not probabilities.any() and stats.num_consistent == 0
+
+
+def test_hit_probabilities_stop_when_asked():
+    no_squares = np.zeros((6, 6), dtype=bool)
+    observation = Observation(
+        hits=no_squares,
+        misses=no_squares,
+        sunk_squares=no_squares,
+        remaining_ship_dims=[(3, 1), (2, 1)],
+    )
+    num_batches = []
+    _, stats = estimate_hit_probabilities(
+        observation,
+        time_budget=None,
+        max_samples=1000,
+        batch_size=100,
+        should_stop=lambda: num_batches.append(1) or len(num_batches) > 3,
+    )
+    assert stats.num_samples == 300
+
+
+def test_monte_carlo_bot_covers_hits():
+    random.seed(2)
+    game_state = BattleshipGameState(verbose=False)
+    game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=True)
+    game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=False)
+    row_idx, col_idx = next(iter(game_state.opponent_fleet.ship_at))
+    game_state.call_square(row_idx, col_idx)
+
+    bots = [MonteCarloBot(time_budget=None, max_samples=500) for _ in range(2)]
+    squares = [
+        bot.choose_square(game_state, our_side=True, rng=random.Random(3))
+        for bot in bots
+    ]
+    assert squares[0] == squares[1]
+    assert abs(squares[0][0] - row_idx) + abs(squares[0][1] - col_idx) == 1
+    stats = bots[0].last_stats
+    assert stats.num_samples == 500 and 0 < stats.num_consistent < 500
+    assert stats.samples_per_second > 0
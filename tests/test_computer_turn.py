@@ -0,0 +1,118 @@
+import random
+import time
+
+import pytest
+
+from bots import RandomBot
+from computer_turn import ComputerTurn
+from game_state import BattleshipGameState, STANDARD_SHIP_DIMENSIONS
+
+
+class _SlowBot:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.num_calls = 0
+        self.num_running = 0
+        self.max_running = 0
+
+    def choose_square(self, game_state, our_side, rng):
+        self.num_calls += 1
+        self.num_running += 1
+        self.max_running = max(self.max_running, self.num_running)
+        # the bot plays on a clone, so this doesn't touch the real game
+        game_state.call_square(0, 0)
+        time.sleep(self.delay)
+        self.num_running -= 1
+        return 1, 1
+
+
+class _StoppableBot:
+    def __init__(self):
+        self.was_stopped = False
+
+    def choose_square(self, game_state, our_side, rng, should_stop=None):
+        while not should_stop():
+            time.sleep(0.001)
+        self.was_stopped = True
+        return 1, 1
+
+
+class _FailingBot:
+    def choose_square(self, game_state, our_side, rng):
+        raise RuntimeError("bot failed")
+
+
+def _poll_until_done(computer_turn, game_state):
+    rng = random.Random(0)
+    while True:
+        square = computer_turn.poll(game_state, our_side=False, rng=rng)
+        if square is not None:
+            return square
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def game_state():
+    random.seed(0)
+    game_state = BattleshipGameState(verbose=False)
+    game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=True)
+    game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=False)
+    game_state.is_my_turn = False
+    return game_state
+
+
+def test_computer_turn_polls_the_bot(game_state):
+    computer_turn = ComputerTurn(_SlowBot(0.01), deadline=5, min_thinking_time=0.05)
+    start_time = time.perf_counter()
+    computer_turn.start(game_state, our_side=False, rng=random.Random(0))
+    assert computer_turn.is_thinking
+    assert computer_turn.poll(game_state, our_side=False, rng=random.Random(0)) is None
+
+    assert _poll_until_done(computer_turn, game_state) == (1, 1)
+    assert time.perf_counter() - start_time >= 0.05
+    assert not computer_turn.is_thinking
+    assert computer_turn.num_cancelled_moves == 0
+    assert len(game_state.opponent_unguessed) == 100
+
+
+def test_computer_turn_falls_back_after_deadline(game_state):
+    computer_turn = ComputerTurn(
+        _SlowBot(1), deadline=0.05, min_thinking_time=0, fallback_bot=RandomBot()
+    )
+    computer_turn.start(game_state, our_side=False, rng=random.Random(0))
+    square = _poll_until_done(computer_turn, game_state)
+    assert square in game_state.opponent_unguessed
+    assert computer_turn.num_cancelled_moves == 1
+
+
+def test_computer_turn_raises_bot_errors(game_state):
+    computer_turn = ComputerTurn(_FailingBot(), min_thinking_time=0)
+    computer_turn.start(game_state, our_side=False, rng=random.Random(0))
+    with pytest.raises(RuntimeError):
+        _poll_until_done(computer_turn, game_state)
+    assert not computer_turn.is_thinking
+
+
+def test_computer_turn_stops_the_bot_after_deadline(game_state):
+    bot = _StoppableBot()
+    computer_turn = ComputerTurn(bot, deadline=0.05, min_thinking_time=0)
+    computer_turn.start(game_state, our_side=False, rng=random.Random(0))
+    _poll_until_done(computer_turn, game_state)
+    assert computer_turn.num_cancelled_moves == 1
+    computer_turn._thread.join(timeout=1)
+    assert bot.was_stopped
+
+
+def test_computer_turn_waits_for_the_cancelled_bot(game_state):
+    bot = _SlowBot(0.3)
+    computer_turn = ComputerTurn(bot, deadline=0.05, min_thinking_time=0)
+    for _ in range(2):
+        # the second move never starts: the first bot is still running at its deadline
+        computer_turn.start(game_state, our_side=False, rng=random.Random(0))
+        assert _poll_until_done(computer_turn, game_state) != (1, 1)
+    assert computer_turn.num_cancelled_moves == 2
+
+    computer_turn.deadline = 5
+    computer_turn.start(game_state, our_side=False, rng=random.Random(0))
+    assert _poll_until_done(computer_turn, game_state) == (1, 1)
+    assert bot.num_calls == 2 and bot.max_running == 1
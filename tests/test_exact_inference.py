@@ -0,0 +1,146 @@
+import random
+
+import numpy as np
+
+from bots import ExactInferenceBot, Observation, RandomBot, get_observation
+from exact_inference import CACHE_ENTRY_OVERHEAD, ExactInference
+from exact_placement import compute_exact_placement_distribution
+from game_state import BattleshipGameState
+from headless import simulate_game
+
+SHIP_DIMS = [(3, 1), (2, 1), (2, 1), (1, 1)]
+
+
+def _empty_observation(num_rows: int, num_cols: int, misses=None) -> Observation:
+    no_squares = np.zeros((num_rows, num_cols), dtype=bool)
+    return Observation(
+        hits=no_squares,
+        misses=misses if misses is not None else no_squares,
+        sunk_squares=no_squares,
+        remaining_ship_dims=SHIP_DIMS,
+    )
+
+
+def test_probabilities_match_exact_placement():
+    rng = np.random.default_rng(0)
+    for _ in range(3):
+        misses = rng.random((6, 6)) < 0.2
+        observation = _empty_observation(6, 6, misses)
+        engine = ExactInference(6, 6)
+        expected, num_layouts = compute_exact_placement_distribution(
+            SHIP_DIMS, 6, 6, available_squares=~misses
+        )
+        assert engine.get_layouts(observation).num_layouts == num_layouts
+        np.testing.assert_allclose(engine.hit_probabilities(observation), expected)
+
+
+def _play_checking_layouts(seed: int, engine: ExactInference):
+    """
+    Plays random shots at a 5x5 board, checking the layouts the engine filters from its
+    cache against those enumerated from scratch
+    """
+    rng = random.Random(seed)
+    game_state = BattleshipGameState(
+        num_rows=5, num_cols=5, ships_dimensions=SHIP_DIMS, verbose=False
+    )
+    game_state.randomize_ship_placements(SHIP_DIMS, our_ships=True, rng=rng)
+    game_state.randomize_ship_placements(SHIP_DIMS, our_ships=False, rng=rng)
+    true_occupancy = np.zeros((5, 5), dtype=bool)
+    for squares in game_state.opponent_fleet.ship_squares.values():
+        for row_idx, col_idx in squares:
+            true_occupancy[row_idx, col_idx] = True
+    while not game_state.is_game_over:
+        observation = get_observation(game_state, our_side=True)
+        layouts = engine.get_layouts(observation)
+        expected = ExactInference(5, 5).get_layouts(observation)
+        assert layouts.ship_dims == expected.ship_dims
+        assert sorted(map(tuple, layouts.placement_idxs.tolist())) == sorted(
+            map(tuple, expected.placement_idxs.tolist())
+        )
+        # the actual layout is one of them
+        remaining_ships = true_occupancy & ~observation.sunk_squares
+        assert (layouts.occupancy == remaining_ships.ravel()).all(axis=1).any()
+
+        square = game_state.our_unguessed.sample(rng)
+        game_state.call_square(*square)
+        # only our side shoots
+        game_state.is_my_turn = True
+
+
+def test_filtered_layouts_match_enumerated_layouts():
+    engine = ExactInference(5, 5)
+    for seed in range(3):
+        _play_checking_layouts(seed, engine)
+    assert engine.num_enumerated == 1
+    assert engine.num_filtered > 0
+
+
+def test_lru_eviction_under_memory_limit():
+    observation = _empty_observation(5, 5)
+    engine = ExactInference(5, 5)
+    layouts = engine.get_layouts(observation)
+    engine = ExactInference(5, 5, memory_limit=engine._cache_nbytes + 1)
+    assert engine.get_layouts(observation).num_layouts == layouts.num_layouts
+    assert engine.get_layouts(observation).num_layouts == layouts.num_layouts
+    assert engine.num_cache_hits == 1
+
+    misses = np.zeros((5, 5), dtype=bool)
+    misses[0, 0] = True
+    engine.get_layouts(_empty_observation(5, 5, misses))
+    assert engine.num_filtered == 1
+    # the first layout set was evicted to make room for the second
+    engine.get_layouts(observation)
+    assert engine.num_cache_hits == 1
+    assert engine.num_enumerated == 2
+    assert engine._cache_nbytes <= engine.memory_limit
+
+
+def test_too_many_layouts():
+    engine = ExactInference(10, 10, max_layouts=1000)
+    assert engine.get_layouts(_empty_observation(10, 10)) is None
+    assert engine.hit_probabilities(_empty_observation(10, 10)) is None
+
+
+def test_cache_charges_every_entry():
+    engine = ExactInference(10, 10, max_layouts=1000, max_entries=3)
+    misses = np.zeros((10, 10), dtype=bool)
+    for col_idx in range(5):
+        misses[0, col_idx] = True
+        assert engine.get_layouts(_empty_observation(10, 10, misses)) is None
+        # the observations of the entries are charged, even without layouts
+        entry_nbytes = CACHE_ENTRY_OVERHEAD + 3 * 100
+        assert engine._cache_nbytes == len(engine._cache) * entry_nbytes
+    assert len(engine._cache) == 3
+
+    engine = ExactInference(10, 10, max_layouts=1000, memory_limit=2 * entry_nbytes)
+    for col_idx in range(5):
+        misses[1, col_idx] = True
+        engine.get_layouts(_empty_observation(10, 10, misses))
+    assert len(engine._cache) == 2
+
+
+def test_interleaved_games_are_filtered():
+    engine = ExactInference(5, 5)
+    misses = [np.zeros((5, 5), dtype=bool) for _ in range(2)]
+    engine.get_layouts(_empty_observation(5, 5))
+    for square_idx in range(4):
+        # two games shooting at opposite corners, one move each in turn
+        misses[0].flat[square_idx] = True
+        misses[1].flat[24 - square_idx] = True
+        for game_misses in misses:
+            expected = ExactInference(5, 5).get_layouts(
+                _empty_observation(5, 5, game_misses)
+            )
+            layouts = engine.get_layouts(_empty_observation(5, 5, game_misses))
+            assert layouts.num_layouts == expected.num_layouts
+    assert engine.num_enumerated == 1
+    assert engine.num_filtered == 8
+
+
+def test_exact_inference_bot_plays_games():
+    bot = ExactInferenceBot(max_layouts=20000)
+    for seed in range(2):
+        result = simulate_game(bot, RandomBot(), seed, 7, 7, SHIP_DIMS)
+        assert result.winner == "a"
+    engine = bot.get_engine(7, 7)
+    assert engine.num_filtered > 0
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from exact_placement import compute_exact_placement_distribution
+from ship_placement import get_possible_ship_placements
+
+
+def _brute_force_distribution(ship_dims, num_rows, num_cols, available_squares):
+    """Enumerates every layout with labelled ships (so identical ships are counted twice)"""
+    occupancy_counts = np.zeros((num_rows, num_cols))
+    num_layouts = 0
+
+    def place_remaining_ships(ship_idx, available, placements):
+        nonlocal num_layouts
+        if ship_idx == len(ship_dims):
+            num_layouts += 1
+            for top_row_idx, left_col_idx, ship_height, ship_width in placements:
+                occupancy_counts[
+                    top_row_idx : top_row_idx + ship_height,
+                    left_col_idx : left_col_idx + ship_width,
+                ] += 1
+            return
+        ship_height, ship_width = ship_dims[ship_idx]
+        for height, width in {(ship_height, ship_width), (ship_width, ship_height)}:
+            for placement in get_possible_ship_placements(height, width, available):
+                top_row_idx, left_col_idx, _, _ = placement
+                next_available = available.copy()
+                next_available[
+                    max(0, top_row_idx - 1) : top_row_idx + height + 1,
+                    max(0, left_col_idx - 1) : left_col_idx + width + 1,
+                ] = False
+                place_remaining_ships(
+                    ship_idx + 1, next_available, placements + [placement]
+                )
+
+    place_remaining_ships(0, np.array(available_squares, dtype=bool), [])
+    return occupancy_counts / num_layouts, num_layouts
+
+
+@pytest.mark.parametrize(
+    "ship_dims,num_rows,num_cols",
+    [
+        ([(3, 1), (2, 1)], 5, 5),
+        ([(2, 1), (3, 1), (2, 1)], 4, 5),
+        ([(2, 2), (1, 1)], 4, 4),
+    ],
+)
+def test_exact_distribution_matches_brute_force(ship_dims, num_rows, num_cols):
+    available_squares = np.ones((num_rows, num_cols), dtype=bool)
+    available_squares[1, 1] = False
+
+    distribution, num_layouts = compute_exact_placement_distribution(
+        ship_dims, num_rows, num_cols, available_squares=available_squares
+    )
+    expected_distribution, num_labelled_layouts = _brute_force_distribution(
+        ship_dims, num_rows, num_cols, available_squares
+    )
+    assert np.allclose(distribution, expected_distribution)
+    num_identical_orderings = 1
+    if ship_dims.count((2, 1)) == 2:
+        num_identical_orderings = 2
+    assert num_layouts * num_identical_orderings == num_labelled_layouts
+    assert distribution[1, 1] == 0.0
+
+
+def test_exact_distribution_no_legal_layout():
+    with pytest.raises(ValueError):
+        compute_exact_placement_distribution([(2, 1), (2, 1)], 2, 2)
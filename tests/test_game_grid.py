@@ -0,0 +1,120 @@
+import random
+
+import pytest
+
+from game_grid import GameGrid, BitboardGameGrid, NumpyGameGrid
+from game_state import BattleshipGameState, STANDARD_SHIP_DIMENSIONS
+
+
+def _random_unguessed_square(game_state, rng):
+    unguessed_squares = (
+        game_state.our_unguessed
+        if game_state.is_my_turn
+        else game_state.opponent_unguessed
+    )
+    return unguessed_squares.sample(rng)
+
+
+@pytest.mark.parametrize("grid_class", [BitboardGameGrid, NumpyGameGrid])
+def test_grid_matches_list_grid(grid_class):
+    rng = random.Random(0)
+    list_grid = GameGrid(num_rows=6, num_cols=7, initial_value=None)
+    other_grid = grid_class(num_rows=6, num_cols=7, initial_value=None)
+    for _ in range(500):
+        row_idx, col_idx = rng.randrange(6), rng.randrange(7)
+        new_value = rng.choice([None, True, False])
+        list_grid.update_grid(row_idx, col_idx, new_value)
+        other_grid.update_grid(row_idx, col_idx, new_value)
+        assert other_grid.read_grid(row_idx, col_idx) == new_value
+    assert other_grid.grid == list_grid.grid
+
+
+def test_bitboard_grid_masks():
+    grid = BitboardGameGrid(num_rows=4, num_cols=5, initial_value=0)
+    grid.update_grid(1, 2, 3)
+    grid.update_grid(2, 2, 3)
+    grid.update_grid(0, 0, 1)
+    assert grid.value_mask(3) == grid.rect_mask(1, 2, 2, 1)
+    assert grid.occupied_mask() == grid.value_mask(3) | grid.cell_mask(0, 0)
+    # rectangles are clipped to the grid bounds
+    assert grid.rect_mask(-1, -1, 2, 2) == grid.cell_mask(0, 0)
+
+    grid.clear_value(3)
+    assert grid.read_grid(1, 2) == 0
+    with pytest.raises(AssertionError):
+        grid.read_grid(4, 0)
+
+
+def test_bitboard_game_state_matches_list_game_state():
+    game_states = {}
+    for grid_backend in ["list", "bitboard"]:
+        random.seed(1)
+        game_state = BattleshipGameState(grid_backend=grid_backend)
+        game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=True)
+        game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=False)
+        assert game_state.check_placements_ready()
+
+        rng = random.Random(2)
+        while not game_state.is_game_over:
+            game_state.call_square(*_random_unguessed_square(game_state, rng))
+        game_states[grid_backend] = game_state
+
+    list_state, bitboard_state = game_states["list"], game_states["bitboard"]
+    assert list_state.is_my_turn == bitboard_state.is_my_turn
+    assert list_state.get_player_home_grid() == bitboard_state.get_player_home_grid()
+    assert (
+        list_state.get_player_tracking_grid()
+        == bitboard_state.get_player_tracking_grid()
+    )
+
+
+def test_numpy_grid_rects():
+    grid = NumpyGameGrid(num_rows=4, num_cols=5, initial_value=0)
+    grid.fill_rect(1, 2, 2, 1, 3)
+    assert grid.value_array(3).sum() == 2
+    assert grid.read_grid(2, 2) == 3
+    assert not grid.is_rect_empty(0, 1, 2, 2)
+    # rectangles are clipped to the grid bounds
+    assert grid.is_rect_empty(-1, -1, 2, 2)
+    assert grid.values_array().tolist() == grid.grid
+    with pytest.raises(AssertionError):
+        grid.fill_rect(3, 0, 2, 1, 4)
+
+
+def test_large_board_game_states_match():
+    game_states = {}
+    # too large for placement indexes
+    ship_dims = STANDARD_SHIP_DIMENSIONS * 4
+    for grid_backend in ["list", "bitboard", "numpy"]:
+        game_state = BattleshipGameState(
+            num_rows=40,
+            num_cols=50,
+            ships_dimensions=ship_dims,
+            grid_backend=grid_backend,
+            verbose=False,
+        )
+        game_state.randomize_ship_placements(
+            ship_dims, our_ships=True, rng=random.Random(3)
+        )
+        game_state.randomize_ship_placements(
+            ship_dims, our_ships=False, rng=random.Random(4)
+        )
+        assert game_state.check_placements_ready()
+        rng = random.Random(5)
+        for _ in range(1000):
+            game_state.call_square(*_random_unguessed_square(game_state, rng))
+        game_states[grid_backend] = game_state
+
+    list_state = game_states["list"]
+    for game_state in game_states.values():
+        assert game_state.get_player_home_grid() == list_state.get_player_home_grid()
+        assert (
+            game_state.get_player_tracking_grid()
+            == list_state.get_player_tracking_grid()
+        )
+        # snapshots only differ in the grid backend byte of the header
+        assert game_state.to_bytes()[11:] == list_state.to_bytes()[11:]
+        assert (
+            BattleshipGameState.from_bytes(game_state.to_bytes()).to_bytes()
+            == game_state.to_bytes()
+        )
@@ -0,0 +1,303 @@
+import random
+
+import numpy as np
+import pytest
+
+from instrumentation import SHIP_SUNK
+from game_state import (
+    BattleshipGameState,
+    STANDARD_SHIP_DIMENSIONS,
+    UnguessedSquares,
+)
+
+
+def _random_unguessed_square(game_state, rng):
+    unguessed_squares = (
+        game_state.our_unguessed
+        if game_state.is_my_turn
+        else game_state.opponent_unguessed
+    )
+    return unguessed_squares.sample(rng)
+
+
+@pytest.mark.parametrize("grid_backend", ["list", "bitboard", "numpy"])
+def test_fleet_tracks_ship_health(grid_backend):
+    game_state = BattleshipGameState(
+        num_rows=5,
+        num_cols=5,
+        ships_dimensions=[(3, 1), (2, 1)],
+        grid_backend=grid_backend,
+    )
+    assert game_state.place_ship(0, 0, 1, 3, 1, is_our_ship=False)
+    assert game_state.place_ship(0, 3, 2, 1, 2, is_our_ship=False)
+    fleet = game_state.opponent_fleet
+    assert fleet.num_ships_alive == 2
+    assert fleet.remaining_hits == {1: 3, 2: 2}
+
+    sunk_ships = []
+    game_state.instrumentation.subscribe(
+        SHIP_SUNK,
+        lambda is_our_ship, ship_value: sunk_ships.append((is_our_ship, ship_value)),
+    )
+    game_state.attempt_strike(
+        game_state.opponent_ship_locations, game_state.our_guesses, 0, 3
+    )
+    # hitting the same square twice doesn't count twice
+    game_state.attempt_strike(
+        game_state.opponent_ship_locations, game_state.our_guesses, 0, 3
+    )
+    assert fleet.remaining_hits[2] == 1
+    assert sunk_ships == []
+
+    game_state.attempt_strike(
+        game_state.opponent_ship_locations, game_state.our_guesses, 0, 4
+    )
+    assert sunk_ships == [(False, 2)]
+    assert not game_state.check_ship_alive(
+        game_state.opponent_ship_locations, game_state.our_guesses, 2
+    )
+    assert fleet.num_ships_alive == 1
+    assert not game_state.is_game_over
+
+    game_state.clear_ship_placement(game_state.opponent_ship_locations, 1, (3, 1))
+    assert fleet.num_ships_alive == 0
+    assert fleet.ship_at == {(0, 3): 2, (0, 4): 2}
+
+
+def test_fleet_ends_game_when_all_ships_sunk():
+    random.seed(3)
+    game_state = BattleshipGameState()
+    game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=True)
+    game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=False)
+    sunk_ships = []
+    game_state.instrumentation.subscribe(
+        SHIP_SUNK,
+        lambda is_our_ship, ship_value: sunk_ships.append((is_our_ship, ship_value)),
+    )
+
+    rng = random.Random(4)
+    while not game_state.is_game_over:
+        game_state.call_square(*_random_unguessed_square(game_state, rng))
+    loser_is_us = game_state.our_fleet.num_ships_alive == 0
+    assert loser_is_us != (game_state.opponent_fleet.num_ships_alive == 0)
+    assert not game_state.any_ships_alive(
+        *(
+            (game_state.our_ship_locations, game_state.opponent_guesses)
+            if loser_is_us
+            else (game_state.opponent_ship_locations, game_state.our_guesses)
+        )
+    )
+    loser_sunk = sorted(v for is_ours, v in sunk_ships if is_ours == loser_is_us)
+    assert len(loser_sunk) == len(STANDARD_SHIP_DIMENSIONS)
+
+
+@pytest.mark.parametrize("grid_backend", ["list", "bitboard", "numpy"])
+def test_ship_registry_matches_grid(grid_backend):
+    random.seed(5)
+    rng = random.Random(6)
+    game_state = BattleshipGameState(grid_backend=grid_backend)
+    fleet = game_state.our_fleet
+    for _ in range(20):
+        game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=True)
+        for ship_value, _ in game_state.our_ships:
+            if rng.random() < 0.5:
+                game_state.rotate_ship_placement(
+                    game_state.our_ship_locations, ship_value
+                )
+
+        # the registry agrees with a scan of the grid
+        scanned_fleet = type(fleet)(
+            game_state.our_ship_locations, game_state.opponent_guesses
+        )
+        scanned_fleet.rebuild()
+        assert scanned_fleet.ship_at == fleet.ship_at
+        for ship_value, ship_dims in game_state.our_ships:
+            top_row_idx, left_col_idx, ship_height, ship_width = fleet.ship_placement(
+                ship_value
+            )
+            assert (ship_height, ship_width) in [ship_dims, ship_dims[::-1]]
+            assert scanned_fleet.ship_placement(ship_value) == (
+                top_row_idx,
+                left_col_idx,
+                ship_height,
+                ship_width,
+            )
+        game_state.clear_all_ship_placements(game_state.our_ship_locations)
+        assert fleet.ship_at == {}
+        assert game_state.our_ship_locations.grid == [[0] * 10 for _ in range(10)]
+
+
+def _apply_changes(board, changes):
+    for (row_idx, col_idx), symbol in changes.items():
+        board[row_idx][col_idx] = symbol
+
+
+@pytest.mark.parametrize("grid_backend", ["list", "bitboard", "numpy"])
+def test_polled_changes_match_full_grids(grid_backend):
+    random.seed(7)
+    rng = random.Random(8)
+    game_state = BattleshipGameState(grid_backend=grid_backend)
+    home_board = [[""] * 10 for _ in range(10)]
+    tracking_board = [[""] * 10 for _ in range(10)]
+    _apply_changes(home_board, game_state.poll_home_grid_changes())
+    _apply_changes(tracking_board, game_state.poll_tracking_grid_changes())
+    assert home_board == game_state.get_player_home_grid()
+    assert game_state.poll_home_grid_changes() == {}
+
+    game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=True)
+    game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=False)
+    _apply_changes(home_board, game_state.poll_home_grid_changes())
+    _apply_changes(tracking_board, game_state.poll_tracking_grid_changes())
+    assert home_board == game_state.get_player_home_grid()
+    while not game_state.is_game_over:
+        game_state.call_square(*_random_unguessed_square(game_state, rng))
+        home_changes = game_state.poll_home_grid_changes()
+        tracking_changes = game_state.poll_tracking_grid_changes()
+        # a shot changes one square, or all the squares of the ship it sunk
+        assert len(home_changes) + len(tracking_changes) <= 5
+        _apply_changes(home_board, home_changes)
+        _apply_changes(tracking_board, tracking_changes)
+        assert home_board == game_state.get_player_home_grid()
+        assert tracking_board == game_state.get_player_tracking_grid()
+
+
+@pytest.mark.parametrize("grid_backend", ["list", "bitboard", "numpy"])
+def test_snapshot_round_trip(grid_backend):
+    random.seed(9)
+    rng = random.Random(10)
+    game_state = BattleshipGameState(grid_backend=grid_backend, verbose=False)
+    game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=True)
+    # the opponent's ships are only partly placed
+    game_state.place_ship(0, 0, 1, 2, 5, is_our_ship=False)
+
+    while not game_state.is_game_over and game_state.our_fleet.num_ships_alive > 1:
+        game_state.call_square(*_random_unguessed_square(game_state, rng))
+        snapshot = game_state.to_bytes()
+        copy = BattleshipGameState.from_bytes(snapshot)
+        assert copy.to_bytes() == snapshot
+        assert copy.is_my_turn == game_state.is_my_turn
+        assert copy.ships_placed == game_state.ships_placed
+        assert copy.get_player_home_grid() == game_state.get_player_home_grid()
+        assert copy.get_player_tracking_grid() == game_state.get_player_tracking_grid()
+        assert copy.our_fleet.remaining_hits == game_state.our_fleet.remaining_hits
+    assert len(snapshot) < 200
+
+
+@pytest.mark.parametrize("grid_backend", ["list", "bitboard", "numpy"])
+def test_clone_is_independent(grid_backend):
+    random.seed(11)
+    rng = random.Random(14)
+    game_state = BattleshipGameState(grid_backend=grid_backend, verbose=False)
+    game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=True)
+    game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=False)
+    for _ in range(20):
+        game_state.call_square(*_random_unguessed_square(game_state, rng))
+    game_state.undo()
+    snapshot = game_state.to_bytes()
+    clone = game_state.clone()
+    assert clone.grid_backend == grid_backend
+    assert clone.to_bytes() == snapshot
+
+    # the move journal is copied, so undo and redo work on the clone
+    assert clone.redo()
+    assert clone.undo()
+    assert clone.undo()
+    assert game_state.to_bytes() == snapshot
+
+    while not clone.is_game_over:
+        clone.call_square(*_random_unguessed_square(clone, rng))
+    clone.rotate_ship_placement(clone.our_ship_locations, 1)
+    assert game_state.to_bytes() == snapshot
+    assert game_state.our_fleet.num_ships_alive > 0
+    assert game_state.opponent_fleet.num_ships_alive > 0
+    assert len(game_state.our_unguessed) > len(clone.our_unguessed)
+    assert game_state.undo()
+    assert game_state.redo()
+
+    with pytest.raises(ValueError):
+        BattleshipGameState.from_bytes(b"not a snapshot" * 2)
+
+
+@pytest.mark.parametrize("grid_backend", ["list", "bitboard", "numpy"])
+def test_undo_redo_restores_state(grid_backend):
+    random.seed(12)
+    rng = random.Random(13)
+    game_state = BattleshipGameState(grid_backend=grid_backend, verbose=False)
+    game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=True)
+    game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=False)
+    home_board = game_state.get_player_home_grid()
+    game_state.poll_home_grid_changes()
+
+    snapshots = [game_state.to_bytes()]
+    while not game_state.is_game_over:
+        game_state.call_square(*_random_unguessed_square(game_state, rng))
+        snapshots.append(game_state.to_bytes())
+    assert not game_state.redo()
+
+    for snapshot in reversed(snapshots[:-1]):
+        assert game_state.undo()
+        assert game_state.to_bytes() == snapshot
+    assert not game_state.undo()
+    assert game_state.our_fleet.num_ships_alive == len(STANDARD_SHIP_DIMENSIONS)
+    assert len(game_state.our_unguessed) == len(game_state.opponent_unguessed) == 100
+    _apply_changes(home_board, game_state.poll_home_grid_changes())
+    assert home_board == game_state.get_player_home_grid()
+
+    for snapshot in snapshots[1:]:
+        assert game_state.redo()
+        assert game_state.to_bytes() == snapshot
+    assert game_state.is_game_over
+
+    # a new move discards the undone moves
+    game_state.undo()
+    game_state.undo()
+    game_state.call_square(*_random_unguessed_square(game_state, rng))
+    assert not game_state.redo()
+
+
+def test_unguessed_squares():
+    guessed = np.zeros((3, 4), dtype=bool)
+    guessed[0, 0] = True
+    unguessed_squares = UnguessedSquares(3, 4, guessed)
+    assert len(unguessed_squares) == 11
+    assert (0, 0) not in unguessed_squares and (2, 3) in unguessed_squares
+    assert unguessed_squares.count(0) == 5 and unguessed_squares.count(1) == 6
+
+    assert unguessed_squares.remove(1, 1)
+    assert not unguessed_squares.remove(1, 1)
+    unguessed_squares.add(0, 0)
+    assert sorted(unguessed_squares) == sorted(
+        (row_idx, col_idx)
+        for row_idx in range(3)
+        for col_idx in range(4)
+        if (row_idx, col_idx) != (1, 1)
+    )
+
+    rng = random.Random(0)
+    for parity in [0, 1]:
+        while unguessed_squares.count(parity) > 0:
+            row_idx, col_idx = unguessed_squares.sample(rng, parity=parity)
+            assert (row_idx + col_idx) % 2 == parity
+            unguessed_squares.remove(row_idx, col_idx)
+        with pytest.raises(ValueError):
+            unguessed_squares.sample(rng, parity=parity)
+    with pytest.raises(ValueError):
+        unguessed_squares.sample(rng)
+
+
+@pytest.mark.parametrize("grid_backend", ["list", "bitboard", "numpy"])
+def test_call_square_rejects_repeated_guesses(grid_backend):
+    random.seed(14)
+    game_state = BattleshipGameState(grid_backend=grid_backend, verbose=False)
+    game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=True)
+    game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=False)
+    game_state.call_square(0, 0)
+    game_state.is_my_turn = True
+    with pytest.raises(ValueError):
+        game_state.call_square(0, 0)
+    assert len(game_state.move_log) == 1
+
+    # the unguessed squares are part of the snapshot
+    clone = game_state.clone()
+    assert (0, 0) not in clone.our_unguessed
+    assert len(clone.our_unguessed) == 99 and len(clone.opponent_unguessed) == 100
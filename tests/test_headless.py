@@ -0,0 +1,99 @@
+import json
+import os
+import subprocess
+import sys
+
+from click.testing import CliRunner
+
+import placement_index
+from bots import ParityBot, RandomBot
+from game_state import STANDARD_SHIP_DIMENSIONS
+from headless import cli, simulate_game, simulate_many
+from placement_index import load_fleet_placement_indexes
+
+
+def test_simulate_game_is_reproducible(capsys):
+    results = [simulate_game(RandomBot(), RandomBot(), seed=3) for _ in range(2)]
+    assert results[0] == results[1]
+    assert capsys.readouterr().out == ""
+
+    result = results[0]
+    num_ship_squares = sum(h * w for h, w in STANDARD_SHIP_DIMENSIONS)
+    winner_hits = result.hits_a if result.winner == "a" else result.hits_b
+    loser_hits = result.hits_b if result.winner == "a" else result.hits_a
+    assert winner_hits == num_ship_squares
+    assert loser_hits < num_ship_squares
+    assert result.shots_a >= result.hits_a and result.shots_b >= result.hits_b
+    # every turn but the last ends with a miss
+    assert result.num_turns - 1 == (
+        result.shots_a - result.hits_a + result.shots_b - result.hits_b
+    )
+
+
+def test_simulate_game_backends_match():
+    for seed in range(5):
+        assert simulate_game(
+            RandomBot(), RandomBot(), seed, grid_backend="list"
+        ) == simulate_game(RandomBot(), RandomBot(), seed, grid_backend="bitboard")
+
+
+def test_simulate_many_streams_results(tmp_path):
+    results = list(simulate_many("random", "random", num_games=4, random_seed=10))
+    assert [result.seed for result in results] == [10, 11, 12, 13]
+    assert results[2] == simulate_game(RandomBot(), RandomBot(), seed=12)
+
+    out_file = tmp_path / "games.jsonl"
+    run = CliRunner().invoke(
+        cli, ["-n", "4", "-r", "10", "-o", str(out_file)], catch_exceptions=False
+    )
+    assert run.exit_code == 0
+    lines = out_file.read_text().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        result._asdict() for result in results
+    ]
+
+
+def test_headless_does_not_import_pygame():
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, headless; assert 'pygame' not in sys.modules",
+        ],
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+
+
+def test_parity_bot_beats_random_bot():
+    results = list(simulate_many("parity", "random", num_games=40, random_seed=0))
+    num_wins = sum(result.winner == "a" for result in results)
+    assert num_wins > 30
+    # the parity bot never calls a square twice (call_square would raise)
+    result = simulate_game(ParityBot(), ParityBot(), seed=5)
+    assert max(result.shots_a, result.shots_b) <= 100
+
+
+def test_cli_large_board_skips_placement_indexes(tmp_path, monkeypatch):
+    # 12x12 boards count as large here
+    monkeypatch.setattr("placement_index.PLACEMENT_INDEX_MAX_SQUARES", 100)
+    assert load_fleet_placement_indexes(12, 12, STANDARD_SHIP_DIMENSIONS) == {}
+    result = CliRunner().invoke(
+        cli,
+        [
+            "-n",
+            "2",
+            "--bot-a",
+            "montecarlo",
+            "--bot-b",
+            "parity",
+            "--num-rows",
+            "12",
+            "--num-cols",
+            "12",
+            "-o",
+            str(tmp_path / "games.csv"),
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert not any(key[:2] == (12, 12) for key in placement_index._placement_indexes)
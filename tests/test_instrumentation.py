@@ -0,0 +1,104 @@
+import random
+
+from game_state import BattleshipGameState, STANDARD_SHIP_DIMENSIONS
+from instrumentation import (
+    GAME_EVENTS,
+    GAME_OVER,
+    HIT,
+    Instrumentation,
+    SHIP_PLACED,
+    SHIP_SUNK,
+    SHOT,
+)
+
+
+def test_instrumentation_is_only_enabled_when_used():
+    instrumentation = Instrumentation()
+    assert not instrumentation.enabled
+
+    events = []
+    callback = instrumentation.subscribe(SHOT, lambda **kwargs: events.append(kwargs))
+    assert instrumentation.enabled
+    instrumentation.emit(SHOT, row_idx=1)
+    instrumentation.emit(HIT, row_idx=2)
+    assert events == [{"row_idx": 1}]
+    assert not instrumentation.counters
+
+    instrumentation.unsubscribe(SHOT, callback)
+    assert not instrumentation.enabled
+    instrumentation.set_counting()
+    assert instrumentation.enabled
+    instrumentation.emit(SHOT, row_idx=1)
+    assert instrumentation.counters[SHOT] == 1
+
+
+def test_game_state_events():
+    game_state = BattleshipGameState(
+        num_rows=5, num_cols=5, ships_dimensions=[(2, 1)], verbose=False
+    )
+    events = []
+    for event in GAME_EVENTS:
+        game_state.instrumentation.subscribe(
+            event, lambda event=event, **kwargs: events.append((event, kwargs))
+        )
+    game_state.instrumentation.set_counting()
+    assert game_state.place_ship(0, 0, 1, 2, 1, is_our_ship=True)
+    assert game_state.place_ship(3, 3, 2, 1, 1, is_our_ship=False)
+    assert events[-1] == (
+        SHIP_PLACED,
+        dict(
+            is_our_ship=False,
+            ship_value=1,
+            top_row_idx=3,
+            left_col_idx=3,
+            ship_height=1,
+            ship_width=2,
+        ),
+    )
+
+    events.clear()
+    game_state.call_square(3, 3)
+    game_state.call_square(3, 4)
+    assert [event for event, _ in events] == [
+        SHOT,
+        HIT,
+        SHOT,
+        HIT,
+        SHIP_SUNK,
+        GAME_OVER,
+    ]
+    assert events[-2] == (SHIP_SUNK, dict(is_our_ship=False, ship_value=1))
+    assert events[-1] == (GAME_OVER, dict(we_won=True))
+    assert game_state.instrumentation.counters[SHOT] == 2
+    assert game_state.instrumentation.counters[SHIP_PLACED] == 2
+
+
+def test_game_state_timing():
+    random.seed(0)
+    game_state = BattleshipGameState(verbose=False)
+    game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=True)
+    game_state.randomize_ship_placements(STANDARD_SHIP_DIMENSIONS, our_ships=False)
+    instrumentation = game_state.instrumentation
+    instrumentation.time_methods(game_state, ["call_square"])
+    for col_idx in range(10):
+        game_state.call_square(0, col_idx)
+    assert instrumentation.counters["call_square"] == 10
+    assert instrumentation.timings["call_square"] > 0
+
+    # other game states aren't timed
+    assert "call_square" not in vars(game_state.clone())
+    instrumentation.untime_methods(game_state, ["call_square"])
+    game_state.call_square(1, 0)
+    assert instrumentation.counters["call_square"] == 10
+
+
+def test_verbose_game_state_prints_events(capsys):
+    BattleshipGameState(ships_dimensions=[(2, 1)], verbose=False).place_ship(
+        0, 0, 1, 2, 1, is_our_ship=True
+    )
+    assert capsys.readouterr().out == ""
+
+    BattleshipGameState(ships_dimensions=[(2, 1)]).place_ship(
+        0, 0, 1, 2, 1, is_our_ship=True
+    )
+    assert capsys.readouterr().out.startswith("ship_placed: is_our_ship = True")
@@ -0,0 +1,81 @@
+import random
+
+import numpy as np
+
+from bots import ProbabilityDensityBot, RandomBot, get_observation
+from game_state import BattleshipGameState
+from headless import simulate_game
+from opening_book import (
+    OpeningBook,
+    OpeningBookBot,
+    build_opening_book,
+    get_opening_book,
+    opening_book_path,
+)
+
+SHIP_DIMS = [(3, 1), (2, 1), (2, 1)]
+
+
+def _new_game(seed: int) -> BattleshipGameState:
+    rng = random.Random(seed)
+    game_state = BattleshipGameState(
+        num_rows=6, num_cols=6, ships_dimensions=SHIP_DIMS, verbose=False
+    )
+    game_state.randomize_ship_placements(SHIP_DIMS, our_ships=True, rng=rng)
+    game_state.randomize_ship_placements(SHIP_DIMS, our_ships=False, rng=rng)
+    return game_state
+
+
+def test_book_plays_the_bots_squares():
+    bot = ProbabilityDensityBot()
+    book = build_opening_book(bot, 6, 6, SHIP_DIMS, depth=5)
+    assert len(book) >= 5
+    rng = random.Random(0)
+    for seed in range(5):
+        game_state = _new_game(seed)
+        num_book_moves = 0
+        while True:
+            square = book.choose_square(game_state, True, rng)
+            if square is None:
+                break
+            observation = get_observation(game_state, True)
+            best_square_idxs = bot.best_squares(observation, rng).tolist()
+            assert square[0] * 6 + square[1] in best_square_idxs
+            is_hit = game_state.call_square(*square)
+            num_book_moves += 1
+            game_state.is_my_turn = True
+            if is_hit:
+                # out of the book
+                assert book.choose_square(game_state, True, rng) is None
+                break
+        assert num_book_moves <= 5
+
+
+def test_book_save_and_load(tmp_path):
+    book = build_opening_book(ProbabilityDensityBot(), 6, 6, SHIP_DIMS, depth=4)
+    path = opening_book_path(6, 6, SHIP_DIMS, "density", str(tmp_path))
+    book.save(path)
+    loaded = OpeningBook.load(path)
+    assert (loaded.num_rows, loaded.num_cols, loaded.depth) == (6, 6, 4)
+    assert loaded.best_squares.keys() == book.best_squares.keys()
+    for misses_mask, square_idxs in book.best_squares.items():
+        np.testing.assert_array_equal(loaded.best_squares[misses_mask], square_idxs)
+
+    # loaded once, and only if the book exists
+    assert get_opening_book(6, 6, SHIP_DIMS, "density", str(tmp_path)) is (
+        get_opening_book(6, 6, SHIP_DIMS[::-1], "density", str(tmp_path))
+    )
+    assert get_opening_book(6, 6, SHIP_DIMS, "montecarlo", str(tmp_path)) is None
+
+
+def test_opening_book_bot(tmp_path):
+    book = build_opening_book(ProbabilityDensityBot(), 6, 6, SHIP_DIMS, depth=4)
+    book.save(opening_book_path(6, 6, SHIP_DIMS, "density", str(tmp_path)))
+    bot = OpeningBookBot(ProbabilityDensityBot(), "density", str(tmp_path))
+    result = simulate_game(bot, RandomBot(), 0, 6, 6, SHIP_DIMS)
+    assert result.shots_a > bot.num_book_moves > 0
+
+    # without a book, the bot plays every move
+    bot = OpeningBookBot(ProbabilityDensityBot(), "parity", str(tmp_path))
+    simulate_game(bot, RandomBot(), 0, 6, 6, SHIP_DIMS)
+    assert bot.num_book_moves == 0
@@ -0,0 +1,274 @@
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from game_state import STANDARD_SHIP_DIMENSIONS
+from instrumentation import PRECISION, PROGRESS, Instrumentation
+from placement_heatmap_viz import (
+    compute_symmetries,
+    compute_placement_counts,
+    compute_placement_distribution,
+    compute_placement_distribution_checkpointed,
+    compute_placement_distribution_parallel,
+    compute_placement_distribution_to_precision,
+    cli,
+)
+
+
+def test_parallel_distribution_is_reproducible():
+    distributions = [
+        compute_placement_distribution_parallel(
+            STANDARD_SHIP_DIMENSIONS,
+            num_iterations=3001,
+            num_workers=2,
+            batch_size=1000,
+            random_seed=7,
+        )
+        for _ in range(2)
+    ]
+    assert np.array_equal(distributions[0], distributions[1])
+    # every sample covers exactly 17 squares
+    assert np.isclose(distributions[0].sum(), 17.0)
+
+
+def test_placement_counts_are_mergeable():
+    rng = np.random.default_rng(0)
+    counts_a, num_samples_a = compute_placement_counts(
+        STANDARD_SHIP_DIMENSIONS, 300, batch_size=100, rng=rng
+    )
+    counts_b, num_samples_b = compute_placement_counts(
+        STANDARD_SHIP_DIMENSIONS, 200, batch_size=100, rng=rng
+    )
+    assert num_samples_a + num_samples_b == 500
+    assert (counts_a + counts_b).sum() == 17 * 500
+
+
+def test_compute_symmetries():
+    board = np.arange(9).reshape(3, 3)
+    symmetries = compute_symmetries(board)
+    assert len(symmetries) == 8
+    assert len({symmetry.tobytes() for symmetry in symmetries}) == 8
+
+    rectangular_board = np.arange(6).reshape(2, 3)
+    symmetries = compute_symmetries(rectangular_board)
+    assert len(symmetries) == 4
+    assert all(symmetry.shape == (2, 3) for symmetry in symmetries)
+
+
+def test_distribution_with_symmetries_is_symmetric():
+    distribution = compute_placement_distribution(
+        STANDARD_SHIP_DIMENSIONS,
+        num_iterations=200,
+        with_symmetries=True,
+        batch_size=100,
+        rng=np.random.default_rng(0),
+    )
+    for symmetry in compute_symmetries(distribution):
+        assert np.allclose(symmetry, distribution)
+    assert np.isclose(distribution.sum(), 17.0)
+
+
+def test_checkpointed_run_can_be_resumed(tmp_path):
+    full_run = compute_placement_distribution_checkpointed(
+        STANDARD_SHIP_DIMENSIONS,
+        num_iterations=300,
+        checkpoint_dir=str(tmp_path / "full"),
+        checkpoint_every=100,
+        batch_size=50,
+        random_seed=1,
+    )
+
+    interrupted_dir = str(tmp_path / "interrupted")
+    compute_placement_distribution_checkpointed(
+        STANDARD_SHIP_DIMENSIONS,
+        num_iterations=200,
+        checkpoint_dir=interrupted_dir,
+        checkpoint_every=100,
+        batch_size=50,
+        random_seed=1,
+    )
+    with pytest.raises(FileExistsError):
+        compute_placement_distribution_checkpointed(
+            STANDARD_SHIP_DIMENSIONS,
+            num_iterations=300,
+            checkpoint_dir=interrupted_dir,
+            checkpoint_every=100,
+            batch_size=50,
+        )
+    resumed_run = compute_placement_distribution_checkpointed(
+        STANDARD_SHIP_DIMENSIONS,
+        num_iterations=300,
+        checkpoint_dir=interrupted_dir,
+        checkpoint_every=100,
+        batch_size=50,
+        resume=True,
+    )
+    assert np.array_equal(full_run, resumed_run)
+
+
+def test_distribution_to_precision_stops_at_target_error():
+    distribution, achieved_error, num_samples = (
+        compute_placement_distribution_to_precision(
+            STANDARD_SHIP_DIMENSIONS,
+            target_error=0.02,
+            batch_size=500,
+            rng=np.random.default_rng(0),
+        )
+    )
+    assert achieved_error <= 0.02
+    # the largest standard error is at most sqrt(0.25 / n)
+    assert num_samples <= 1000 + 625
+    assert np.isclose(distribution.sum(), 17.0)
+
+    _, achieved_error, num_samples = compute_placement_distribution_to_precision(
+        STANDARD_SHIP_DIMENSIONS,
+        target_error=0.0001,
+        max_iterations=1500,
+        batch_size=500,
+        rng=np.random.default_rng(0),
+    )
+    assert achieved_error > 0.0001
+    assert num_samples == 1500
+
+
+@pytest.mark.parametrize(
+    "target_error, confidence", [(0.0, None), (-0.01, None), (0.02, 0.0), (0.02, 1.5)]
+)
+def test_distribution_to_precision_rejects_invalid_targets(
+    tmp_path, target_error, confidence
+):
+    with pytest.raises(ValueError):
+        compute_placement_distribution_to_precision(
+            STANDARD_SHIP_DIMENSIONS, target_error=target_error, confidence=confidence
+        )
+
+    ship_dims_file = tmp_path / "ships.txt"
+    ship_dims_file.write_text("2,1\n3,1\n")
+    args = ["-i", str(ship_dims_file), "--target-error", str(target_error)]
+    if confidence is not None:
+        args += ["--confidence", str(confidence)]
+    result = CliRunner().invoke(cli, args)
+    assert result.exit_code == 2
+    assert "Error:" in result.output
+
+
+def test_distribution_to_precision_reports_through_instrumentation(capsys):
+    instrumentation = Instrumentation()
+    progress_events = []
+    precision_events = []
+    instrumentation.subscribe(PROGRESS, lambda **kwargs: progress_events.append(kwargs))
+    instrumentation.subscribe(
+        PRECISION, lambda **kwargs: precision_events.append(kwargs)
+    )
+    _, achieved_error, num_samples = compute_placement_distribution_to_precision(
+        STANDARD_SHIP_DIMENSIONS,
+        target_error=0.0001,
+        max_iterations=1500,
+        batch_size=500,
+        rng=np.random.default_rng(0),
+        instrumentation=instrumentation,
+    )
+    assert [event["num_iterations_done"] for event in progress_events] == [
+        500,
+        1000,
+        1500,
+    ]
+    assert [event["is_final"] for event in precision_events] == [False, False, True]
+    assert precision_events[-1]["error"] == achieved_error
+    assert precision_events[-1]["num_samples"] == num_samples
+    # nothing is printed by the library
+    assert capsys.readouterr().out == ""
+
+
+def test_sampling_functions_report_instead_of_printing(tmp_path, capsys):
+    instrumentation = Instrumentation()
+    precision_events = []
+    instrumentation.subscribe(
+        PRECISION, lambda **kwargs: precision_events.append(kwargs)
+    )
+    compute_placement_distribution(
+        STANDARD_SHIP_DIMENSIONS,
+        num_iterations=1000,
+        batch_size=500,
+        rng=np.random.default_rng(0),
+        target_error=0.0001,
+        instrumentation=instrumentation,
+    )
+    assert precision_events[-1]["is_final"]
+    assert precision_events[-1]["num_samples"] == 1000
+
+    progress_events = []
+    instrumentation.subscribe(PROGRESS, lambda **kwargs: progress_events.append(kwargs))
+    compute_placement_distribution_checkpointed(
+        STANDARD_SHIP_DIMENSIONS,
+        num_iterations=250,
+        checkpoint_dir=str(tmp_path),
+        checkpoint_every=100,
+        batch_size=50,
+        random_seed=1,
+        instrumentation=instrumentation,
+    )
+    # one event per checkpoint
+    assert [event["num_iterations_done"] for event in progress_events] == [
+        100,
+        200,
+        250,
+    ]
+    assert capsys.readouterr().out == ""
+
+
+def test_checkpointed_run_rejects_different_settings(tmp_path):
+    checkpoint_dir = str(tmp_path)
+    compute_placement_distribution_checkpointed(
+        STANDARD_SHIP_DIMENSIONS,
+        num_iterations=100,
+        checkpoint_dir=checkpoint_dir,
+        checkpoint_every=100,
+        batch_size=50,
+        random_seed=1,
+    )
+    for checkpoint_every, batch_size in [(100, 25), (50, 50)]:
+        with pytest.raises(ValueError):
+            compute_placement_distribution_checkpointed(
+                STANDARD_SHIP_DIMENSIONS,
+                num_iterations=200,
+                checkpoint_dir=checkpoint_dir,
+                checkpoint_every=checkpoint_every,
+                batch_size=batch_size,
+                resume=True,
+            )
+
+
+def test_checkpointed_run_resumes_after_partial_pending_write(tmp_path):
+    full_run = compute_placement_distribution_checkpointed(
+        STANDARD_SHIP_DIMENSIONS,
+        num_iterations=200,
+        checkpoint_dir=str(tmp_path / "full"),
+        checkpoint_every=100,
+        batch_size=50,
+        random_seed=1,
+    )
+    interrupted_dir = tmp_path / "interrupted"
+    compute_placement_distribution_checkpointed(
+        STANDARD_SHIP_DIMENSIONS,
+        num_iterations=100,
+        checkpoint_dir=str(interrupted_dir),
+        checkpoint_every=100,
+        batch_size=50,
+        random_seed=1,
+    )
+    # interrupted while writing the pending counts of the next checkpoint
+    (interrupted_dir / "pending_counts.npy.tmp").write_bytes(b"\x93NUMPY")
+    resumed_run = compute_placement_distribution_checkpointed(
+        STANDARD_SHIP_DIMENSIONS,
+        num_iterations=200,
+        checkpoint_dir=str(interrupted_dir),
+        checkpoint_every=100,
+        batch_size=50,
+        resume=True,
+    )
+    assert np.array_equal(full_run, resumed_run)
+    assert sorted(path.name for path in interrupted_dir.iterdir()) == [
+        "counts.npy",
+        "state.json",
+    ]
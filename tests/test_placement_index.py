@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+import pytest
+
+import placement_index
+from placement_index import (
+    PlacementIndex,
+    fleet_cache_path,
+    get_placement_index,
+    load_fleet_placement_indexes,
+    save_npz_atomically,
+)
+from ship_placement import get_possible_ship_placements
+
+
+def test_placement_index_matches_possible_placements():
+    index = get_placement_index(6, 8, 3, 2)
+    assert [tuple(placement) for placement in index.placements.tolist()] == (
+        get_possible_ship_placements(3, 2, np.ones((6, 8), dtype=bool))
+    )
+    assert index.placement_idx(0, 0) == 0
+    assert index.placement_idx(4, 0) is None
+    assert index.placement_idx(-1, 0) is None
+    assert index.buffer_squares(0) == [(r, c) for r in range(4) for c in range(3)]
+
+    available_squares = np.ones((6, 8), dtype=bool)
+    available_squares[1, 1] = False
+    valid_placements = index.placements[index.valid_placement_idxs(available_squares)]
+    assert [tuple(placement) for placement in valid_placements.tolist()] == (
+        get_possible_ship_placements(3, 2, available_squares)
+    )
+
+
+def test_fleet_placement_index_disk_cache(tmp_path):
+    ship_dims = [(3, 1), (2, 2)]
+    built = load_fleet_placement_indexes(5, 7, ship_dims, cache_dir=str(tmp_path))
+    assert os.path.exists(fleet_cache_path(5, 7, ship_dims, cache_dir=str(tmp_path)))
+    assert set(built) == {(1, 3), (2, 2), (3, 1)}
+
+    # drop the in-memory indexes so that they are loaded back from disk
+    for shape in built:
+        del placement_index._placement_indexes[(5, 7) + shape]
+    loaded = load_fleet_placement_indexes(5, 7, ship_dims, cache_dir=str(tmp_path))
+    for shape, index in built.items():
+        assert isinstance(loaded[shape], PlacementIndex)
+        assert np.array_equal(loaded[shape].placements, index.placements)
+        assert np.array_equal(loaded[shape].cell_masks, index.cell_masks)
+        assert np.array_equal(loaded[shape].buffer_masks, index.buffer_masks)
+
+
+def test_failed_cache_save_warns_and_leaves_no_temporary_file(tmp_path, monkeypatch):
+    def failing_savez(file, **arrays):
+        with open(file, "wb") as out_file:
+            out_file.write(b"partial")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(np, "savez", failing_savez)
+    with pytest.raises(OSError):
+        save_npz_atomically(str(tmp_path / "arrays.npz"), a=np.zeros(3))
+    assert os.listdir(tmp_path) == []
+
+    ship_dims = [(4, 1)]
+    with pytest.warns(UserWarning, match="Could not save placement index cache"):
+        indexes = load_fleet_placement_indexes(5, 6, ship_dims, cache_dir=str(tmp_path))
+    assert set(indexes) == {(1, 4), (4, 1)}
+    assert os.listdir(tmp_path) == []
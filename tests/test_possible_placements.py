@@ -0,0 +1,302 @@
+import random
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import ship_placement
+from ship_placement import (
+    backtracking_ships_placement,
+    get_possible_ship_placements,
+    get_possible_ship_placements_loop,
+    random_ships_placement,
+    sample_ships_placements,
+    ship_placements_to_labels,
+)
+from game_state import STANDARD_SHIP_DIMENSIONS
+
+
+def _random_available_squares(num_rows: int, num_cols: int, seed: int):
+    rng = random.Random(seed)
+    return [[rng.random() < 0.8 for _ in range(num_cols)] for _ in range(num_rows)]
+
+
+@pytest.mark.parametrize("ship_dims", [(1, 1), (5, 1), (1, 4), (2, 3), (11, 1)])
+def test_vectorized_placements_match_loop(ship_dims):
+    ship_height, ship_width = ship_dims
+    for seed in range(20):
+        available_squares = _random_available_squares(10, 10, seed)
+        assert get_possible_ship_placements(
+            ship_height, ship_width, available_squares
+        ) == get_possible_ship_placements_loop(
+            ship_height, ship_width, available_squares
+        )
+
+
+def test_vectorized_placements_accept_numpy_array():
+    available_squares = np.ones((4, 6), dtype=bool)
+    available_squares[1, 2] = False
+    assert get_possible_ship_placements(
+        3, 1, available_squares
+    ) == get_possible_ship_placements_loop(3, 1, available_squares.tolist())
+
+
+def _check_fleet_placement_is_valid(placements):
+    assert len(placements) == len(STANDARD_SHIP_DIMENSIONS)
+
+    # every ship is in bounds and no two ships touch (including diagonally)
+    ship_squares = np.zeros((12, 12), dtype=np.int64)
+    for top_row_idx, left_col_idx, ship_height, ship_width in placements:
+        assert 0 <= top_row_idx and top_row_idx + ship_height <= 10
+        assert 0 <= left_col_idx and left_col_idx + ship_width <= 10
+        region = ship_squares[
+            top_row_idx : top_row_idx + ship_height + 2,
+            left_col_idx : left_col_idx + ship_width + 2,
+        ]
+        assert not region.any()
+        ship_squares[
+            top_row_idx + 1 : top_row_idx + ship_height + 1,
+            left_col_idx + 1 : left_col_idx + ship_width + 1,
+        ] = 1
+
+
+def test_random_ships_placement_is_valid():
+    random.seed(0)
+    for _ in range(50):
+        placements = random_ships_placement(
+            STANDARD_SHIP_DIMENSIONS,
+            available_squares=[[True] * 10 for _ in range(10)],
+            num_rows=10,
+            num_cols=10,
+        )
+        _check_fleet_placement_is_valid(placements)
+
+
+def test_sample_ships_placements_is_valid():
+    placements = sample_ships_placements(
+        STANDARD_SHIP_DIMENSIONS,
+        num_samples=200,
+        num_rows=10,
+        num_cols=10,
+        rng=np.random.default_rng(0),
+    )
+    assert placements.shape == (200, len(STANDARD_SHIP_DIMENSIONS), 4)
+    for fleet_placement in placements.tolist():
+        _check_fleet_placement_is_valid(fleet_placement)
+        # each ship keeps its dimensions (possibly rotated)
+        for (_, _, ship_height, ship_width), ship_dims in zip(
+            fleet_placement, STANDARD_SHIP_DIMENSIONS
+        ):
+            assert (ship_height, ship_width) in [ship_dims, ship_dims[::-1]]
+
+    labels = ship_placements_to_labels(placements, 10, 10)
+    assert labels.dtype == np.uint8
+    for ship_idx, (ship_height, ship_width) in enumerate(STANDARD_SHIP_DIMENSIONS):
+        assert (
+            (labels == ship_idx + 1).sum(axis=(1, 2)) == ship_height * ship_width
+        ).all()
+
+
+def test_sample_ships_placements_respects_available_squares():
+    available_squares = np.ones((10, 10), dtype=bool)
+    available_squares[:, 5] = False
+    labels = sample_ships_placements(
+        STANDARD_SHIP_DIMENSIONS,
+        num_samples=100,
+        num_rows=10,
+        num_cols=10,
+        available_squares=available_squares,
+        rng=np.random.default_rng(0),
+        as_labels=True,
+    )
+    assert not labels[:, :, 5].any()
+
+
+@pytest.mark.parametrize(
+    "ship_dims", [STANDARD_SHIP_DIMENSIONS, STANDARD_SHIP_DIMENSIONS[::-1]]
+)
+def test_backtracking_ships_placement_is_valid(ship_dims):
+    random.seed(0)
+    for num_rows, num_cols in [(10, 10), (6, 7)]:
+        for _ in range(20):
+            placements = random_ships_placement(
+                ship_dims,
+                available_squares=[[True] * num_cols for _ in range(num_rows)],
+                num_rows=num_rows,
+                num_cols=num_cols,
+                backtracking=True,
+            )
+            _check_fleet_placement_is_valid(placements)
+            for (_, _, ship_height, ship_width), dims in zip(placements, ship_dims):
+                assert (ship_height, ship_width) in [dims, dims[::-1]]
+
+
+def test_backtracking_ships_placement_no_legal_layout():
+    with pytest.raises(ValueError):
+        backtracking_ships_placement(
+            STANDARD_SHIP_DIMENSIONS,
+            available_squares=[[True] * 6 for _ in range(6)],
+            num_rows=6,
+            num_cols=6,
+        )
+
+
+def test_backtracking_ships_placement_infeasible_fleet_fails_fast(monkeypatch):
+    num_searches = []
+    search_ships_placement = ship_placement._search_ships_placement
+    monkeypatch.setattr(
+        ship_placement,
+        "_search_ships_placement",
+        lambda *args: num_searches.append(1) or search_ships_placement(*args),
+    )
+    # rejected up front, without searching
+    with pytest.raises(ValueError):
+        backtracking_ships_placement(
+            [(1, 1)] * 10,
+            available_squares=[[True] * 5 for _ in range(5)],
+            num_rows=5,
+            num_cols=5,
+        )
+    assert len(num_searches) == 0
+
+    # not rejected up front: gives up after max_restarts searches of max_nodes nodes
+    with pytest.raises(ValueError):
+        backtracking_ships_placement(
+            [(2, 1)] * 9,
+            available_squares=[[True] * 6 for _ in range(6)],
+            num_rows=6,
+            num_cols=6,
+            max_nodes=100,
+            max_restarts=3,
+        )
+    assert len(num_searches) == 3
+
+
+def test_backtracking_ships_placement_tight_fleet():
+    # the only layout puts the ships on every other square of every other row
+    placements = backtracking_ships_placement(
+        [(1, 1)] * 16,
+        available_squares=[[True] * 7 for _ in range(7)],
+        num_rows=7,
+        num_cols=7,
+        rng=random.Random(0),
+    )
+    assert sorted(placements) == [
+        (row_idx, col_idx, 1, 1)
+        for row_idx in range(0, 7, 2)
+        for col_idx in range(0, 7, 2)
+    ]
+
+    # the search gives up once its budget runs out
+    with pytest.raises(ValueError):
+        backtracking_ships_placement(
+            [(1, 1)] * 16,
+            available_squares=[[True] * 7 for _ in range(7)],
+            num_rows=7,
+            num_cols=7,
+            rng=random.Random(0),
+            max_nodes=10,
+            max_restarts=2,
+        )
+
+
+def test_random_ships_placement_without_placement_index(monkeypatch):
+    # large boards don't have placement indexes
+    monkeypatch.setattr("placement_index.PLACEMENT_INDEX_MAX_SQUARES", 0)
+    rng = random.Random(0)
+    for _ in range(50):
+        placements = random_ships_placement(
+            STANDARD_SHIP_DIMENSIONS,
+            available_squares=[[True] * 10 for _ in range(10)],
+            num_rows=10,
+            num_cols=10,
+            rng=rng,
+        )
+        _check_fleet_placement_is_valid(placements)
+
+
+def test_sample_ships_placements_infeasible_fleet_fails_fast(monkeypatch):
+    num_rounds = []
+    sample_fleets = ship_placement._sample_fleets
+    monkeypatch.setattr(
+        ship_placement,
+        "_sample_fleets",
+        lambda *args: num_rounds.append(1) or sample_fleets(*args),
+    )
+    with pytest.raises(ValueError):
+        sample_ships_placements([(1, 1)] * 10, num_samples=10, num_rows=5, num_cols=5)
+    # vertical ships on two rows
+    available_squares = np.zeros((10, 10), dtype=bool)
+    available_squares[0, :] = True
+    available_squares[9, :] = True
+    with pytest.raises(ValueError):
+        sample_ships_placements(
+            [(5, 1), (4, 1), (3, 1)],
+            num_samples=10,
+            num_rows=10,
+            num_cols=10,
+            rotate_allowed=False,
+            available_squares=available_squares,
+        )
+    # given up after the first round, instead of redrawing forever
+    assert len(num_rounds) == 2
+
+
+def _check_labels_are_valid(labels: np.ndarray, ship_dims):
+    for ship_idx, (ship_height, ship_width) in enumerate(ship_dims):
+        assert (
+            (labels == ship_idx + 1).sum(axis=(1, 2)) == ship_height * ship_width
+        ).all()
+    # no two ships touch, even diagonally
+    num_rows, num_cols = labels.shape[1:]
+    padded = np.pad(labels, ((0, 0), (1, 1), (1, 1)))
+    for row_offset in range(3):
+        for col_offset in range(3):
+            neighbors = padded[
+                :,
+                row_offset : row_offset + num_rows,
+                col_offset : col_offset + num_cols,
+            ]
+            assert not ((labels > 0) & (neighbors > 0) & (labels != neighbors)).any()
+
+
+@pytest.mark.parametrize(
+    "ship_dims, num_rows, num_cols, num_samples",
+    [
+        # few of the fleets drawn fit, or very few
+        (STANDARD_SHIP_DIMENSIONS, 5, 7, 1000),
+        ([(2, 1)] * 8, 6, 6, 2),
+    ],
+)
+def test_sample_ships_placements_dense_fleet(
+    ship_dims, num_rows, num_cols, num_samples
+):
+    for seed in range(3):
+        labels = sample_ships_placements(
+            ship_dims,
+            num_samples=num_samples,
+            num_rows=num_rows,
+            num_cols=num_cols,
+            rng=np.random.default_rng(seed),
+            as_labels=True,
+        )
+        _check_labels_are_valid(labels, ship_dims)
+
+
+def test_sample_ships_placements_memory_is_bounded(monkeypatch):
+    monkeypatch.setattr(ship_placement, "SAMPLING_CHUNK_SIZE", 1000)
+    sample_ships_placements(
+        STANDARD_SHIP_DIMENSIONS, num_samples=10, num_rows=10, num_cols=10
+    )
+    tracemalloc.start()
+    placements = sample_ships_placements(
+        STANDARD_SHIP_DIMENSIONS,
+        num_samples=20000,
+        num_rows=10,
+        num_cols=10,
+        rng=np.random.default_rng(0),
+    )
+    _, peak_nbytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # the result, plus what one chunk needs (about 3KB per fleet)
+    assert peak_nbytes < 2 * placements.nbytes + 1000 * 4000